@@ -0,0 +1,144 @@
+"""
+Deterministic synthetic catalog generator for benchmarks
+Produces PyPI-like packages with skewed (Zipf) keyword and category distributions
+"""
+import random
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from packagepilot.database import Database
+from packagepilot.models import Package
+
+
+# Category weights roughly follow the real catalog: web and data dominate
+CATEGORIES = [
+    ("web", 30), ("data", 25), ("utilities", 15), ("cli", 8), ("testing", 8),
+    ("database", 7), ("file", 7),
+]
+
+# Seed words mixed into the generated vocabulary so real queries still hit
+SEED_WORDS = [
+    "http", "api", "web", "rest", "async", "client", "server", "html", "scraping",
+    "data", "analysis", "dataframe", "plot", "chart", "visualization", "machine",
+    "learning", "database", "sql", "orm", "cache", "testing", "mock", "cli",
+    "terminal", "parser", "json", "yaml", "excel", "pdf", "image", "logging",
+]
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+_SYLLABLES = ["py", "lib", "tor", "ex", "on", "ar", "zen", "io", "ly", "fy",
+              "kit", "ra", "mo", "do", "qu", "tri", "sta", "ve", "no", "ix"]
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a catalog size like '1k', '100k', '1m' or a plain integer.
+    
+    Args:
+        value: Size string
+        
+    Returns:
+        Number of packages
+    """
+    value = value.lower()
+    if value in SIZES:
+        return SIZES[value]
+    return int(value)
+
+
+def _make_vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    """Build a vocabulary: real seed words first, then pronounceable filler."""
+    words = list(SEED_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def generate_catalog(size: int, seed: int = 0) -> Iterator[Tuple[Package, List[str]]]:
+    """
+    Generate a deterministic synthetic catalog.
+    
+    Keywords and description words are drawn from a Zipf-like distribution,
+    so a few terms ("data", "http") match many packages and most match few.
+    Popularity follows a Pareto (80/20) distribution.
+    
+    Args:
+        size: Number of packages
+        seed: Random seed; the same seed always yields the same catalog
+        
+    Returns:
+        Iterator of (Package, keywords) tuples
+    """
+    rng = random.Random(seed)
+    popularity_rng = random.Random(seed + 1)  # Separate stream: keeps catalogs stable
+    vocabulary = _make_vocabulary(rng)
+    zipf_weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    categories = [name for name, _ in CATEGORIES]
+    category_weights = [weight for _, weight in CATEGORIES]
+    
+    for index in range(size):
+        category = rng.choices(categories, category_weights)[0]
+        desc_words = rng.choices(vocabulary, zipf_weights, k=rng.randint(4, 12))
+        keywords = sorted(set(rng.choices(vocabulary, zipf_weights, k=rng.randint(2, 7))))
+        name = f"{rng.choice(vocabulary)}-{rng.choice(vocabulary)}-{index}"
+        
+        yield Package(
+            id=None,
+            name=name,
+            description=" ".join(desc_words).capitalize(),
+            category=category,
+            install_command=f"pip install {name}",
+            code_example=f"import {name.replace('-', '_')}",
+            pypi_url=f"https://pypi.org/project/{name}/",
+            github_url=f"https://github.com/example/{name}" if index % 3 else None,
+            documentation_url=f"https://{name}.readthedocs.io/" if index % 4 == 0 else None,
+            popularity=round((popularity_rng.paretovariate(1.16) - 1) * 1000)
+        ), keywords
+
+
+def build_catalog(db: Database, size: int, seed: int = 0, batch_size: int = 10_000) -> int:
+    """
+    Write a synthetic catalog into a database through the Database API.
+    
+    Args:
+        db: Target database
+        size: Number of packages
+        seed: Random seed
+        batch_size: Packages per transaction
+        
+    Returns:
+        Number of packages written
+    """
+    items = generate_catalog(size, seed)
+    written = 0
+    while written < size:
+        batch = [item for _, item in zip(range(batch_size), items)]
+        written += db.add_packages(batch)
+    return written
+
+
+def catalog_path(directory: Path, size: int, seed: int = 0) -> Path:
+    """
+    Get (building if needed) a cached catalog database file.
+    
+    Args:
+        directory: Cache directory for generated catalogs
+        size: Number of packages
+        seed: Random seed
+        
+    Returns:
+        Path to the catalog database
+    """
+    path = Path(directory) / f"catalog-{size}-{seed}.db"
+    if not path.exists():
+        partial = path.with_suffix(".partial")
+        if partial.exists():
+            partial.unlink()
+        with Database(str(partial)) as db:
+            build_catalog(db, size, seed)
+        partial.rename(path)
+    return path
@@ -0,0 +1,158 @@
+"""
+Local stand-in for PyPI's JSON API, used to test and benchmark `packagepilot enrich`
+
+Usage:
+    python -m benchmarks.metadata_server --port 8000 --root /path/to/mirror
+    python -m packagepilot enrich --endpoint "http://127.0.0.1:8000/pypi/{name}/json"
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote
+
+from packagepilot.deps import canonicalize_name
+
+# Fixed Last-Modified for synthesized documents, so validators are stable
+_SYNTHETIC_MODIFIED = formatdate(1_700_000_000, usegmt=True)
+
+
+def synthetic_metadata(name: str) -> bytes:
+    """Deterministic PyPI-style JSON document for any project name."""
+    words = name.replace("_", "-").split("-")
+    return json.dumps({
+        "info": {
+            "name": name,
+            "summary": f"Synthetic metadata for {' '.join(words)}",
+            "keywords": ",".join(words + ["synthetic"]),
+            "classifiers": [],
+            "requires_dist": None,
+            "project_urls": {
+                "Documentation": f"https://{name}.readthedocs.io/",
+                "Source": f"https://github.com/example/{name}",
+            },
+            "home_page": "",
+            "package_url": f"https://pypi.org/project/{name}/",
+        },
+    }).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serve /pypi/<name>/json with ETag and Last-Modified validation."""
+    
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    disable_nagle_algorithm = True  # Headers and body are separate writes
+    
+    def do_GET(self):
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "pypi" or parts[2] != "json":
+            return self._send(404, b"")
+        
+        name = unquote(parts[1])
+        body, modified = self.server.load(name)
+        if body is None:
+            return self._send(404, b"")
+        
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.headers.get("If-None-Match") == etag or (
+                "If-None-Match" not in self.headers
+                and self.headers.get("If-Modified-Since") == modified):
+            return self._send(304, b"", etag, modified)
+        self._send(200, body, etag, modified)
+    
+    def _send(self, status: int, body: bytes, etag: Optional[str] = None,
+              modified: Optional[str] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", modified)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+
+class MetadataServer(ThreadingHTTPServer):
+    """
+    Threaded metadata server.
+    
+    Documents come from <root>/pypi/<name>/json when a root is given (the
+    same layout `packagepilot sync` reads); other names get synthetic
+    metadata unless synthesize is off.
+    
+    Example:
+        with MetadataServer() as server:
+            enrich(endpoint=server.endpoint)
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self, port: int = 0, root: Optional[str] = None, latency_ms: float = 0.0,
+                 synthesize: bool = True):
+        super().__init__(("127.0.0.1", port), _Handler)
+        # Project directories by canonical name, so "flask" finds pypi/Flask/json
+        self.projects = {}
+        if root:
+            self.projects = {canonicalize_name(path.parent.name): path
+                             for path in Path(root).glob("pypi/*/json")}
+        self.latency = latency_ms / 1000
+        self.synthesize = synthesize
+        self._thread = None
+    
+    @property
+    def endpoint(self) -> str:
+        """URL template for `packagepilot enrich --endpoint`."""
+        return f"http://127.0.0.1:{self.server_address[1]}/pypi/{{name}}/json"
+    
+    def load(self, name: str):
+        """Get (body, Last-Modified) for a project, or (None, None)."""
+        path = self.projects.get(canonicalize_name(name))
+        if path is not None:
+            return path.read_bytes(), formatdate(path.stat().st_mtime, usegmt=True)
+        if self.synthesize:
+            return synthetic_metadata(name), _SYNTHETIC_MODIFIED
+        return None, None
+    
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    """Run the server in the foreground."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.metadata_server",
+                                     description="Local PyPI JSON API stand-in")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--root", help="Mirror root with pypi/<name>/json files")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Artificial delay per request")
+    parser.add_argument("--no-synthesize", action="store_true",
+                        help="Return 404 for names without a file")
+    args = parser.parse_args(argv)
+    
+    server = MetadataServer(args.port, args.root, args.latency_ms, not args.no_synthesize)
+    print(f"Serving on {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
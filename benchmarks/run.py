@@ -0,0 +1,295 @@
+"""
+Benchmark runner for PackagePilot
+
+Usage:
+    python -m benchmarks.run --size 1k --size 100k --output baseline.json
+    python -m benchmarks.run --size 1k --compare baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from packagepilot.database import TUNING_PROFILES, Database
+from packagepilot.enrich import Enricher
+from packagepilot.index import SearchIndex
+from packagepilot.search import rank_results, search_packages
+
+from benchmarks.catalog import catalog_path, generate_catalog, parse_size
+from benchmarks.metadata_server import MetadataServer
+
+DEFAULT_CATALOG_DIR = Path(tempfile.gettempdir()) / "packagepilot-bench"
+
+# Packages inserted by the seed benchmarks (kept small so 1M runs stay usable)
+SEED_SIZE = 1_000
+
+# Packages re-loaded by the upsert benchmarks
+UPSERT_SIZE = 20_000
+
+# Packages enriched per run, and the simulated network latency per request
+ENRICH_SIZE = 500
+ENRICH_LATENCY_MS = 2.0
+
+
+def time_call(func: Callable, min_time: float = 0.2, max_repeat: int = 50) -> Dict[str, float]:
+    """
+    Time a callable, repeating until min_time has elapsed.
+    
+    Args:
+        func: Zero-argument callable to time
+        min_time: Minimum total measuring time in seconds
+        max_repeat: Maximum number of repetitions
+        
+    Returns:
+        Dict with median/min/max in milliseconds and the repeat count
+    """
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_repeat:
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() - started >= min_time and len(timings) >= 3:
+            break
+    return {
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "max_ms": max(timings),
+        "repeat": len(timings),
+    }
+
+
+def query_benchmarks(db: Database) -> List[Tuple[str, Callable]]:
+    """Build the read-path benchmarks against an open catalog."""
+    package, _ = next(generate_catalog(1))  # Same first package as every catalog
+    some_name = package.name
+    candidates = db.search_terms(["data"])
+    
+    # A LiveIndex refresh of 100 changed packages, patched into the snapshot
+    index = SearchIndex.build(db)
+    changed_ids = [row["id"] for row in islice(db.iter_package_rows(), 100)]
+    changed_items = db.get_packages_with_keywords(changed_ids)
+    
+    return [
+        ("search_single_hit", lambda: search_packages("data", db, limit=5)),
+        ("search_single_miss", lambda: search_packages("zzqqxx", db, limit=5)),
+        ("search_multi_hit", lambda: search_packages("web scraping", db, limit=5)),
+        ("search_multi_miss", lambda: search_packages("zzqq xxkk", db, limit=5)),
+        ("search_single_hit_sql_rank", lambda: search_packages("data", db, limit=5, rank_in_sql=True)),
+        ("get_package_by_name", lambda: db.get_package_by_name(some_name)),
+        ("get_packages_by_category", lambda: db.get_packages_by_category("testing")),
+        ("get_top_packages", lambda: db.get_top_packages("data", 20)),
+        ("get_all_packages", lambda: db.get_all_packages()),
+        ("rank_results", lambda: rank_results(candidates, "data", limit=5)),
+        # Must beat rank_results before the process pool is used by default
+        ("rank_results_parallel", lambda: rank_results(candidates, "data", limit=5,
+                                                       parallel=True)),
+        ("search_index_updated_100", lambda: index.updated(changed_items, changed_ids)),
+    ]
+
+
+def seed_benchmarks(workdir: Path) -> List[Tuple[str, Callable]]:
+    """Build the write-path benchmarks, each seeding a fresh database."""
+    items = list(generate_catalog(SEED_SIZE, seed=1))
+    counter = [0]
+    
+    def fresh_db(profile: str) -> Database:
+        counter[0] += 1
+        return Database(str(workdir / f"seed-{counter[0]}.db"), tuning_profile=profile)
+    
+    def seed_per_package(profile: str):
+        def seed():
+            with fresh_db(profile) as db:
+                for package, keywords in items:
+                    db.add_keywords(db.add_package(package), keywords)
+        return seed
+    
+    def seed_bulk(profile: str):
+        def seed():
+            with fresh_db(profile) as db:
+                db.add_packages(items)
+        return seed
+    
+    def upsert_bulk(profile: str):
+        # Re-load the same packages into a populated catalog (a re-sync)
+        path = workdir / f"upsert-{profile}.db"
+        with Database(str(path)) as db:
+            db.add_packages(generate_catalog(UPSERT_SIZE, seed=3))
+        updates = [(package, keywords, None) for package, keywords
+                   in generate_catalog(UPSERT_SIZE, seed=3)]
+        
+        def upsert():
+            with Database(str(path), tuning_profile=profile) as db:
+                db.upsert_packages(updates)
+        return upsert
+    
+    return [
+        (f"seed_add_package_{SEED_SIZE}", seed_per_package("default")),
+        (f"seed_add_package_{SEED_SIZE}_bulk_load", seed_per_package("bulk_load")),
+        (f"seed_add_packages_bulk_{SEED_SIZE}", seed_bulk("default")),
+        (f"seed_add_packages_bulk_{SEED_SIZE}_bulk_load", seed_bulk("bulk_load")),
+        (f"upsert_packages_{UPSERT_SIZE}", upsert_bulk("default")),
+        (f"upsert_packages_{UPSERT_SIZE}_bulk_load", upsert_bulk("bulk_load")),
+    ]
+
+
+def enrich_benchmarks(workdir: Path, endpoint: str) -> List[Tuple[str, Callable]]:
+    """Build the enrichment benchmarks against a local metadata server."""
+    path = workdir / "enrich.db"
+    with Database(str(path)) as db:
+        db.add_packages(generate_catalog(ENRICH_SIZE, seed=2))
+    
+    def enrich(concurrency: int, fresh: bool):
+        def run_enrich():
+            with Database(str(path)) as db:
+                if fresh:
+                    db.connection.execute("DELETE FROM http_cache")
+                    db.connection.commit()
+                Enricher(db, endpoint, concurrency).run()
+        return run_enrich
+    
+    return [
+        (f"enrich_sequential_{ENRICH_SIZE}", enrich(1, fresh=True)),
+        (f"enrich_concurrent_{ENRICH_SIZE}", enrich(16, fresh=True)),
+        (f"enrich_cached_{ENRICH_SIZE}", enrich(16, fresh=False)),
+    ]
+
+
+def run(sizes: List[str], catalog_dir: Path, min_time: float,
+        modes: List[str] = ("file",)) -> Dict:
+    """
+    Run every benchmark for each catalog size and database mode.
+    
+    Modes are "file", "memory" (in_memory=True) or a tuning profile name
+    such as "read_heavy". Results for the file-backed mode are grouped
+    under the size label ("1k"), other modes under "<size>:<mode>"
+    ("1k:memory").
+    
+    Returns:
+        Results document suitable for writing as a JSON baseline
+    """
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    catalog_dir.mkdir(parents=True, exist_ok=True)
+    
+    for size_label in sizes:
+        size = parse_size(size_label)
+        print(f"[{size_label}] Preparing catalog ({size} packages)...", file=sys.stderr)
+        path = catalog_path(catalog_dir, size)
+        
+        for mode in modes:
+            group = size_label if mode == "file" else f"{size_label}:{mode}"
+            group_results = results["results"].setdefault(group, {})
+            
+            options = {"in_memory": mode == "memory",
+                       "tuning_profile": mode if mode in TUNING_PROFILES else "default"}
+            group_results["open"] = time_call(
+                lambda: Database(str(path), **options).close(), min_time, max_repeat=5
+            )
+            print(f"[{group}] {'open':32} {group_results['open']['median_ms']:10.3f} ms",
+                  file=sys.stderr)
+            with Database(str(path), **options) as db:
+                for name, func in query_benchmarks(db):
+                    group_results[name] = time_call(func, min_time)
+                    print(f"[{group}] {name:32} {group_results[name]['median_ms']:10.3f} ms",
+                          file=sys.stderr)
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_results = results["results"].setdefault("seed", {})
+        for name, func in seed_benchmarks(Path(workdir)):
+            seed_results[name] = time_call(func, min_time, max_repeat=5)
+            print(f"[seed] {name:32} {seed_results[name]['median_ms']:10.3f} ms", file=sys.stderr)
+        
+        enrich_results = results["results"].setdefault("enrich", {})
+        with MetadataServer(latency_ms=ENRICH_LATENCY_MS) as server:
+            for name, func in enrich_benchmarks(Path(workdir), server.endpoint):
+                enrich_results[name] = time_call(func, min_time, max_repeat=3)
+                print(f"[enrich] {name:30} {enrich_results[name]['median_ms']:10.3f} ms",
+                      file=sys.stderr)
+    
+    return results
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Compare results against a baseline.
+    
+    Args:
+        current: Results from run()
+        baseline: Previously saved results
+        threshold: Allowed slowdown as a fraction (0.2 = 20% slower)
+        
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    regressions = []
+    for group, benchmarks in current["results"].items():
+        for name, timing in benchmarks.items():
+            base = baseline.get("results", {}).get(group, {}).get(name)
+            if not base:
+                continue
+            ratio = timing["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+            status = "REGRESSION" if ratio > 1 + threshold else "ok"
+            print(f"  {group:6} {name:32} {base['median_ms']:10.3f} -> "
+                  f"{timing['median_ms']:10.3f} ms  x{ratio:5.2f}  {status}")
+            if status == "REGRESSION":
+                regressions.append(f"{group}/{name}: x{ratio:.2f}")
+    return regressions
+
+
+def main(argv=None):
+    """Benchmark runner entry point."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="PackagePilot benchmark suite")
+    parser.add_argument("--size", action="append",
+                        help="Catalog size: 1k, 10k, 100k, 1m or a number (repeatable, default: 1k)")
+    parser.add_argument("--mode", action="append", choices=["file", "memory", "read_heavy"],
+                        help="Database mode to benchmark (repeatable, default: file, memory "
+                             "and read_heavy)")
+    parser.add_argument("--catalog-dir", type=Path, default=DEFAULT_CATALOG_DIR,
+                        help="Where generated catalogs are cached")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="Minimum seconds spent timing each benchmark")
+    parser.add_argument("--output", type=Path, help="Write results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown before flagging a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+    
+    results = run(args.size or ["1k"], args.catalog_dir, args.min_time,
+                  args.mode or ["file", "memory", "read_heavy"])
+    
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"[OK] Results written to {args.output}", file=sys.stderr)
+    
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        print(f"\n[COMPARE] against {args.compare} (threshold {args.threshold:.0%}):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n[!] {len(regressions)} regression(s):")
+            for regression in regressions:
+                print(f"      - {regression}")
+            return 1
+        print("\n[OK] No regressions")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
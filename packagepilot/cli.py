@@ -3,14 +3,50 @@ ENHANCED Command-line interface for PackagePilot
 Added: search suggestions, stats command, better UX
 Windows-compatible version (no emojis)
 """
+import time
+_IMPORT_START = time.perf_counter()
+
 import argparse
+import cProfile
+import os
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from packagepilot.database import Database
-from packagepilot.search import search_packages, get_search_suggestions
+from packagepilot.deps import DependencyGraph, canonicalize_name
+from packagepilot.enrich import DEFAULT_CONCURRENCY, Enricher
+from packagepilot.explain import explain_queries
+from packagepilot.related import refresh_related
+from packagepilot.scan import distribution_name, read_requirements, scan_imports
+from packagepilot.sync import MAX_SYNC_ATTEMPTS, sync_mirror
+from packagepilot.normalize import normalize_text
+from packagepilot.output import FORMATS, OutputWriter, package_record
+from packagepilot.perf import format_perf_stats, load_perf_stats
+from packagepilot.sharding import ShardedDatabase
+from packagepilot.search import search_with_total, get_search_suggestions
+from packagepilot.timing import TIMER
+
+_IMPORT_END = time.perf_counter()
+
+
+def print_migration_progress(description, done, total):
+    """Show schema migration backfill progress on stderr."""
+    end = "\n" if done >= total else ""
+    print(f"\r[UPGRADE] {description}: {done}/{total} rows", end=end, file=sys.stderr, flush=True)
+
+
+def open_database():
+    """Open the default database, showing progress if an upgrade has to backfill rows."""
+    return Database(migration_progress=print_migration_progress)
+
+
+def open_catalog(args):
+    """Open the catalog for read commands: the sharded layout if --shards was given."""
+    if args.shards:
+        return ShardedDatabase(args.shards)
+    return open_database()
 
 
 def format_package_output(package, show_full=False):
@@ -27,7 +63,7 @@ def format_package_output(package, show_full=False):
         output.append(f"\n{'-'*70}")
         output.append("Code Example:")
         output.append(f"{'-'*70}")
-        output.append(package.code_example)
+        output.append(package.code_example or "# No code example yet")
         
         output.append(f"\n{'-'*70}")
         output.append("Links:")
@@ -43,14 +79,28 @@ def format_package_output(package, show_full=False):
 
 def cmd_search(args):
     """Handle search command with suggestions."""
-    db = Database()
-    results = search_packages(args.query, db)
+    db = open_catalog(args)
+    offset = (args.page - 1) * args.limit
+    results, total = search_with_total(args.query, db, limit=args.limit, offset=offset,
+                                       rank_in_sql=args.sql_rank)
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.records(package_record(package) for package in results)
+        db.close()
+        return
+    
+    if not results and total:
+        print(f"\n[!] Page {args.page} is past the last result for '{args.query}'")
+        print(f"      Total results: {total}")
+        db.close()
+        return
     
     if not results:
         print(f"\n[!] No packages found for '{args.query}'")
         
         # Try to provide suggestions
-        suggestions = get_search_suggestions(args.query)
+        suggestions = get_search_suggestions(args.query, db)
         
         if suggestions:
             print("\n[TIP] Did you mean to search for:")
@@ -66,16 +116,19 @@ def cmd_search(args):
         db.close()
         return
     
-    print(f"\n[FOUND] {len(results)} package(s) for '{args.query}':")
+    print(f"\n[FOUND] {total} package(s) for '{args.query}':")
+    if offset:
+        print(f"        Showing {offset + 1}-{offset + len(results)} (page {args.page})")
     
-    # Show top results
-    display_count = min(5, len(results))
-    for package in results[:display_count]:
+    # Show this page of results
+    for package in results:
         print(format_package_output(package, show_full=False))
     
-    if len(results) > display_count:
-        print(f"\n... and {len(results) - display_count} more results")
-        print(f"\n[TIP] Refine search or use 'packagepilot info <name>' for details")
+    remaining = total - offset - len(results)
+    if remaining > 0:
+        print(f"\n... and {remaining} more results")
+        print(f"\n[TIP] Use --page {args.page + 1} for more, refine search, "
+              f"or use 'packagepilot info <name>' for details")
     else:
         print("\n[TIP] Use 'packagepilot info <name>' for full details")
     
@@ -84,15 +137,24 @@ def cmd_search(args):
 
 def cmd_info(args):
     """Handle info command."""
-    db = Database()
+    db = open_catalog(args)
     package = db.get_package_by_name(args.package_name)
     
+    if args.format != "text":
+        if not package:
+            print(f"[!] Package '{args.package_name}' not found", file=sys.stderr)
+        with OutputWriter(args.format) as out:
+            out.value(package_record(package) if package else None)
+        db.close()
+        return
+    
     if not package:
         print(f"\n[!] Package '{args.package_name}' not found")
         
         # Try fuzzy search for similar names
         all_packages = db.get_all_packages()
-        similar = [p for p in all_packages if args.package_name.lower() in p.name.lower()]
+        name_norm = normalize_text(args.package_name)
+        similar = [p for p in all_packages if name_norm in p.name_norm]
         
         if similar:
             print("\n[TIP] Did you mean one of these?")
@@ -110,96 +172,389 @@ def cmd_info(args):
 
 def cmd_category(args):
     """Handle category command."""
-    db = Database()
-    packages = db.get_packages_by_category(args.category_name)
+    db = open_catalog(args)
     
-    if not packages:
+    if args.format != "text":
+        if args.top:
+            rows = db.get_top_packages(args.category_name, args.top)
+        else:
+            rows = db.iter_package_rows(args.category_name)
+        with OutputWriter(args.format) as out:
+            out.records(package_record(row) for row in rows)
+        db.close()
+        return
+    
+    # --top reads only N rows off the popularity index, so skip the full count
+    top = db.get_top_packages(args.category_name, args.top) if args.top else None
+    count = len(top) if args.top else db.count_packages(args.category_name)
+    
+    if not count:
         print(f"\n[!] No packages in category '{args.category_name}'")
         print("\n[TIP] Available categories:")
         
         # Get all unique categories
-        all_packages = db.get_all_packages()
-        categories = sorted(set(p.category for p in all_packages))
-        for cat in categories:
+        for cat in db.get_category_counts():
             print(f"      - {cat}")
         
         db.close()
         return
     
-    print(f"\n[{args.category_name.upper()}] {len(packages)} packages:\n")
-    
-    for package in packages:
-        print(f"  * {package.name}")
-        print(f"    {package.description}")
-        print("")
-    
-    print("[TIP] Use 'packagepilot info <name>' for details")
+    with OutputWriter() as out:
+        if top is not None:
+            out.line(f"\n[{args.category_name.upper()}] Top {count} packages by popularity:\n")
+            
+            for rank, package in enumerate(top, 1):
+                out.line(f"  {rank:2}. {package.name} (popularity: {package.popularity:,.0f})")
+                out.line(f"      {package.description}")
+                out.line("")
+        else:
+            out.line(f"\n[{args.category_name.upper()}] {count} packages:\n")
+            
+            for row in db.iter_package_rows(args.category_name):
+                out.line(f"  * {row['name']}")
+                out.line(f"    {row['description']}")
+                out.line("")
+        
+        out.line("[TIP] Use 'packagepilot info <name>' for details")
     db.close()
 
 
 def cmd_categories(args):
     """List all categories with counts."""
-    db = Database()
-    all_packages = db.get_all_packages()
+    db = open_catalog(args)
+    category_counts = db.get_category_counts()
     
-    # Count packages per category
-    category_counts = {}
-    for package in all_packages:
-        category_counts[package.category] = category_counts.get(package.category, 0) + 1
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.records({"category": category, "count": count}
+                        for category, count in category_counts.items())
+        db.close()
+        return
     
     print("\n[CATEGORIES] Available:\n")
     
-    for category in sorted(category_counts.keys()):
-        count = category_counts[category]
+    for category, count in category_counts.items():
         print(f"  {category:12} ({count:2} packages)")
     
     print(f"\n[TIP] Use 'packagepilot category <name>' to browse")
-    print(f"      Total packages: {len(all_packages)}")
+    print(f"      Total packages: {sum(category_counts.values())}")
     
     db.close()
 
 
 def cmd_list(args):
     """List all packages."""
-    db = Database()
-    packages = db.get_all_packages()
+    db = open_catalog(args)
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.records(package_record(row) for row in db.iter_package_rows())
+        db.close()
+        return
     
-    if not packages:
+    category_counts = db.get_category_counts()
+    
+    if not category_counts:
         print("\n[!] No packages in database. Run seed_database.py first!")
         db.close()
         return
     
-    print(f"\n[ALL PACKAGES] ({len(packages)} total):\n")
+    # Rows arrive grouped by category and sorted by name, so stream them
+    with OutputWriter() as out:
+        out.line(f"\n[ALL PACKAGES] ({sum(category_counts.values())} total):\n")
+        
+        category = None
+        for row in db.iter_package_rows():
+            if row["category"] != category:
+                category = row["category"]
+                out.line(f"\n{category.upper()} ({category_counts[category]}):")
+            description = row["description"]
+            desc = description[:60] + "..." if len(description) > 60 else description
+            out.line(f"  * {row['name']:20} - {desc}")
+    
+    db.close()
+
+
+def cmd_reindex(args):
+    """Recompute normalized columns and token sets."""
+    db = open_database()
+    count = db.reindex()
+    related = refresh_related(db)
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.value({"reindexed": count, "related_refreshed": related})
+    else:
+        print(f"\n[OK] Reindexed {count} packages")
+        print(f"[OK] Refreshed related packages for {related} packages")
+    db.close()
+
+
+def cmd_scan(args):
+    """Look up every requirement of a project file in the catalog."""
+    try:
+        requirements = read_requirements(args.path)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"\n[!] Could not read {args.path}: {e}")
+        return
+    
+    db = open_catalog(args)
+    found = db.get_packages_by_names([name for name, _, _ in requirements])
+    db.close()
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.records(
+                {"name": name, "specifier": specifier, "source": source, "known": name in found,
+                 "package": package_record(found[name]) if name in found else None}
+                for name, specifier, source in requirements
+            )
+        return
+    
+    unknown = [name for name, _, _ in requirements if name not in found]
+    print(f"\n[SCAN] {args.path}: {len(requirements)} requirements, "
+          f"{len(requirements) - len(unknown)} in catalog\n")
+    
+    for name, specifier, _ in requirements:
+        package = found.get(name)
+        if package is not None:
+            print(f"  [OK] {package.name} {specifier}".rstrip() + f"  ({package.category})")
+            print(f"       {package.description}")
+    
+    if unknown:
+        print(f"\n[!] Not in catalog ({len(unknown)}): {', '.join(unknown)}")
+    print("\n[TIP] Use 'packagepilot info <name>' for details")
+
+
+def cmd_scan_imports(args):
+    """Report which catalog packages a source tree actually imports."""
+    if not os.path.isdir(args.directory):
+        print(f"\n[!] Not a directory: {args.directory}")
+        return
+    
+    db = open_database()
+    scan = scan_imports(db, args.directory, workers=args.workers)
+    catalog = open_catalog(args) if args.shards else db
+    distributions = {module: distribution_name(module) for module in scan.imports}
+    found = catalog.get_packages_by_names(set(distributions.values()))
+    if catalog is not db:
+        catalog.close()
+    db.close()
+    
+    used = sorted(scan.imports, key=lambda module: (-scan.imports[module], module))
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.records(
+                {"module": module, "files": scan.imports[module],
+                 "distribution": distributions[module],
+                 "known": distributions[module] in found,
+                 "package": (package_record(found[distributions[module]])
+                             if distributions[module] in found else None)}
+                for module in used
+            )
+        return
+    
+    known = [module for module in used if distributions[module] in found]
+    unknown = [module for module in used if distributions[module] not in found]
+    print(f"\n[SCAN] {args.directory}: {scan.files} Python files "
+          f"({scan.parsed} parsed, {scan.files - scan.parsed} cached)\n")
+    
+    if known:
+        print(f"[PACKAGES] {len(known)} catalog packages in use:\n")
+    for module in known:
+        package = found[distributions[module]]
+        alias = f" (import {module})" if canonicalize_name(module) != distributions[module] else ""
+        print(f"  * {package.name}{alias} - {scan.imports[module]} file(s)  ({package.category})")
+    
+    if unknown:
+        print(f"\n[!] Third-party imports not in catalog ({len(unknown)}): {', '.join(unknown)}")
+    print("\n[TIP] Use 'packagepilot info <name>' for details")
+
+
+def cmd_sync(args):
+    """Ingest projects changed in a local PyPI mirror since the last sync."""
+    db = open_database()
+    report = sync_mirror(db, args.mirror, full=args.full)
+    related = refresh_related(db) if report.upserted or report.deleted else 0
+    db.close()
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.value({"previous_serial": report.previous_serial,
+                       "last_serial": report.last_serial, "changed": report.changed,
+                       "upserted": report.upserted, "missing": report.missing,
+                       "retried": report.retried, "deleted": report.deleted,
+                       "related_refreshed": related})
+        return
+    
+    if not (report.changed or report.retried or report.deleted):
+        print(f"\n[OK] Already up to date (serial {report.last_serial})")
+        return
+    
+    print(f"\n[OK] Synced {report.upserted} changed projects "
+          f"(serial {report.previous_serial} -> {report.last_serial})")
+    if report.retried:
+        print(f"[OK] Looked up {report.retried} projects missing from an earlier sync again")
+    if report.missing:
+        print(f"[!] {report.missing} projects had no JSON file in the mirror "
+              f"(retried by the next {MAX_SYNC_ATTEMPTS} syncs)")
+    if report.deleted:
+        print(f"[OK] Removed {report.deleted} packages the mirror no longer lists")
+    print(f"[OK] Refreshed related packages for {related} packages")
+
+
+def cmd_enrich(args):
+    """Fill package metadata from a PyPI-style JSON endpoint."""
+    db = open_database()
+    try:
+        enricher = Enricher(db, args.endpoint, args.concurrency, overwrite=args.overwrite)
+    except ValueError as e:
+        print(f"\n[!] {e}")
+        db.close()
+        return
+    report = enricher.run()
+    related = refresh_related(db) if report.updated else 0
+    db.close()
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.value({"fetched": report.fetched, "not_modified": report.not_modified,
+                       "missing": report.missing, "failed": report.failed,
+                       "updated": report.updated, "related_refreshed": related})
+        return
     
-    # Group by category
-    by_category = {}
-    for package in packages:
-        if package.category not in by_category:
-            by_category[package.category] = []
-        by_category[package.category].append(package)
+    print(f"\n[OK] Updated {report.updated} packages")
+    print(f"     Fetched: {report.fetched}  Not modified: {report.not_modified}  "
+          f"Not found: {report.missing}")
+    if report.failed:
+        print(f"[!] {report.failed} requests failed")
+    if related:
+        print(f"[OK] Refreshed related packages for {related} packages")
+
+
+def cmd_related(args):
+    """Show precomputed related packages, or refresh the related index."""
+    db = open_database()
+    
+    if args.refresh or args.rebuild:
+        count = refresh_related(db, full=args.rebuild)
+        if args.format == "text":
+            print(f"\n[OK] Recomputed related packages for {count} packages")
+        elif not args.package_name:
+            with OutputWriter(args.format) as out:
+                out.value({"refreshed": count})
+    
+    if not args.package_name:
+        if not (args.refresh or args.rebuild):
+            print("\n[!] Give a package name, or --refresh / --rebuild the index")
+        db.close()
+        return
+    
+    related = db.get_related(args.package_name, args.limit)
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.records(dict(package_record(package), similarity=round(score, 3))
+                        for package, score in related)
+        db.close()
+        return
     
-    for category, pkgs in sorted(by_category.items()):
-        print(f"\n{category.upper()} ({len(pkgs)}):")
-        for pkg in sorted(pkgs, key=lambda p: p.name):
-            desc = pkg.description[:60] + "..." if len(pkg.description) > 60 else pkg.description
-            print(f"  * {pkg.name:20} - {desc}")
+    if db.get_package_by_name(args.package_name) is None:
+        print(f"\n[!] Package '{args.package_name}' not found")
+        print("\n[TIP] Try searching: packagepilot search <keyword>")
+    elif not related:
+        print(f"\n[!] No related packages for '{args.package_name}'")
+        print("\n[TIP] Run 'packagepilot related --refresh' after adding packages")
+    else:
+        print(f"\n[RELATED] Packages similar to {args.package_name}:\n")
+        for package, score in related:
+            print(f"  * {package.name} ({score:.0%} similar)")
+            print(f"    {package.description}")
+            print()
+    db.close()
+
+
+def cmd_deps(args):
+    """Show transitive dependencies (or reverse dependencies) of a package."""
+    db = open_database()
+    graph = DependencyGraph.reachable_from(db, args.package_name, reverse=args.reverse)
+    known = args.package_name in graph or db.has_dependency_info(args.package_name)
+    db.close()
+    
+    results = graph.dependencies(args.package_name, reverse=args.reverse, max_depth=args.depth)
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.records({"name": name, "depth": depth, "specifier": specifier,
+                         "in_catalog": name in graph.catalog}
+                        for name, depth, specifier in results)
+        return
+    
+    if not known:
+        print(f"\n[!] No dependency information for '{args.package_name}'")
+        print("\n[TIP] Dependencies are recorded by seed_database.py")
+        return
+    
+    title = "REVERSE DEPENDENCIES" if args.reverse else "DEPENDENCIES"
+    print(f"\n[{title}] {args.package_name} ({len(results)} total):\n")
+    
+    if not results:
+        print("  (none)")
+    for name, depth, specifier in results:
+        marker = "*" if name in graph.catalog else " "
+        print(f"  {marker} [{depth}] {'  ' * (depth - 1)}{name} {specifier}".rstrip())
+    
+    print("\n[TIP] * = in the PackagePilot catalog")
+
+
+def cmd_shard(args):
+    """Partition the catalog into per-category (or hash bucket) shard files."""
+    db = open_database()
+    try:
+        sharded = ShardedDatabase.build(db, args.directory, buckets=args.buckets)
+    except FileExistsError as error:
+        print(f"\n[!] {error}")
+        db.close()
+        return
     
+    shard_counts = {key: shard.db.count_packages() for key, shard in sharded.shards.items()}
+    sharded.close()
     db.close()
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.value({"directory": args.directory, "shards": shard_counts})
+        return
+    
+    print(f"\n[OK] Wrote {len(shard_counts)} shards to {args.directory}:\n")
+    for key, count in shard_counts.items():
+        print(f"  {key:40} {count} packages")
+    print(f"\n[TIP] Use 'packagepilot --shards {args.directory} search <query>'")
 
 
 def cmd_stats(args):
     """Show database statistics - NEW COMMAND!"""
-    db = Database()
-    packages = db.get_all_packages()
+    db = open_database()
+    
+    if args.perf:
+        show_perf_stats(db, args.format)
+        db.close()
+        return
     
     # Category breakdown
-    by_category = {}
-    for package in packages:
-        by_category[package.category] = by_category.get(package.category, 0) + 1
+    by_category = db.get_category_counts()
+    total = sum(by_category.values())
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.value({"total_packages": total, "categories": by_category})
+        db.close()
+        return
     
     print("\n[STATISTICS] PackagePilot Database")
     print("="*60)
-    print(f"\nTotal Packages: {len(packages)}")
+    print(f"\nTotal Packages: {total}")
     print(f"\nPackages by Category:")
     
     # Sort by count (highest first)
@@ -212,6 +567,84 @@ def cmd_stats(args):
     db.close()
 
 
+def cmd_db_explain(args):
+    """Check the query plan of every statement the Database methods issue."""
+    try:
+        checks = explain_queries(args.catalog)
+    except ValueError as error:
+        print(f"\n[!] {error}")
+        sys.exit(1)
+    failed = [check for check in checks if check.violations]
+    
+    if args.format != "text":
+        with OutputWriter(args.format) as out:
+            out.records(
+                {"step": check.step, "method": check.method, "sql": " ".join(check.sql.split()),
+                 "plan": check.plan, "scans": check.scans, "violations": check.violations}
+                for check in checks
+            )
+    else:
+        print(f"\n[EXPLAIN] {len(checks)} statements from {len({c.step for c in checks})} "
+              f"Database calls\n")
+        for check in checks:
+            if not (check.violations or args.verbose):
+                continue
+            marker = "[!]" if check.violations else "[OK]"
+            scans = f"  (scans {', '.join(check.scans)})" if check.scans else ""
+            print(f"  {marker} {check.step}{scans}")
+            print(f"       {' '.join(check.sql.split())[:100]}")
+            for line in check.plan:
+                print(f"         {line}")
+        
+        if failed:
+            print(f"\n[!] {len(failed)} statements scan a table that should be searched "
+                  f"through an index")
+        else:
+            print("[OK] Every statement reaches packages and keyword terms through an index "
+                  "where one is expected")
+            if not args.verbose:
+                print("\n[TIP] Use --verbose to print every plan")
+    
+    if failed:
+        sys.exit(1)
+
+
+def _positive_int(value):
+    """argparse type for options that must be >= 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def show_perf_stats(db, fmt="text"):
+    """Print SQL statistics collected with PACKAGEPILOT_PERF=1."""
+    stats = load_perf_stats(db.perf_stats_path)
+    
+    if fmt != "text":
+        with OutputWriter(fmt) as out:
+            out.value(stats)
+        return
+    
+    print("\n[PERF] SQL statistics by Database method")
+    print("="*60)
+    
+    if not stats:
+        print("\n[!] No statistics recorded yet")
+        print("\n[TIP] Enable instrumentation, then run some commands:")
+        print("      PACKAGEPILOT_PERF=1 packagepilot search data")
+        return
+    
+    print("")
+    for line in format_perf_stats(stats):
+        print(line)
+    
+    print(f"\nStats file: {db.perf_stats_path}")
+    if db.slow_log_path.exists():
+        print(f"Slow-query log: {db.slow_log_path}")
+    print("="*60)
+
+
 def main():
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(
@@ -221,39 +654,152 @@ def main():
                "  packagepilot search 'web scraping'\n"
                "  packagepilot info requests\n"
                "  packagepilot category web\n"
-               "  packagepilot stats\n",
+               "  packagepilot stats\n"
+               "  packagepilot --timings search data\n",
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
+    parser.add_argument("--profile", nargs="?", const="", metavar="PATH",
+                        help="Profile the command with cProfile and write a .pstats file "
+                             "(default: packagepilot-<command>.pstats)")
+    parser.add_argument("--timings", action="store_true",
+                        help="Print a per-phase timing breakdown to stderr")
+    parser.add_argument("--shards", metavar="DIR",
+                        help="Read from a sharded catalog built with 'packagepilot shard'")
     
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
     
+    # Output format shared by every command
+    format_parent = argparse.ArgumentParser(add_help=False)
+    format_parent.add_argument("--format", choices=FORMATS, default="text",
+                               help="Output format (default: text)")
+    
     # Search command
-    search_parser = subparsers.add_parser("search", help="Search for packages")
+    search_parser = subparsers.add_parser("search", help="Search for packages",
+                                          parents=[format_parent])
     search_parser.add_argument("query", help="Search query")
+    search_parser.add_argument("--limit", type=_positive_int, default=5,
+                               help="Results per page (default: 5)")
+    search_parser.add_argument("--page", type=_positive_int, default=1,
+                               help="Page of results to show (default: 1)")
+    search_parser.add_argument("--sql-rank", action="store_true",
+                               help="Rank inside SQLite and fetch only the shown page")
     search_parser.set_defaults(func=cmd_search)
     
     # Info command
-    info_parser = subparsers.add_parser("info", help="Get detailed package info")
+    info_parser = subparsers.add_parser("info", help="Get detailed package info",
+                                        parents=[format_parent])
     info_parser.add_argument("package_name", help="Package name")
     info_parser.set_defaults(func=cmd_info)
     
     # Category command
-    category_parser = subparsers.add_parser("category", help="List packages in category")
+    category_parser = subparsers.add_parser("category", help="List packages in category",
+                                            parents=[format_parent])
     category_parser.add_argument("category_name", help="Category name")
+    category_parser.add_argument("--top", type=_positive_int, metavar="N",
+                                 help="Show the N most popular packages")
     category_parser.set_defaults(func=cmd_category)
     
     # Categories command
-    categories_parser = subparsers.add_parser("categories", help="List all categories")
+    categories_parser = subparsers.add_parser("categories", help="List all categories",
+                                              parents=[format_parent])
     categories_parser.set_defaults(func=cmd_categories)
     
     # List command
-    list_parser = subparsers.add_parser("list", help="List all packages")
+    list_parser = subparsers.add_parser("list", help="List all packages",
+                                        parents=[format_parent])
     list_parser.set_defaults(func=cmd_list)
     
     # Stats command (NEW!)
-    stats_parser = subparsers.add_parser("stats", help="Show database statistics")
+    stats_parser = subparsers.add_parser("stats", help="Show database statistics",
+                                         parents=[format_parent])
+    stats_parser.add_argument("--perf", action="store_true",
+                              help="Show SQL statistics recorded with PACKAGEPILOT_PERF=1")
     stats_parser.set_defaults(func=cmd_stats)
     
+    # Reindex command
+    reindex_parser = subparsers.add_parser("reindex", help="Rebuild normalized search columns",
+                                           parents=[format_parent])
+    reindex_parser.set_defaults(func=cmd_reindex)
+    
+    # Scan command
+    scan_parser = subparsers.add_parser("scan", help="Look up a project's requirements",
+                                        parents=[format_parent])
+    scan_parser.add_argument("path", help="requirements.txt or pyproject.toml")
+    scan_parser.set_defaults(func=cmd_scan)
+    
+    # Scan-imports command
+    scan_imports_parser = subparsers.add_parser("scan-imports",
+                                                help="Find catalog packages a source tree imports",
+                                                parents=[format_parent])
+    scan_imports_parser.add_argument("directory", help="Source tree to scan")
+    scan_imports_parser.add_argument("--workers", type=_positive_int,
+                                     help="Parser processes (default: one per core)")
+    scan_imports_parser.set_defaults(func=cmd_scan_imports)
+    
+    # Sync command
+    sync_parser = subparsers.add_parser("sync", help="Update the catalog from a local PyPI mirror",
+                                        parents=[format_parent])
+    sync_parser.add_argument("--mirror", required=True, metavar="PATH",
+                             help="Mirror root (simple/index.json and pypi/<name>/json)")
+    sync_parser.add_argument("--full", action="store_true",
+                             help="Ignore the recorded serial and re-ingest every project")
+    sync_parser.set_defaults(func=cmd_sync)
+    
+    # Enrich command
+    enrich_parser = subparsers.add_parser("enrich", help="Fill package metadata from a JSON endpoint",
+                                          parents=[format_parent])
+    enrich_parser.add_argument("--endpoint", required=True,
+                               help="URL template with {name}, e.g. "
+                                    "http://127.0.0.1:8000/pypi/{name}/json")
+    enrich_parser.add_argument("--concurrency", type=_positive_int, default=DEFAULT_CONCURRENCY,
+                               help=f"Requests in flight (default: {DEFAULT_CONCURRENCY})")
+    enrich_parser.add_argument("--overwrite", action="store_true",
+                               help="Replace existing descriptions and URLs, not just empty ones")
+    enrich_parser.set_defaults(func=cmd_enrich)
+    
+    # Related command
+    related_parser = subparsers.add_parser("related", help="Show similar packages",
+                                           parents=[format_parent])
+    related_parser.add_argument("package_name", nargs="?", help="Package name")
+    related_parser.add_argument("--limit", type=_positive_int, default=10,
+                                help="Maximum number of packages to show (default: 10)")
+    related_parser.add_argument("--refresh", action="store_true",
+                                help="Update the related index for changed packages first")
+    related_parser.add_argument("--rebuild", action="store_true",
+                                help="Rebuild the whole related index first")
+    related_parser.set_defaults(func=cmd_related)
+    
+    # Deps command
+    deps_parser = subparsers.add_parser("deps", help="Show transitive dependencies",
+                                        parents=[format_parent])
+    deps_parser.add_argument("package_name", help="Package name")
+    deps_parser.add_argument("--reverse", action="store_true",
+                             help="Show packages that end up pulling in this package")
+    deps_parser.add_argument("--depth", type=_positive_int,
+                             help="Only follow N levels (default: full closure)")
+    deps_parser.set_defaults(func=cmd_deps)
+    
+    # Shard command
+    shard_parser = subparsers.add_parser("shard", help="Split the catalog into shard files",
+                                         parents=[format_parent])
+    shard_parser.add_argument("directory", help="Directory for the shard files")
+    shard_parser.add_argument("--buckets", type=_positive_int,
+                              help="Hash categories into N shards (default: one per category)")
+    shard_parser.set_defaults(func=cmd_shard)
+    
+    # Database maintenance commands
+    db_parser = subparsers.add_parser("db", help="Database maintenance tools")
+    db_subparsers = db_parser.add_subparsers(dest="db_command", required=True,
+                                             metavar="{explain}")
+    explain_parser = db_subparsers.add_parser(
+        "explain", parents=[format_parent],
+        help="Fail if a query plan scans a table where an index is expected")
+    explain_parser.add_argument("--catalog", metavar="PATH",
+                                help="Catalog database to check (default: the installed one)")
+    explain_parser.add_argument("--verbose", action="store_true",
+                                help="Print every plan, not just the failing ones")
+    explain_parser.set_defaults(func=cmd_db_explain)
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -264,7 +810,40 @@ def main():
         return
     
     # Call the appropriate command function
-    args.func(args)
+    run_command(args)
+
+
+def run_command(args):
+    """Run the selected command, with optional profiling and phase timings."""
+    if args.timings:
+        TIMER.enabled = True
+        TIMER.add("import", _IMPORT_END - _IMPORT_START)
+    
+    profiler = cProfile.Profile() if args.profile is not None else None
+    
+    try:
+        # Time not claimed by the database or ranking layers is output formatting
+        with TIMER.phase("output"):
+            if profiler:
+                profiler.runcall(args.func, args)
+            else:
+                args.func(args)
+    except BrokenPipeError:
+        # Output was piped into a command that exited early (e.g. head)
+        sys.stdout = open(os.devnull, "w")
+        sys.exit(1)
+    finally:
+        if profiler:
+            path = args.profile or f"packagepilot-{args.command}.pstats"
+            profiler.dump_stats(path)
+            print(f"\n[PROFILE] Written to {path}", file=sys.stderr)
+            print(f"          View with: python -m pstats {path}", file=sys.stderr)
+        
+        if args.timings:
+            TIMER.enabled = False
+            print(f"\n[TIMINGS] {args.command}", file=sys.stderr)
+            for line in TIMER.report():
+                print(line, file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -1,22 +1,261 @@
 """
 Database operations for PackagePilot
 """
+import math
+import os
 import sqlite3
+import sys
+import time
+from array import array
 from pathlib import Path
-from typing import List, Optional
-from .models import Package
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from .deps import canonicalize_name, parse_requirement
+from .migrations import DEFERRED_INDEXES, Progress, create_index, migrate
+from .models import Package, SearchHit
+from .normalize import (has_word, join_tokens, normalize_text, query_term_rows, split_tokens,
+                        token_set)
+from .perf import (DEFAULT_SLOW_QUERY_MS, PERF_STATS_FILE, SLOW_LOG_FILE, QueryInstrumentation,
+                   default_perf_dir)
+from .timing import TIMER
+
+
+# Ranking points per decade of popularity (10 -> 2 points, 1000 -> 6 points)
+POPULARITY_WEIGHT = 2.0
+
+
+def popularity_boost(popularity: Optional[float]) -> float:
+    """
+    Ranking points for a popularity value, on a log scale.
+    
+    Registered as an SQL function so search_ranked() scores exactly like
+    search.rank_results().
+    
+    Args:
+        popularity: Package popularity (None or negative counts as 0)
+        
+    Returns:
+        POPULARITY_WEIGHT * log10(1 + popularity)
+    """
+    if not popularity or popularity < 0:
+        return 0.0
+    return POPULARITY_WEIGHT * math.log10(1 + popularity)
+
+
+# change_log entries kept when a connection that wrote is closed
+CHANGE_LOG_KEEP = 100_000
+
+
+# PRAGMAs applied when a connection is opened, by tuning profile name.
+# cache_size is in KiB when negative; query_only is set after migrations.
+TUNING_PROFILES = {
+    "default": {},
+    # Long-lived readers: big page cache, memory-mapped reads, no writes
+    "read_heavy": {
+        "cache_size": -262144,  # 256 MiB
+        "mmap_size": 1 << 30,  # 1 GiB
+        "temp_store": "MEMORY",
+        "query_only": "ON",
+    },
+    # Seeding, syncs and shard builds: WAL without an fsync per commit, and
+    # the DEFERRED_INDEXES dropped until close(), so it needs exclusive access.
+    # NORMAL is the fastest level that keeps a WAL database consistent after a crash.
+    "bulk_load": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -262144,
+        "temp_store": "MEMORY",
+    },
+    # A long-lived writer next to readers: in WAL mode readers keep reading
+    # the last commit while a write is in progress. The mode stays on the file.
+    "concurrent": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+    },
+}
+
+
+def _term_match_sql(column: str, term: str, literal: str) -> str:
+    """
+    SQL testing whether a column matches a query term.
+    
+    Terms typed by the user match as substrings (instr); synonym expansions
+    (literal = 0) must also occur as whole words, so 'orm' does not match
+    'formatting'. has_word() only runs on rows instr() already found.
+    """
+    return (f"CASE WHEN instr({column}, {term}) = 0 THEN 0 WHEN {literal} THEN 1 "
+            f"ELSE has_word({column}, {term}) END")
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """Cursor that charges statement execution and fetching to the 'sql' phase."""
+    
+    def execute(self, sql, parameters=()):
+        with TIMER.phase("sql"):
+            return super().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        with TIMER.phase("sql"):
+            return super().executemany(sql, seq_of_parameters)
+    
+    def fetchone(self):
+        with TIMER.phase("sql"):
+            return super().fetchone()
+    
+    def fetchmany(self, size=None):
+        with TIMER.phase("sql"):
+            return super().fetchmany(self.arraysize if size is None else size)
+    
+    def fetchall(self):
+        with TIMER.phase("sql"):
+            return super().fetchall()
+    
+    def __next__(self):
+        with TIMER.phase("sql"):
+            return super().__next__()
+
+
+class _InstrumentedCursor(_TimedCursor):
+    """
+    Cursor that records every statement in a QueryInstrumentation.
+    
+    A statement's latency covers execution plus fetching its rows, so it
+    is recorded once the rows are fetched (or right away for statements
+    that return no rows). Rows read with fetchmany() or by iterating the
+    cursor add up until it is exhausted, the next statement runs or the
+    cursor is closed; streaming generators close theirs in a finally, so a
+    partly consumed stream is still recorded.
+    """
+    
+    perf = None
+    method = "unknown"
+    _pending = None
+    
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._pending = [sql, parameters, time.perf_counter() - start, 0]
+        if self.description is None:
+            self._finish(max(self.rowcount, 0))
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._pending = [sql, (), time.perf_counter() - start, 0]
+        self._finish(max(self.rowcount, 0))
+        return self
+    
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), time.perf_counter() - start)
+        if not rows:
+            self._finish()
+        return rows
+    
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(0, time.perf_counter() - start)
+            self._finish()
+            raise
+        self._fetched(1, time.perf_counter() - start)
+        return row
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._finish(0 if row is None else 1, time.perf_counter() - start)
+        return row
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._finish(len(rows), time.perf_counter() - start)
+        return rows
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def _fetched(self, rows: int, seconds: float):
+        """Add rows read from the pending statement and the time spent reading them."""
+        if self._pending is not None:
+            self._pending[2] += seconds
+            self._pending[3] += rows
+    
+    def _finish(self, rows: int = 0, fetch_seconds: float = 0.0):
+        """Record the pending statement, if any."""
+        if self._pending is None:
+            return
+        sql, parameters, elapsed, fetched = self._pending
+        self._pending = None
+        self.perf.record(self.method, sql, parameters, (elapsed + fetch_seconds) * 1000,
+                         fetched + rows, self.connection)
 
 
 class Database:
     """Handles all database operations for PackagePilot."""
     
-    def __init__(self, db_path: str = None):
+    # Packages with their keyword terms joined by char(31)
+    _SELECT_WITH_KEYWORDS_SQL = """
+        SELECT p.*, (SELECT group_concat(t.term, char(31)) FROM package_terms pt
+                     JOIN terms t ON t.id = pt.term_id
+                     WHERE pt.package_id = p.id) AS keyword_list
+        FROM packages p
+    """
+    
+    _INSERT_PACKAGE_SQL = """
+        INSERT INTO packages (name, description, category, install_command, 
+                             code_example, pypi_url, github_url, documentation_url,
+                             popularity, name_norm, description_norm, category_norm, tokens,
+                             canonical_name)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    def __init__(self, db_path: str = None, instrument: Optional[bool] = None,
+                 slow_query_ms: Optional[float] = None, in_memory: bool = False,
+                 check_same_thread: bool = True,
+                 migration_progress: Optional[Progress] = None,
+                 tuning_profile: Optional[str] = None, perf_dir: Optional[str] = None):
         """
         Initialize database connection.
         
         Args:
             db_path: Path to SQLite database file. If None, uses default location.
+            instrument: Record per-method SQL statistics (default: the
+                PACKAGEPILOT_PERF environment variable)
+            slow_query_ms: Slow-query log threshold (default: the
+                PACKAGEPILOT_SLOW_QUERY_MS environment variable, else 100)
+            in_memory: Copy the database file into RAM at startup and run every
+                query against the copy; use save_to_disk() to write changes back
+            check_same_thread: Passed to sqlite3.connect(); set to False when
+                the caller serializes access from several threads itself
+            migration_progress: Called with (description, done, total) while
+                schema migrations backfill existing rows
+            tuning_profile: Name of a TUNING_PROFILES entry (default: the
+                PACKAGEPILOT_DB_PROFILE environment variable, else "default").
+                "read_heavy" connections reject writes; "bulk_load" drops the
+                deferred search indexes until close() and needs exclusive
+                access to the file; "concurrent" leaves the file in WAL mode
+            perf_dir: Directory for perf_stats.json and slow_queries.log
+                (default: PACKAGEPILOT_PERF_DIR, else the per-user state directory)
+                
+        Raises:
+            ValueError: Unknown tuning profile
         """
+        if tuning_profile is None:
+            tuning_profile = os.environ.get("PACKAGEPILOT_DB_PROFILE") or "default"
+        if tuning_profile not in TUNING_PROFILES:
+            raise ValueError(f"Unknown tuning profile '{tuning_profile}' "
+                             f"(choose from: {', '.join(TUNING_PROFILES)})")
+        self.tuning_profile = tuning_profile
+        pragmas = TUNING_PROFILES[tuning_profile]
+        
         if db_path is None:
             # Default to data/packages.db in the package directory
             package_dir = Path(__file__).parent
@@ -24,40 +263,118 @@ class Database:
         
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.connection = sqlite3.connect(str(self.db_path))
-        self.connection.row_factory = sqlite3.Row  # Access columns by name
-        self._create_tables()
+        
+        # Optional SQL instrumentation; stats are merged into perf_stats.json on close
+        if instrument is None:
+            instrument = os.environ.get("PACKAGEPILOT_PERF", "").lower() in ("1", "true", "yes")
+        if slow_query_ms is None:
+            slow_query_ms = float(os.environ.get("PACKAGEPILOT_SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS))
+        perf_dir = Path(perf_dir) if perf_dir is not None else default_perf_dir()
+        self.perf_stats_path = perf_dir / PERF_STATS_FILE
+        self.slow_log_path = perf_dir / SLOW_LOG_FILE
+        self.perf = QueryInstrumentation(slow_query_ms, self.slow_log_path) if instrument else None
+        
+        self.in_memory = in_memory
+        with TIMER.phase("db_open"):
+            if in_memory:
+                self.connection = sqlite3.connect(":memory:", check_same_thread=check_same_thread)
+                source = sqlite3.connect(str(self.db_path))
+                try:
+                    source.backup(self.connection)
+                finally:
+                    source.close()
+            else:
+                self.connection = sqlite3.connect(str(self.db_path),
+                                                  check_same_thread=check_same_thread)
+            self.connection.row_factory = sqlite3.Row  # Access columns by name
+            self.connection.create_function("popularity_boost", 1, popularity_boost)
+            self.connection.create_function("has_word", 2, has_word)
+            
+            self._journal_mode = self.connection.execute("PRAGMA journal_mode").fetchone()[0]
+            for name, value in pragmas.items():
+                if name != "query_only":
+                    self.connection.execute(f"PRAGMA {name} = {value}")
+        with TIMER.phase("migrate"):
+            self.migrations_applied = migrate(self.connection, migration_progress)
+            # A bulk load drops the deferred indexes until close(). It needs
+            # exclusive access, so indexes missing at any other writable open
+            # belong to a load that crashed or was killed; rebuild them then.
+            # Opens with every index in place (and read_heavy opens) never write.
+            if tuning_profile == "bulk_load":
+                for name in DEFERRED_INDEXES:
+                    self.connection.execute(f"DROP INDEX IF EXISTS {name}")
+            elif "query_only" not in pragmas and self.missing_deferred_indexes():
+                self.build_deferred_indexes()
+        if "query_only" in pragmas:
+            self.connection.execute(f"PRAGMA query_only = {pragmas['query_only']}")
     
-    def _create_tables(self):
-        """Create database tables if they don't exist."""
-        cursor = self.connection.cursor()
+    def _cursor(self) -> sqlite3.Cursor:
+        """
+        Create a cursor for a Database method.
         
-        # Create packages table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS packages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                description TEXT NOT NULL,
-                category TEXT NOT NULL,
-                install_command TEXT NOT NULL,
-                code_example TEXT NOT NULL,
-                pypi_url TEXT NOT NULL,
-                github_url TEXT,
-                documentation_url TEXT
-            )
-        """)
+        Instrumented cursors are tagged with the calling method's name; when
+        neither instrumentation nor --timings is on, this is a plain cursor.
+        """
+        if self.perf is not None:
+            cursor = self.connection.cursor(_InstrumentedCursor)
+            cursor.perf = self.perf
+            cursor.method = sys._getframe(1).f_code.co_name
+            return cursor
+        if TIMER.enabled:
+            return self.connection.cursor(_TimedCursor)
+        return self.connection.cursor()
+    
+    def reindex(self) -> int:
+        """
+        Recompute normalized columns, token sets and keyword terms for every package.
         
-        # Create keywords table for better searching
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS keywords (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                package_id INTEGER NOT NULL,
-                keyword TEXT NOT NULL,
-                FOREIGN KEY (package_id) REFERENCES packages (id)
-            )
-        """)
+        Terms that normalize to the same text are merged, and terms no
+        package refers to any more are dropped. Search indexes missing after
+        an interrupted bulk load are rebuilt.
+        
+        Returns:
+            Number of packages reindexed
+        """
+        self.build_deferred_indexes()
+        cursor = self._cursor()
         
+        for row in cursor.execute("SELECT id, term FROM terms").fetchall():
+            term = normalize_text(row["term"])
+            if term == row["term"]:
+                continue
+            for term_id in self._term_ids(cursor, [term]):
+                cursor.execute("""
+                    INSERT OR IGNORE INTO package_terms (package_id, term_id)
+                    SELECT package_id, ? FROM package_terms WHERE term_id = ?
+                """, (term_id, row["id"]))
+            cursor.execute("DELETE FROM package_terms WHERE term_id = ?", (row["id"],))
+            cursor.execute("DELETE FROM terms WHERE id = ?", (row["id"],))
+        cursor.execute("DELETE FROM terms WHERE id NOT IN (SELECT term_id FROM package_terms)")
+        
+        keywords = {}
+        for row in cursor.execute("""
+            SELECT pt.package_id, t.term FROM package_terms pt JOIN terms t ON t.id = pt.term_id
+        """).fetchall():
+            keywords.setdefault(row[0], []).append(row[1])
+        
+        rows = cursor.execute("SELECT id, name, description, category FROM packages").fetchall()
+        cursor.executemany("""
+            UPDATE packages
+            SET name_norm = ?, description_norm = ?, category_norm = ?, tokens = ?
+            WHERE id = ?
+        """, (
+            (
+                normalize_text(row["name"]),
+                normalize_text(row["description"]),
+                normalize_text(row["category"]),
+                join_tokens(token_set(row["name"], row["description"], row["category"],
+                                      *keywords.get(row["id"], []))),
+                row["id"]
+            )
+            for row in rows
+        ))
         self.connection.commit()
+        return len(rows)
     
     def add_package(self, package: Package) -> int:
         """
@@ -69,12 +386,165 @@ class Database:
         Returns:
             The ID of the newly added package
         """
-        cursor = self.connection.cursor()
+        cursor = self._cursor()
+        cursor.execute(self._INSERT_PACKAGE_SQL, self._package_values(package))
+        self.connection.commit()
+        return cursor.lastrowid
+    
+    def add_packages(self, items: Iterable[Tuple[Package, List[str]]]) -> int:
+        """
+        Add many packages with their keywords in a single transaction.
+        
+        Args:
+            items: Iterable of (Package, keywords) tuples
+            
+        Returns:
+            Number of packages added
+        """
+        cursor = self._cursor()
+        added = 0
+        with self.connection:
+            for package, keywords in items:
+                keywords = [normalize_text(keyword) for keyword in keywords]
+                cursor.execute(self._INSERT_PACKAGE_SQL, self._package_values(package, keywords))
+                self._add_package_terms(cursor, cursor.lastrowid, keywords)
+                added += 1
+        return added
+    
+    def upsert_packages(self, items: Iterable[Tuple[Package, List[str], Optional[List[str]]]]) -> int:
+        """
+        Insert or update many packages in a single transaction.
+        
+        Packages are matched by PEP 503 name, so 'typing_extensions' updates
+        'typing-extensions'. An existing package gets the new non-empty
+        fields; empty ones (description, category, install command, code
+        example, URLs) keep their stored values, keywords are merged with
+        the stored ones and popularity is left untouched.
+        
+        Args:
+            items: Iterable of (Package, keywords, requirements) tuples;
+                requirements of None leave stored dependencies untouched
+            
+        Returns:
+            Number of packages inserted or updated
+        """
+        cursor = self._cursor()
+        upserted = 0
+        with self.connection:
+            for package, keywords, requirements in items:
+                keywords = [normalize_text(keyword) for keyword in keywords]
+                values = self._package_values(package, keywords)
+                row = cursor.execute("SELECT MIN(id) FROM packages WHERE canonical_name = ?",
+                                     (values[13],)).fetchone()
+                if row[0] is None:
+                    cursor.execute(self._INSERT_PACKAGE_SQL, values)
+                    package_id = cursor.lastrowid
+                    self._add_package_terms(cursor, package_id, keywords)
+                else:
+                    package_id = row[0]
+                    cursor.execute("""
+                        UPDATE packages
+                        SET name = ?,
+                            description = COALESCE(NULLIF(?, ''), description),
+                            category = COALESCE(NULLIF(?, ''), category),
+                            install_command = COALESCE(NULLIF(?, ''), install_command),
+                            code_example = COALESCE(NULLIF(?, ''), code_example),
+                            pypi_url = COALESCE(NULLIF(?, ''), pypi_url),
+                            github_url = COALESCE(NULLIF(?, ''), github_url),
+                            documentation_url = COALESCE(NULLIF(?, ''), documentation_url),
+                            name_norm = ?,
+                            canonical_name = ?
+                        WHERE id = ?
+                    """, values[:8] + (values[9], values[13], package_id))
+                    self._add_package_terms(cursor, package_id, keywords)
+                    self._renormalize(cursor, package_id)
+                
+                if requirements is not None:
+                    self._replace_dependencies(cursor, package_id, requirements)
+                upserted += 1
+        return upserted
+    
+    def enrich_packages(self, updates: Iterable[Tuple[int, str, Optional[str], Optional[str], List[str]]],
+                        overwrite: bool = False) -> int:
+        """
+        Apply fetched metadata to many packages in a single transaction.
+        
+        Keywords are merged with the stored ones, and the normalized
+        columns and token set are recomputed.
+        
+        Args:
+            updates: (package id, description, documentation url, github url,
+                keywords) tuples
+            overwrite: Replace non-empty descriptions and URLs (default: only
+                fill empty ones)
+            
+        Returns:
+            Number of packages updated
+        """
+        def merge(column):
+            # Empty new values never replace stored ones
+            if overwrite:
+                return f"{column} = COALESCE(NULLIF(?, ''), {column})"
+            return f"{column} = COALESCE(NULLIF({column}, ''), ?)"
+        
+        cursor = self._cursor()
+        updated = 0
+        with self.connection:
+            for package_id, description, documentation_url, github_url, keywords in updates:
+                cursor.execute(f"""
+                    UPDATE packages
+                    SET {merge("description")}, {merge("documentation_url")}, {merge("github_url")}
+                    WHERE id = ?
+                """, (description, documentation_url, github_url, package_id))
+                if not cursor.rowcount:
+                    continue
+                
+                self._add_package_terms(cursor, package_id,
+                                        [normalize_text(keyword) for keyword in keywords])
+                self._renormalize(cursor, package_id)
+                updated += 1
+        return updated
+    
+    def delete_packages(self, package_ids: Iterable[int]) -> int:
+        """
+        Remove packages with their keywords and dependencies, in a single transaction.
+        
+        Their related-packages entries are left for refresh_related(), which
+        drops them and recomputes the lists that pointed at them.
+        
+        Args:
+            package_ids: IDs of packages to delete
+            
+        Returns:
+            Number of packages deleted
+        """
+        cursor = self._cursor()
+        deleted = 0
+        with self.connection:
+            for package_id in package_ids:
+                cursor.execute("DELETE FROM package_terms WHERE package_id = ?", (package_id,))
+                cursor.execute("DELETE FROM dependencies WHERE package_id = ?", (package_id,))
+                cursor.execute("DELETE FROM packages WHERE id = ?", (package_id,))
+                deleted += cursor.rowcount
+        return deleted
+    
+    def _renormalize(self, cursor: sqlite3.Cursor, package_id: int):
+        """Recompute a package's normalized columns and token set from its stored row and keywords."""
+        row = cursor.execute("SELECT name, description, category FROM packages WHERE id = ?",
+                             (package_id,)).fetchone()
+        keywords = [term for term, in cursor.execute("""
+            SELECT t.term FROM package_terms pt JOIN terms t ON t.id = pt.term_id
+            WHERE pt.package_id = ?
+        """, (package_id,))]
         cursor.execute("""
-            INSERT INTO packages (name, description, category, install_command, 
-                                 code_example, pypi_url, github_url, documentation_url)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+            UPDATE packages SET description_norm = ?, category_norm = ?, tokens = ? WHERE id = ?
+        """, (normalize_text(row["description"]), normalize_text(row["category"]),
+              join_tokens(token_set(row["name"], row["description"], row["category"], *keywords)),
+              package_id))
+    
+    def _package_values(self, package: Package, keywords: Iterable[str] = ()) -> tuple:
+        """Build the INSERT parameters for a package, including normalized columns."""
+        return (
             package.name,
             package.description,
             package.category,
@@ -82,10 +552,14 @@ class Database:
             package.code_example,
             package.pypi_url,
             package.github_url,
-            package.documentation_url
-        ))
-        self.connection.commit()
-        return cursor.lastrowid
+            package.documentation_url,
+            package.popularity,
+            normalize_text(package.name),
+            normalize_text(package.description),
+            normalize_text(package.category),
+            join_tokens(token_set(package.name, package.description, package.category, *keywords)),
+            canonicalize_name(package.name)
+        )
     
     def add_keywords(self, package_id: int, keywords: List[str]):
         """
@@ -95,45 +569,818 @@ class Database:
             package_id: ID of the package
             keywords: List of keywords to associate with the package
         """
-        cursor = self.connection.cursor()
-        for keyword in keywords:
-            cursor.execute("""
-                INSERT INTO keywords (package_id, keyword)
-                VALUES (?, ?)
-            """, (package_id, keyword.lower()))
+        cursor = self._cursor()
+        keywords = [normalize_text(keyword) for keyword in keywords]
+        self._add_package_terms(cursor, package_id, keywords)
+        
+        # Fold the keywords into the package's stored token set
+        row = cursor.execute("SELECT tokens FROM packages WHERE id = ?", (package_id,)).fetchone()
+        if row is not None:
+            tokens = split_tokens(row["tokens"]) | token_set(*keywords)
+            cursor.execute("UPDATE packages SET tokens = ? WHERE id = ?",
+                           (join_tokens(tokens), package_id))
+        self.connection.commit()
+    
+    def _term_ids(self, cursor: sqlite3.Cursor, terms: Iterable[str]) -> List[int]:
+        """Get the dictionary ids of normalized terms, adding new ones (without committing)."""
+        terms = list(dict.fromkeys(term for term in terms if term))
+        cursor.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)",
+                           ((term,) for term in terms))
+        term_ids = []
+        for start in range(0, len(terms), 500):
+            chunk = terms[start:start + 500]
+            cursor.execute(f"SELECT id FROM terms WHERE term IN "
+                           f"({', '.join('?' for _ in chunk)})", chunk)
+            term_ids += [row[0] for row in cursor.fetchall()]
+        return term_ids
+    
+    def _add_package_terms(self, cursor: sqlite3.Cursor, package_id: int, keywords: Iterable[str]):
+        """Link normalized keywords to a package, ignoring ones it already has (without committing)."""
+        cursor.executemany(
+            "INSERT OR IGNORE INTO package_terms (package_id, term_id) VALUES (?, ?)",
+            ((package_id, term_id) for term_id in self._term_ids(cursor, keywords))
+        )
+    
+    def set_popularity(self, scores: Dict[str, float]) -> int:
+        """
+        Update the popularity of packages by name.
+        
+        Args:
+            scores: Mapping of package name -> popularity (e.g. monthly downloads)
+            
+        Returns:
+            Number of packages updated
+        """
+        cursor = self._cursor()
+        cursor.executemany("UPDATE packages SET popularity = ? WHERE name_norm = ?",
+                           ((score, normalize_text(name)) for name, score in scores.items()))
+        self.connection.commit()
+        return cursor.rowcount
+    
+    def add_dependencies(self, package_id: int, requirements: List[str]):
+        """
+        Record the requirements of a package, replacing any earlier entries.
+        
+        Args:
+            package_id: ID of the package
+            requirements: Requirement strings, e.g. ['numpy>=1.20', 'pandas']
+        """
+        self._replace_dependencies(self._cursor(), package_id, requirements)
+        self.connection.commit()
+    
+    def _replace_dependencies(self, cursor: sqlite3.Cursor, package_id: int,
+                              requirements: List[str]):
+        """Replace a package's dependency rows (without committing)."""
+        parsed = [parse_requirement(requirement) for requirement in requirements]
+        cursor.execute("DELETE FROM dependencies WHERE package_id = ?", (package_id,))
+        cursor.executemany("""
+            INSERT OR REPLACE INTO dependencies (package_id, requirement, specifier)
+            VALUES (?, ?, ?)
+        """, ((package_id, name, specifier) for name, specifier in filter(None, parsed)))
+    
+    def get_dependency_edges(self) -> List[Tuple[str, str, str]]:
+        """
+        Get every dependency edge in one query.
+        
+        Returns:
+            List of (package name, requirement, specifier) tuples
+        """
+        cursor = self._cursor()
+        cursor.execute("""
+            SELECT p.name, d.requirement, d.specifier
+            FROM dependencies d JOIN packages p ON p.id = d.package_id
+        """)
+        return [tuple(row) for row in cursor.fetchall()]
+    
+    def get_dependency_subgraph(self, name: str,
+                                reverse: bool = False) -> List[Tuple[str, str, str]]:
+        """
+        Get the dependency edges reachable from one package, in one query.
+        
+        A recursive CTE walks the graph from the package (towards its
+        requirements, or towards its dependents with reverse) over the
+        indexed canonical_name and requirement columns, so only the part of
+        the graph a single `deps` query needs is read.
+        
+        Args:
+            name: Package name
+            reverse: Follow edges from requirements to the packages needing them
+            
+        Returns:
+            List of (package name, requirement, specifier) tuples, names
+            PEP 503 canonical
+        """
+        if reverse:
+            sql = """
+                WITH RECURSIVE reached(name) AS (
+                    SELECT ?
+                    UNION
+                    SELECT p.canonical_name FROM reached
+                    JOIN dependencies d ON d.requirement = reached.name
+                    JOIN packages p ON p.id = d.package_id
+                )
+                SELECT p.canonical_name, d.requirement, d.specifier FROM reached
+                JOIN dependencies d ON d.requirement = reached.name
+                JOIN packages p ON p.id = d.package_id
+            """
+        else:
+            sql = """
+                WITH RECURSIVE reached(name) AS (
+                    SELECT ?
+                    UNION
+                    SELECT d.requirement FROM reached
+                    JOIN packages p ON p.canonical_name = reached.name
+                    JOIN dependencies d ON d.package_id = p.id
+                )
+                SELECT p.canonical_name, d.requirement, d.specifier FROM reached
+                JOIN packages p ON p.canonical_name = reached.name
+                JOIN dependencies d ON d.package_id = p.id
+            """
+        cursor = self._cursor()
+        cursor.execute(sql, (canonicalize_name(name),))
+        return [tuple(row) for row in cursor.fetchall()]
+    
+    def has_dependency_info(self, name: str) -> bool:
+        """
+        Check whether a package has recorded dependencies or dependents.
+        
+        Args:
+            name: Package name
+            
+        Returns:
+            True if the package appears on either side of a dependency edge
+        """
+        name = canonicalize_name(name)
+        cursor = self._cursor()
+        cursor.execute("""
+            SELECT EXISTS (SELECT 1 FROM dependencies WHERE requirement = ?)
+                OR EXISTS (SELECT 1 FROM packages p JOIN dependencies d ON d.package_id = p.id
+                           WHERE p.canonical_name = ?)
+        """, (name, name))
+        return bool(cursor.fetchone()[0])
+    
+    def get_package_names(self) -> List[str]:
+        """
+        Get the names of all packages without loading the packages.
+        
+        Returns:
+            List of package names
+        """
+        cursor = self._cursor()
+        cursor.execute("SELECT name FROM packages")
+        return [row[0] for row in cursor.fetchall()]
+    
+    def iter_package_tokens(self, batch_size: int = 1000) -> Iterator[Tuple[int, str]]:
+        """
+        Stream the stored token set of every package.
+        
+        Args:
+            batch_size: Rows fetched from SQLite at a time
+            
+        Returns:
+            Iterator of (package id, tokens column value) tuples
+        """
+        cursor = self._cursor()
+        try:
+            cursor.execute("SELECT id, tokens FROM packages")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0], row[1]
+        finally:
+            cursor.close()  # Records the statement even if the caller stopped early
+    
+    def get_package_tokens(self, package_ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Get the stored token sets of some packages.
+        
+        Args:
+            package_ids: Package IDs
+            
+        Returns:
+            Mapping of package id -> tokens column value
+        """
+        cursor = self._cursor()
+        package_ids = list(package_ids)
+        tokens = {}
+        for start in range(0, len(package_ids), 500):
+            chunk = package_ids[start:start + 500]
+            cursor.execute(f"SELECT id, tokens FROM packages WHERE id IN "
+                           f"({', '.join('?' for _ in chunk)})", chunk)
+            tokens.update((row[0], row[1]) for row in cursor.fetchall())
+        return tokens
+    
+    def get_minhash_checksums(self) -> Dict[int, int]:
+        """
+        Get the token checksum each stored MinHash signature was computed from.
+        
+        Returns:
+            Mapping of package id -> checksum
+        """
+        cursor = self._cursor()
+        cursor.execute("SELECT package_id, checksum FROM minhash")
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    
+    def store_minhash(self, signatures: Iterable[Tuple[int, int, List[int], List[int]]]):
+        """
+        Store MinHash signatures and their LSH buckets, replacing old ones.
+        
+        Args:
+            signatures: (package id, token checksum, signature, band buckets) tuples
+        """
+        cursor = self._cursor()
+        with self.connection:
+            for package_id, checksum, signature, buckets in signatures:
+                cursor.execute("DELETE FROM lsh_buckets WHERE package_id = ?", (package_id,))
+                cursor.execute(
+                    "INSERT OR REPLACE INTO minhash (package_id, checksum, signature) "
+                    "VALUES (?, ?, ?)",
+                    (package_id, checksum, array("Q", signature).tobytes())
+                )
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO lsh_buckets (band, bucket, package_id) VALUES (?, ?, ?)",
+                    ((band, bucket, package_id) for band, bucket in enumerate(buckets))
+                )
+    
+    def delete_minhash(self, package_ids: Iterable[int]):
+        """
+        Remove packages from the related-packages index.
+        
+        Args:
+            package_ids: IDs of packages that no longer exist
+        """
+        cursor = self._cursor()
+        with self.connection:
+            for package_id in package_ids:
+                cursor.execute("DELETE FROM minhash WHERE package_id = ?", (package_id,))
+                cursor.execute("DELETE FROM lsh_buckets WHERE package_id = ?", (package_id,))
+                cursor.execute("DELETE FROM related WHERE package_id = ? OR related_id = ?",
+                               (package_id, package_id))
+    
+    def clear_related_index(self):
+        """Drop every MinHash signature, LSH bucket and related list."""
+        cursor = self._cursor()
+        with self.connection:
+            cursor.execute("DELETE FROM minhash")
+            cursor.execute("DELETE FROM lsh_buckets")
+            cursor.execute("DELETE FROM related")
+    
+    def get_lsh_candidates(self, package_id: int, max_bucket_size: int) -> List[Tuple[int, str]]:
+        """
+        Get packages sharing at least one LSH bucket with a package.
+        
+        Args:
+            package_id: Package ID
+            max_bucket_size: Skip buckets with more members than this
+            
+        Returns:
+            List of (package id, tokens column value) tuples
+        """
+        cursor = self._cursor()
+        cursor.execute("""
+            SELECT DISTINCT p.id, p.tokens
+            FROM lsh_buckets mine
+            JOIN lsh_buckets other ON other.band = mine.band AND other.bucket = mine.bucket
+            JOIN packages p ON p.id = other.package_id
+            WHERE mine.package_id = ?
+              AND other.package_id != mine.package_id
+              AND (SELECT COUNT(*) FROM lsh_buckets b
+                   WHERE b.band = mine.band AND b.bucket = mine.bucket) <= ?
+        """, (package_id, max_bucket_size))
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+    
+    def get_related_sources(self, package_ids: Iterable[int]) -> Set[int]:
+        """
+        Get the packages whose related list mentions any of the given packages.
+        
+        Args:
+            package_ids: Package IDs
+            
+        Returns:
+            Set of package IDs
+        """
+        cursor = self._cursor()
+        sources = set()
+        for package_id in package_ids:
+            cursor.execute("SELECT package_id FROM related WHERE related_id = ?", (package_id,))
+            sources.update(row[0] for row in cursor.fetchall())
+        return sources
+    
+    def store_related(self, lists: Iterable[Tuple[int, List[Tuple[int, float]]]]):
+        """
+        Replace the precomputed related lists of some packages.
+        
+        Args:
+            lists: (package id, [(related id, score), ...]) tuples
+        """
+        cursor = self._cursor()
+        with self.connection:
+            for package_id, neighbours in lists:
+                cursor.execute("DELETE FROM related WHERE package_id = ?", (package_id,))
+                cursor.executemany(
+                    "INSERT INTO related (package_id, related_id, score) VALUES (?, ?, ?)",
+                    ((package_id, related_id, score) for related_id, score in neighbours)
+                )
+    
+    def get_related(self, name: str, limit: Optional[int] = None) -> List[Tuple[Package, float]]:
+        """
+        Get the precomputed related packages of a package.
+        
+        Args:
+            name: Package name
+            limit: Maximum number of packages to return (None for all)
+            
+        Returns:
+            List of (Package, similarity) tuples, most similar first
+        """
+        cursor = self._cursor()
+        cursor.execute("""
+            SELECT p.*, r.score FROM packages source
+            JOIN related r ON r.package_id = source.id
+            JOIN packages p ON p.id = r.related_id
+            WHERE source.name_norm = ?
+            ORDER BY r.score DESC, p.name
+            LIMIT ?
+        """, (normalize_text(name), -1 if limit is None else limit))
+        rows = cursor.fetchall()
+        return list(zip(self._rows_to_packages(rows), (row["score"] for row in rows)))
+    
+    def get_http_cache(self, url: str) -> Optional[Tuple[Optional[str], Optional[str], bytes]]:
+        """
+        Get a cached HTTP response.
+        
+        Args:
+            url: Request URL
+            
+        Returns:
+            (etag, last_modified, body) tuple, or None if not cached
+        """
+        cursor = self._cursor()
+        cursor.execute("SELECT etag, last_modified, body FROM http_cache WHERE url = ?", (url,))
+        row = cursor.fetchone()
+        return (row[0], row[1], row[2]) if row else None
+    
+    def store_http_cache(self, responses: Iterable[Tuple[str, Optional[str], Optional[str], bytes]]):
+        """
+        Cache HTTP responses with their validators, in a single transaction.
+        
+        Args:
+            responses: (url, etag, last_modified, body) tuples
+        """
+        cursor = self._cursor()
+        with self.connection:
+            cursor.executemany("""
+                INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body, fetched_at)
+                VALUES (?, ?, ?, ?, datetime('now'))
+            """, responses)
+    
+    def get_import_cache(self, root: str) -> Dict[str, Tuple[int, int, List[str]]]:
+        """
+        Get cached import lists for every file under a directory.
+        
+        Args:
+            root: Absolute directory path
+            
+        Returns:
+            Mapping of file path -> (mtime_ns, size, imported modules)
+        """
+        # Primary-key range scan over paths starting with root + separator
+        prefix = os.path.join(root, "")
+        cursor = self._cursor()
+        cursor.execute("""
+            SELECT path, mtime_ns, size, imports FROM import_cache
+            WHERE path >= ? AND path < ?
+        """, (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+        return {row[0]: (row[1], row[2], row[3].split()) for row in cursor.fetchall()}
+    
+    def store_import_cache(self, entries: Iterable[Tuple[str, int, int, List[str]]]):
+        """
+        Cache the imports of scanned files, in a single transaction.
+        
+        Args:
+            entries: (path, mtime_ns, size, imported modules) tuples
+        """
+        cursor = self._cursor()
+        with self.connection:
+            cursor.executemany("""
+                INSERT OR REPLACE INTO import_cache (path, mtime_ns, size, imports)
+                VALUES (?, ?, ?, ?)
+            """, ((path, mtime_ns, size, " ".join(modules))
+                  for path, mtime_ns, size, modules in entries))
+    
+    def delete_import_cache(self, paths: Iterable[str]):
+        """
+        Drop cached imports of files that no longer exist.
+        
+        Args:
+            paths: File paths
+        """
+        cursor = self._cursor()
+        with self.connection:
+            cursor.executemany("DELETE FROM import_cache WHERE path = ?",
+                               ((path,) for path in paths))
+    
+    def get_sync_serial(self, source: str) -> int:
+        """
+        Get the last change serial processed from a mirror.
+        
+        Args:
+            source: Mirror identifier (its resolved path)
+            
+        Returns:
+            Last processed serial, or 0 if the mirror was never synced
+        """
+        cursor = self._cursor()
+        cursor.execute("SELECT last_serial FROM sync_state WHERE source = ?", (source,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    def set_sync_serial(self, source: str, serial: int):
+        """
+        Record the last change serial processed from a mirror.
+        
+        Args:
+            source: Mirror identifier (its resolved path)
+            serial: Last processed serial
+        """
+        cursor = self._cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO sync_state (source, last_serial, synced_at)
+            VALUES (?, ?, datetime('now'))
+        """, (source, serial))
         self.connection.commit()
     
-    def search_packages(self, query: str) -> List[Package]:
+    def get_sync_projects(self, source: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Get the projects recorded for a mirror.
+        
+        Args:
+            source: Mirror identifier (its resolved path)
+            
+        Returns:
+            Mapping of canonical name -> (last change serial seen, syncs that
+            found no JSON document at that serial; 0 once ingested)
+        """
+        cursor = self._cursor()
+        cursor.execute("SELECT name, serial, attempts FROM sync_projects WHERE source = ?",
+                       (source,))
+        return {row["name"]: (row["serial"], row["attempts"]) for row in cursor}
+    
+    def record_sync_projects(self, source: str, projects: Iterable[Tuple[str, int, int]]):
+        """
+        Record the serial and failed attempts of mirror projects.
+        
+        Args:
+            source: Mirror identifier (its resolved path)
+            projects: (canonical name, serial, attempts) tuples
+        """
+        cursor = self._cursor()
+        with self.connection:
+            cursor.executemany("""
+                INSERT OR REPLACE INTO sync_projects (source, name, serial, attempts)
+                VALUES (?, ?, ?, ?)
+            """, ((source, name, serial, attempts) for name, serial, attempts in projects))
+    
+    def forget_sync_projects(self, source: str, names: Iterable[str]):
+        """
+        Drop projects that a mirror no longer lists.
+        
+        Args:
+            source: Mirror identifier (its resolved path)
+            names: Canonical project names
+        """
+        cursor = self._cursor()
+        with self.connection:
+            cursor.executemany("DELETE FROM sync_projects WHERE source = ? AND name = ?",
+                               ((source, name) for name in names))
+    
+    def data_version(self) -> int:
+        """
+        Get PRAGMA data_version of the connection.
+        
+        The value changes when another connection commits to the database
+        file; this connection's own commits and in-memory copies never
+        change it.
+        
+        Returns:
+            Opaque version number, only meaningful compared to an earlier value
+        """
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+    
+    def get_change_seq(self) -> int:
+        """
+        Get the position of the last logged change.
+        
+        Returns:
+            Highest change_log sequence number (0 if nothing was logged)
+        """
+        cursor = self._cursor()
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log")
+        return cursor.fetchone()[0]
+    
+    def get_changes(self, since: int) -> Tuple[Optional[Set[int]], int]:
+        """
+        Get the packages written after a change_log position.
+        
+        Every insert, update and delete of a package is logged by a trigger,
+        whichever connection or process made it.
+        
+        Args:
+            since: Sequence number returned by an earlier call or get_change_seq()
+            
+        Returns:
+            (package ids, new position) tuple. The ids are None when the
+            changes cannot be replayed package by package: synonyms
+            changed, or the log was pruned past `since`.
+        """
+        cursor = self._cursor()
+        cursor.execute("SELECT seq, package_id FROM change_log WHERE seq > ? ORDER BY seq",
+                       (since,))
+        rows = cursor.fetchall()
+        if not rows:
+            return set(), since
+        
+        changed = {row[1] for row in rows}
+        if rows[0][0] > since + 1 or None in changed:
+            return None, rows[-1][0]
+        return changed, rows[-1][0]
+    
+    def prune_change_log(self, keep: int = CHANGE_LOG_KEEP) -> int:
+        """
+        Drop all but the newest change_log entries.
+        
+        Readers further behind than `keep` changes fall back to a full reload.
+        
+        Args:
+            keep: Number of entries to keep
+            
+        Returns:
+            Number of entries deleted
+        """
+        cursor = self._cursor()
+        cursor.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?",
+                       (keep,))
+        self.connection.commit()
+        return cursor.rowcount
+    
+    def add_synonyms(self, synonyms: Iterable[Tuple[str, str, float]]):
+        """
+        Bulk-load query expansion synonyms.
+        
+        Existing (term, synonym) pairs are replaced, so re-seeding is safe.
+        
+        Args:
+            synonyms: Iterable of (term, synonym, weight) tuples
+        """
+        cursor = self._cursor()
+        cursor.executemany("""
+            INSERT OR REPLACE INTO synonyms (term, synonym, weight)
+            VALUES (?, ?, ?)
+        """, ((normalize_text(term), normalize_text(synonym), weight)
+              for term, synonym, weight in synonyms))
+        self.connection.commit()
+    
+    def get_synonyms(self) -> List[Tuple[str, str, float]]:
+        """
+        Get all query expansion synonyms.
+        
+        Returns:
+            List of (term, synonym, weight) tuples
+        """
+        cursor = self._cursor()
+        cursor.execute("SELECT term, synonym, weight FROM synonyms ORDER BY term, weight DESC")
+        return [(row["term"], row["synonym"], row["weight"]) for row in cursor.fetchall()]
+    
+    def search_packages(self, query: str, expansions: Optional[List[str]] = None) -> List[Package]:
         """
         Search for packages by query string.
         
         Args:
             query: Search query (searches in name, description, category, keywords)
+            expansions: Extra terms (e.g. synonyms) matched in the same statement
             
         Returns:
-            List of matching Package objects
+            List of matching Package objects, direct query matches first
         """
-        cursor = self.connection.cursor()
-        search_term = f"%{query.lower()}%"
+        cursor = self._cursor()
+        search_term = f"%{normalize_text(query)}%"
+        terms = [search_term] + [f"%{normalize_text(term)}%" for term in expansions or []]
         
-        # Search in package name, description, category, and keywords
-        cursor.execute("""
-            SELECT DISTINCT p.* FROM packages p
-            LEFT JOIN keywords k ON p.id = k.package_id
-            WHERE LOWER(p.name) LIKE ?
-               OR LOWER(p.description) LIKE ?
-               OR LOWER(p.category) LIKE ?
-               OR LOWER(k.keyword) LIKE ?
+        # Search in package name, description and category, then in keyword
+        # terms, which are matched once in the dictionary and joined by id
+        match_clause = " OR ".join(
+            "p.name_norm LIKE ? OR p.description_norm LIKE ? OR p.category_norm LIKE ?"
+            for _ in terms
+        )
+        term_clause = " OR ".join("k.term LIKE ?" for _ in terms)
+        params = [term for term in terms for _ in range(3)] + terms
+        
+        cursor.execute(f"""
+            SELECT p.* FROM packages p
+            WHERE {match_clause}
+               OR p.id IN (
+                    SELECT pt.package_id FROM package_terms pt
+                    WHERE pt.term_id IN (SELECT k.id FROM terms k WHERE {term_clause})
+                  )
+            ORDER BY 
+                CASE 
+                    WHEN p.name_norm LIKE ? THEN 1
+                    WHEN p.description_norm LIKE ? THEN 2
+                    ELSE 3
+                END
+        """, params + [search_term, search_term])
+        
+        rows = cursor.fetchall()
+        return self._rows_to_packages(rows)
+    
+    def search_terms(self, terms: List[str],
+                     expansions: Optional[List[str]] = None) -> List[SearchHit]:
+        """
+        Match several query terms against all packages in a single statement.
+        
+        Each term is matched as a substring of the name, description,
+        category and keywords; expansion terms (synonyms) only match whole
+        words. The result records which terms hit which field, so callers
+        can rank without repeating the substring tests.
+        
+        Args:
+            terms: Search terms; the first term orders the raw results
+            expansions: Synonym terms, matched at word boundaries
+            
+        Returns:
+            List of SearchHit objects for packages matching at least one term
+        """
+        rows = query_term_rows(terms, expansions)
+        if not rows:
+            return []
+        first = rows[0][0]
+        
+        cursor = self._cursor()
+        values = ", ".join("(?, ?)" for _ in rows)
+        cursor.execute(f"""
+            WITH query_terms(term, literal) AS (VALUES {values}),
+            keyword_hits AS (
+                SELECT DISTINCT pt.package_id, q.term FROM query_terms q
+                JOIN terms k ON {_term_match_sql("k.term", "q.term", "q.literal")}
+                CROSS JOIN package_terms pt ON pt.term_id = k.id
+            )
+            SELECT p.*,
+                group_concat(CASE WHEN {_term_match_sql("p.name_norm", "t.term", "t.literal")}
+                                  THEN t.term END, char(31)) AS name_terms,
+                group_concat(CASE WHEN {_term_match_sql("p.description_norm", "t.term", "t.literal")}
+                                  THEN t.term END, char(31)) AS description_terms,
+                group_concat(CASE WHEN {_term_match_sql("p.category_norm", "t.term", "t.literal")}
+                                  THEN t.term END, char(31)) AS category_terms,
+                group_concat(kh.term, char(31)) AS keyword_terms
+            FROM packages p
+            CROSS JOIN query_terms t
+            LEFT JOIN keyword_hits kh ON kh.package_id = p.id AND kh.term = t.term
+            GROUP BY p.id
+            HAVING COALESCE(name_terms, description_terms, category_terms, keyword_terms) IS NOT NULL
             ORDER BY 
                 CASE 
-                    WHEN LOWER(p.name) LIKE ? THEN 1
-                    WHEN LOWER(p.description) LIKE ? THEN 2
+                    WHEN instr(p.name_norm, ?) > 0 THEN 1
+                    WHEN instr(p.description_norm, ?) > 0 THEN 2
                     ELSE 3
                 END
-        """, (search_term, search_term, search_term, search_term, search_term, search_term))
+        """, [value for row in rows for value in row] + [first, first])
         
         rows = cursor.fetchall()
-        return [self._row_to_package(row) for row in rows]
+        with TIMER.phase("row_to_package"):
+            return [self._row_to_hit(row) for row in rows]
+    
+    def search_ranked(self, query: str, match_terms: List[str], words: List[str],
+                      expansions: Optional[List[Tuple[str, float]]] = None,
+                      limit: Optional[int] = None, offset: int = 0) -> List[Package]:
+        """
+        Search and rank packages entirely inside SQLite.
+        
+        The relevance score mirrors search.rank_results(), so only the
+        requested page of rows is returned and turned into Package objects.
+        
+        Args:
+            query: Full search query
+            match_terms: Terms a package must match (in any field) to be returned
+            words: Individual query words scored separately
+            expansions: (synonym, weight) pairs, also returned when matched;
+                scored at reduced weight and matched at word boundaries
+            limit: Maximum number of packages to return (None for all)
+            offset: Number of ranked packages to skip
+            
+        Returns:
+            List of Package objects, highest score first
+        """
+        rows = query_term_rows(match_terms, [term for term, _ in expansions or []])
+        if not rows:
+            return []
+        first = rows[0][0]
+        
+        query = normalize_text(query)
+        score_parts = [
+            # Exact name match / name contains full query
+            "CASE WHEN p.name_norm = ? THEN 100 "
+            "WHEN instr(p.name_norm, ?) > 0 THEN 50 ELSE 0 END",
+            # Description starts with / contains full query
+            "CASE WHEN substr(p.description_norm, 1, ?) = ? THEN 40 "
+            "WHEN instr(p.description_norm, ?) > 0 THEN 30 ELSE 0 END",
+            # Category match
+            "(instr(p.category_norm, ?) > 0) * 20",
+        ]
+        score_params = [query, query, len(query), query, query, query]
+        
+        # Individual word matches
+        for word in words:
+            score_parts.append(
+                "(instr(p.description_norm, ?) > 0) * 10 + (instr(p.name_norm, ?) > 0) * 15"
+            )
+            word = normalize_text(word)
+            score_params += [word, word]
+        
+        # Weighted synonym matches (whole words only)
+        for term, weight in expansions or []:
+            score_parts.append(
+                f"(({_term_match_sql('p.name_norm', '?', '0')}) * 15"
+                f" + ({_term_match_sql('p.description_norm', '?', '0')}) * 10"
+                f" + ({_term_match_sql('p.category_norm', '?', '0')}) * 20) * ?"
+            )
+            term = normalize_text(term)
+            score_params += [term] * 6 + [weight]
+        
+        # Popularity blend, computed by the same function as rank_results()
+        score_parts.append("popularity_boost(p.popularity)")
+        
+        cursor = self._cursor()
+        values = ", ".join("(?, ?)" for _ in rows)
+        cursor.execute(f"""
+            WITH query_terms(term, literal) AS (VALUES {values})
+            SELECT p.*, {" + ".join(score_parts)} AS score
+            FROM packages p
+            WHERE EXISTS (
+                    SELECT 1 FROM query_terms t
+                    WHERE {_term_match_sql("p.name_norm", "t.term", "t.literal")}
+                       OR {_term_match_sql("p.description_norm", "t.term", "t.literal")}
+                       OR {_term_match_sql("p.category_norm", "t.term", "t.literal")}
+                  )
+               OR p.id IN (
+                    SELECT pt.package_id FROM package_terms pt
+                    WHERE pt.term_id IN (
+                        SELECT k.id FROM query_terms q
+                        JOIN terms k ON {_term_match_sql("k.term", "q.term", "q.literal")}
+                    )
+                  )
+            ORDER BY score DESC,
+                CASE 
+                    WHEN instr(p.name_norm, ?) > 0 THEN 1
+                    WHEN instr(p.description_norm, ?) > 0 THEN 2
+                    ELSE 3
+                END,
+                p.id
+            LIMIT ? OFFSET ?
+        """, [value for row in rows for value in row] + score_params
+              + [first, first, -1 if limit is None else limit, offset])
+        
+        return self._rows_to_packages(cursor.fetchall())
+    
+    def count_search_terms(self, terms: List[str],
+                           expansions: Optional[List[str]] = None) -> int:
+        """
+        Count packages matching any of the terms, without fetching them.
+        
+        Uses the same matching rules as search_terms().
+        
+        Args:
+            terms: Search terms
+            expansions: Synonym terms, matched at word boundaries
+            
+        Returns:
+            Number of matching packages
+        """
+        rows = query_term_rows(terms, expansions)
+        if not rows:
+            return 0
+        
+        cursor = self._cursor()
+        values = ", ".join("(?, ?)" for _ in rows)
+        cursor.execute(f"""
+            WITH query_terms(term, literal) AS (VALUES {values})
+            SELECT COUNT(*) FROM packages p
+            WHERE EXISTS (
+                    SELECT 1 FROM query_terms t
+                    WHERE {_term_match_sql("p.name_norm", "t.term", "t.literal")}
+                       OR {_term_match_sql("p.description_norm", "t.term", "t.literal")}
+                       OR {_term_match_sql("p.category_norm", "t.term", "t.literal")}
+                  )
+               OR p.id IN (
+                    SELECT pt.package_id FROM package_terms pt
+                    WHERE pt.term_id IN (
+                        SELECT k.id FROM query_terms q
+                        JOIN terms k ON {_term_match_sql("k.term", "q.term", "q.literal")}
+                    )
+                  )
+        """, [value for row in rows for value in row])
+        return cursor.fetchone()[0]
     
     def get_package_by_name(self, name: str) -> Optional[Package]:
         """
@@ -145,40 +1392,217 @@ class Database:
         Returns:
             Package object or None if not found
         """
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT * FROM packages WHERE LOWER(name) = ?", (name.lower(),))
+        cursor = self._cursor()
+        cursor.execute("SELECT * FROM packages WHERE name_norm = ?", (normalize_text(name),))
         row = cursor.fetchone()
-        return self._row_to_package(row) if row else None
+        return self._rows_to_packages([row])[0] if row else None
     
-    def get_all_packages(self) -> List[Package]:
+    def get_packages_by_names(self, names: Iterable[str]) -> Dict[str, Package]:
+        """
+        Look up many packages by name in one query per 500 names.
+        
+        Names are matched as PEP 503 canonical names over the indexed
+        canonical_name column, so 'Python_Dotenv' and 'python.dotenv' both
+        find 'python-dotenv'.
+        
+        Args:
+            names: Package names
+            
+        Returns:
+            Mapping of canonical name -> Package, for the names in the catalog
+            (the oldest package when several share a canonical name, as
+            upsert_packages() updates that one)
+        """
+        canonical = list(dict.fromkeys(canonicalize_name(name) for name in names))
+        
+        cursor = self._cursor()
+        packages = {}
+        for start in range(0, len(canonical), 500):
+            chunk = canonical[start:start + 500]
+            cursor.execute(f"SELECT * FROM packages WHERE canonical_name IN "
+                           f"({', '.join('?' for _ in chunk)}) ORDER BY id", chunk)
+            rows = cursor.fetchall()
+            for row, package in zip(rows, self._rows_to_packages(rows)):
+                packages.setdefault(row["canonical_name"], package)
+        return packages
+    
+    def get_all_packages(self, limit: Optional[int] = None, offset: int = 0) -> List[Package]:
         """
         Get all packages in the database.
         
+        Args:
+            limit: Maximum number of packages to return (None for all)
+            offset: Number of packages to skip
+        
         Returns:
             List of all Package objects
         """
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT * FROM packages ORDER BY name")
+        cursor = self._cursor()
+        cursor.execute(
+            "SELECT * FROM packages ORDER BY name LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset)
+        )
         rows = cursor.fetchall()
-        return [self._row_to_package(row) for row in rows]
+        return self._rows_to_packages(rows)
     
-    def get_packages_by_category(self, category: str) -> List[Package]:
+    def get_packages_by_category(self, category: str, limit: Optional[int] = None,
+                                 offset: int = 0) -> List[Package]:
         """
         Get all packages in a specific category.
         
         Args:
             category: Category name
+            limit: Maximum number of packages to return (None for all)
+            offset: Number of packages to skip
             
         Returns:
             List of Package objects in that category
         """
-        cursor = self.connection.cursor()
+        cursor = self._cursor()
         cursor.execute(
-            "SELECT * FROM packages WHERE LOWER(category) = ? ORDER BY name",
-            (category.lower(),)
+            "SELECT * FROM packages WHERE category_norm = ? ORDER BY name LIMIT ? OFFSET ?",
+            (normalize_text(category), -1 if limit is None else limit, offset)
         )
         rows = cursor.fetchall()
-        return [self._row_to_package(row) for row in rows]
+        return self._rows_to_packages(rows)
+    
+    def get_top_packages(self, category: str, limit: int) -> List[Package]:
+        """
+        Get the most popular packages in a category.
+        
+        Reads idx_packages_category_popularity in order, so only `limit`
+        rows are visited and nothing is sorted, however large the category.
+        
+        Args:
+            category: Category name
+            limit: Number of packages to return
+            
+        Returns:
+            List of Package objects, most popular first (ties by name)
+        """
+        cursor = self._cursor()
+        cursor.execute(
+            "SELECT * FROM packages WHERE category_norm = ? "
+            "ORDER BY popularity DESC, name LIMIT ?",
+            (normalize_text(category), limit)
+        )
+        return self._rows_to_packages(cursor.fetchall())
+    
+    def iter_package_rows(self, category: Optional[str] = None,
+                          batch_size: int = 1000) -> Iterator[sqlite3.Row]:
+        """
+        Stream package rows without building Package objects.
+        
+        Args:
+            category: Only this category, ordered by name (None for every
+                package, ordered by category then name)
+            batch_size: Rows fetched from SQLite at a time
+            
+        Returns:
+            Iterator of sqlite3.Row objects from the packages table
+        """
+        cursor = self._cursor()
+        try:
+            if category is None:
+                cursor.execute("SELECT * FROM packages ORDER BY category, name")
+            else:
+                cursor.execute("SELECT * FROM packages WHERE category_norm = ? ORDER BY name",
+                               (normalize_text(category),))
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()  # Records the statement even if the caller stopped early
+    
+    def iter_packages_with_keywords(self, batch_size: int = 1000) -> Iterator[Tuple[Package, List[str]]]:
+        """
+        Stream every package with its keywords, in id order.
+        
+        The output can be passed straight to add_packages() of another
+        database, which is how catalogs are copied or re-partitioned.
+        
+        Args:
+            batch_size: Rows fetched from SQLite at a time
+            
+        Returns:
+            Iterator of (Package, keywords) tuples
+        """
+        cursor = self._cursor()
+        try:
+            cursor.execute(self._SELECT_WITH_KEYWORDS_SQL + " ORDER BY p.id")
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row_to_package(row), self._row_keywords(row)
+        finally:
+            cursor.close()  # Records the statement even if the caller stopped early
+    
+    def get_packages_with_keywords(self, package_ids: Iterable[int]) -> List[Tuple[Package, List[str]]]:
+        """
+        Get packages by id with their keywords, in one query per 500 ids.
+        
+        Args:
+            package_ids: Package ids; ids no longer in the catalog are skipped
+            
+        Returns:
+            List of (Package, keywords) tuples in id order
+        """
+        package_ids = sorted(set(package_ids))
+        cursor = self._cursor()
+        items = []
+        for start in range(0, len(package_ids), 500):
+            chunk = package_ids[start:start + 500]
+            cursor.execute(self._SELECT_WITH_KEYWORDS_SQL +
+                           f" WHERE p.id IN ({', '.join('?' for _ in chunk)}) ORDER BY p.id", chunk)
+            items += [(self._row_to_package(row), self._row_keywords(row))
+                      for row in cursor.fetchall()]
+        return items
+    
+    @staticmethod
+    def _row_keywords(row: sqlite3.Row) -> List[str]:
+        """Split the keyword_list column of a _SELECT_WITH_KEYWORDS_SQL row."""
+        return row["keyword_list"].split("\x1f") if row["keyword_list"] else []
+    
+    def count_packages(self, category: Optional[str] = None) -> int:
+        """
+        Count packages, optionally in one category.
+        
+        Args:
+            category: Category name (None for all packages)
+            
+        Returns:
+            Number of packages
+        """
+        cursor = self._cursor()
+        if category is None:
+            cursor.execute("SELECT COUNT(*) FROM packages")
+        else:
+            cursor.execute("SELECT COUNT(*) FROM packages WHERE category_norm = ?",
+                           (normalize_text(category),))
+        return cursor.fetchone()[0]
+    
+    def get_category_counts(self) -> Dict[str, int]:
+        """
+        Count packages per category.
+        
+        Returns:
+            Mapping of category name -> number of packages, sorted by category
+        """
+        cursor = self._cursor()
+        cursor.execute("SELECT category, COUNT(*) AS count FROM packages "
+                       "GROUP BY category ORDER BY category")
+        return {row["category"]: row["count"] for row in cursor.fetchall()}
+    
+    def _rows_to_packages(self, rows: List[sqlite3.Row]) -> List[Package]:
+        """Convert database rows to Package objects."""
+        with TIMER.phase("row_to_package"):
+            return [self._row_to_package(row) for row in rows]
     
     def _row_to_package(self, row: sqlite3.Row) -> Package:
         """
@@ -199,11 +1623,87 @@ class Database:
             code_example=row["code_example"],
             pypi_url=row["pypi_url"],
             github_url=row["github_url"],
-            documentation_url=row["documentation_url"]
+            documentation_url=row["documentation_url"],
+            popularity=row["popularity"],
+            name_norm=row["name_norm"],
+            description_norm=row["description_norm"],
+            category_norm=row["category_norm"]
+        )
+    
+    def _row_to_hit(self, row: sqlite3.Row) -> SearchHit:
+        """
+        Convert a search_terms() row to a SearchHit object.
+        
+        Args:
+            row: SQLite row object with *_terms columns
+            
+        Returns:
+            SearchHit object
+        """
+        def split_terms(value):
+            return frozenset(value.split("\x1f")) if value else frozenset()
+        
+        return SearchHit(
+            package=self._row_to_package(row),
+            name_terms=split_terms(row["name_terms"]),
+            description_terms=split_terms(row["description_terms"]),
+            category_terms=split_terms(row["category_terms"]),
+            keyword_terms=split_terms(row["keyword_terms"])
         )
     
+    def save_to_disk(self, path: Optional[str] = None):
+        """
+        Write an in-memory database back to disk.
+        
+        Args:
+            path: Target file (default: the file the database was loaded from)
+        """
+        target = sqlite3.connect(str(path or self.db_path))
+        try:
+            self.connection.backup(target)
+        finally:
+            target.close()
+    
+    def missing_deferred_indexes(self) -> List[str]:
+        """
+        Get the DEFERRED_INDEXES that do not exist (a read-only lookup).
+        
+        Returns:
+            Index names, empty unless a bulk load is running or was interrupted
+        """
+        existing = {row[0] for row in self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        return [name for name in DEFERRED_INDEXES if name not in existing]
+    
+    def build_deferred_indexes(self):
+        """Create any of the DEFERRED_INDEXES that are missing (e.g. after a bulk load)."""
+        for name in DEFERRED_INDEXES:
+            create_index(self.connection, name)
+        self.connection.commit()
+    
+    def get_perf_stats(self):
+        """
+        Get SQL statistics recorded by this connection.
+        
+        Returns:
+            Mapping of method name -> counters (calls, rows, total_ms,
+            max_ms, slow, histogram), or an empty dict if not instrumented
+        """
+        return self.perf.snapshot() if self.perf is not None else {}
+    
     def close(self):
-        """Close the database connection."""
+        """Close the database connection, pruning the change log and finishing a bulk load first."""
+        if self.perf is not None and self.perf.methods:
+            self.perf.save(self.perf_stats_path)
+            self.perf.reset()
+        if self.connection.total_changes and "query_only" not in TUNING_PROFILES[self.tuning_profile]:
+            self.prune_change_log()
+        if self.tuning_profile == "bulk_load":
+            self.build_deferred_indexes()
+            try:
+                self.connection.execute(f"PRAGMA journal_mode = {self._journal_mode}")
+            except sqlite3.OperationalError:
+                pass  # Other connections are open; the file stays in WAL mode
         self.connection.close()
     
     def __enter__(self):
@@ -0,0 +1,166 @@
+"""
+Dependency graph for PackagePilot
+Forward and reverse transitive dependencies via memoized BFS over integer ids
+"""
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_REQUIREMENT_RE = re.compile(
+    r"^\s*([A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*(\[[^\]]*\])?\s*(.*)$"
+)
+
+
+def canonicalize_name(name: str) -> str:
+    """
+    Normalize a distribution name as PyPI does (PEP 503).
+    
+    Args:
+        name: Distribution name, e.g. 'Typing_Extensions'
+        
+    Returns:
+        Canonical name, e.g. 'typing-extensions'
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def parse_requirement(requirement: str) -> Optional[Tuple[str, str]]:
+    """
+    Split a requirement string into canonical name and version specifier.
+    
+    Extras and environment markers are dropped.
+    
+    Args:
+        requirement: Requirement such as 'urllib3[socks]>=1.26,<3; python_version>"3"'
+        
+    Returns:
+        (name, specifier) tuple, or None for blank lines, comments and options
+    """
+    requirement = requirement.split("#", 1)[0].split(";", 1)[0].strip()
+    if not requirement or requirement.startswith("-"):
+        return None
+    
+    match = _REQUIREMENT_RE.match(requirement)
+    if not match:
+        return None
+    
+    specifier = match.group(3).strip().strip("()").replace(" ", "")
+    return canonicalize_name(match.group(1)), specifier
+
+
+class DependencyGraph:
+    """
+    In-memory dependency graph keyed by integer ids.
+    
+    All edges are loaded with a single query. Transitive closures are
+    computed by BFS over integer adjacency lists and memoized per
+    (package, direction), so repeated impact queries are dictionary lookups.
+    """
+    
+    def __init__(self, edges: Iterable[Tuple[str, str, str]], catalog: Iterable[str] = ()):
+        """
+        Build the graph.
+        
+        Args:
+            edges: (package, requirement, specifier) tuples
+            catalog: Names of packages in the catalog
+        """
+        self._ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.forward: List[List[int]] = []
+        self.reverse: List[List[int]] = []
+        self.specifiers: Dict[Tuple[int, int], str] = {}
+        self.catalog = {canonicalize_name(name) for name in catalog}
+        self._closures: Dict[Tuple[int, bool], Dict[int, int]] = {}
+        
+        for package, requirement, specifier in edges:
+            source = self._intern(canonicalize_name(package))
+            target = self._intern(canonicalize_name(requirement))
+            self.forward[source].append(target)
+            self.reverse[target].append(source)
+            self.specifiers[(source, target)] = specifier
+    
+    @classmethod
+    def from_database(cls, db) -> "DependencyGraph":
+        """Load every dependency edge from a Database."""
+        return cls(db.get_dependency_edges(), db.get_package_names())
+    
+    @classmethod
+    def reachable_from(cls, db, name: str, reverse: bool = False) -> "DependencyGraph":
+        """
+        Load only the part of a Database's graph reachable from one package.
+        
+        Cheaper than from_database() for a single query, e.g. one `deps`
+        command, which cannot reuse a memoized closure anyway.
+        
+        Args:
+            db: Database to read
+            name: Package the walk starts from
+            reverse: Load dependents instead of dependencies
+            
+        Returns:
+            DependencyGraph whose catalog covers the loaded names
+        """
+        edges = db.get_dependency_subgraph(name, reverse)
+        names = {node for package, requirement, _ in edges for node in (package, requirement)}
+        return cls(edges, db.get_packages_by_names(names))
+    
+    def _intern(self, name: str) -> int:
+        """Get the integer id for a canonical name, adding it if new."""
+        node = self._ids.get(name)
+        if node is None:
+            node = self._ids[name] = len(self.names)
+            self.names.append(name)
+            self.forward.append([])
+            self.reverse.append([])
+        return node
+    
+    def __contains__(self, name: str) -> bool:
+        return canonicalize_name(name) in self._ids
+    
+    def _closure(self, node: int, reverse: bool) -> Dict[int, int]:
+        """Memoized BFS: every reachable node with its shortest distance."""
+        key = (node, reverse)
+        closure = self._closures.get(key)
+        if closure is None:
+            adjacency = self.reverse if reverse else self.forward
+            closure = {}
+            queue = deque([(node, 0)])
+            seen = {node}
+            while queue:
+                current, depth = queue.popleft()
+                for neighbour in adjacency[current]:
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        closure[neighbour] = depth + 1
+                        queue.append((neighbour, depth + 1))
+            self._closures[key] = closure
+        return closure
+    
+    def dependencies(self, name: str, reverse: bool = False,
+                     max_depth: Optional[int] = None) -> List[Tuple[str, int, str]]:
+        """
+        Get transitive dependencies (or dependents) of a package.
+        
+        Args:
+            name: Package name
+            reverse: Return packages that end up pulling in `name` instead
+            max_depth: Only follow this many levels (None for the full closure)
+            
+        Returns:
+            List of (name, depth, specifier) tuples sorted by depth then name;
+            the specifier is only known for direct (depth 1) edges
+        """
+        node = self._ids.get(canonicalize_name(name))
+        if node is None:
+            return []
+        
+        results = []
+        for other, depth in self._closure(node, reverse).items():
+            if max_depth is not None and depth > max_depth:
+                continue
+            edge = (other, node) if reverse else (node, other)
+            specifier = self.specifiers.get(edge, "") if depth == 1 else ""
+            results.append((self.names[other], depth, specifier))
+        results.sort(key=lambda item: (item[1], item[0]))
+        return results
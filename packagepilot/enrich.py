@@ -0,0 +1,235 @@
+"""
+Metadata enrichment for PackagePilot
+Concurrent fetches over kept-alive connections with ETag/Last-Modified caching
+"""
+import asyncio
+import http.client
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from .database import Database
+from .sync import project_to_package
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_BATCH_SIZE = 500
+
+
+@dataclass
+class EnrichReport:
+    """
+    Outcome of an enrichment run.
+    
+    Attributes:
+        fetched: Responses with new metadata (200)
+        not_modified: Responses validated against the cache (304)
+        missing: Packages the endpoint does not know (404)
+        failed: Requests that failed or returned unusable data
+        updated: Packages written to the database
+    """
+    fetched: int = 0
+    not_modified: int = 0
+    missing: int = 0
+    failed: int = 0
+    updated: int = 0
+
+
+class _KeepAliveClient:
+    """One persistent HTTP/1.1 connection, reopened once if the server dropped it."""
+    
+    def __init__(self, scheme: str, netloc: str, timeout: float):
+        self.connection_class = (http.client.HTTPSConnection if scheme == "https"
+                                 else http.client.HTTPConnection)
+        self.netloc = netloc
+        self.timeout = timeout
+        self.connection = None
+    
+    def get(self, path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """Send a GET request and read the whole response (so the connection can be reused)."""
+        try:
+            return self._get_once(path, headers)
+        except (http.client.HTTPException, ConnectionError):
+            # The server may have closed the idle connection; retry once on a new one
+            return self._get_once(path, headers)
+    
+    def _get_once(self, path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        if self.connection is None:
+            self.connection = self.connection_class(self.netloc, timeout=self.timeout)
+        try:
+            self.connection.request("GET", path, headers=headers)
+            response = self.connection.getresponse()
+            body = response.read()
+        except Exception:
+            self.close()
+            raise
+        if response.will_close:
+            self.close()
+        return response.status, {key.lower(): value for key, value in response.getheaders()}, body
+    
+    def close(self):
+        """Close the connection, if open."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Enricher:
+    """
+    Fill package metadata from a PyPI-style JSON endpoint.
+    
+    A fixed number of asyncio workers share a queue of packages; each
+    worker owns one kept-alive connection, and the blocking http.client
+    calls run on a thread pool of the same size. Responses are cached with
+    their ETag/Last-Modified validators, so unchanged metadata costs a 304.
+    Updates are written in batched transactions from the event loop thread.
+    """
+    
+    def __init__(self, db: Database, endpoint: str,
+                 concurrency: int = DEFAULT_CONCURRENCY, batch_size: int = DEFAULT_BATCH_SIZE,
+                 overwrite: bool = False, timeout: float = 30.0):
+        """
+        Create an enricher.
+        
+        Args:
+            db: Database to enrich
+            endpoint: URL template with a {name} placeholder, e.g. a local
+                benchmarks.metadata_server or a mirror you are allowed to crawl
+            concurrency: Requests in flight (and connections kept open)
+            batch_size: Packages written per transaction
+            overwrite: Replace existing descriptions and URLs instead of
+                only filling empty ones
+            timeout: Socket timeout in seconds
+        """
+        parts = urlsplit(endpoint)
+        if parts.scheme not in ("http", "https") or "{name}" not in endpoint:
+            raise ValueError(f"Endpoint must be an http(s) URL containing {{name}}: {endpoint}")
+        self.db = db
+        self.endpoint = endpoint
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.overwrite = overwrite
+        self.timeout = timeout
+        self.report = EnrichReport()
+        self._updates: List[Tuple[int, str, Optional[str], Optional[str], List[str]]] = []
+        self._cache_rows: List[Tuple[str, Optional[str], Optional[str], bytes]] = []
+    
+    def _request_path(self, url: str) -> str:
+        """Path plus query of a URL, as sent in the request line."""
+        parts = urlsplit(url)
+        return parts.path + (f"?{parts.query}" if parts.query else "")
+    
+    async def _worker(self, queue: asyncio.Queue, executor: ThreadPoolExecutor):
+        """Fetch queued packages over one kept-alive connection."""
+        loop = asyncio.get_running_loop()
+        client = _KeepAliveClient(self.scheme, self.netloc, self.timeout)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                package_id, name = item
+                url = self.endpoint.format(name=quote(name, safe=""))
+                
+                headers = {"Accept": "application/json"}
+                cached = self.db.get_http_cache(url)
+                if cached is not None:
+                    etag, last_modified, _ = cached
+                    if etag:
+                        headers["If-None-Match"] = etag
+                    if last_modified:
+                        headers["If-Modified-Since"] = last_modified
+                
+                try:
+                    status, response_headers, body = await loop.run_in_executor(
+                        executor, client.get, self._request_path(url), headers)
+                except (OSError, http.client.HTTPException):
+                    self.report.failed += 1
+                    continue
+                
+                cache_row = None
+                if status == 304 and cached is not None:
+                    self.report.not_modified += 1
+                    if not self.overwrite:
+                        continue  # Applied when it was first fetched
+                    body = cached[2]
+                elif status == 404:
+                    self.report.missing += 1
+                    continue
+                elif status != 200:
+                    self.report.failed += 1
+                    continue
+                else:
+                    self.report.fetched += 1
+                    cache_row = (url, response_headers.get("etag"),
+                                 response_headers.get("last-modified"), body)
+                
+                self._add_update(package_id, body, cache_row)
+        finally:
+            client.close()
+    
+    def _add_update(self, package_id: int, body: bytes,
+                    cache_row: Optional[Tuple[str, Optional[str], Optional[str], bytes]] = None):
+        """
+        Parse a metadata document and queue its update, flushing full batches.
+        
+        The response is only cached (cache_row) once it parsed, so an
+        unusable or truncated body is fetched again on the next run instead
+        of being validated with a 304 forever.
+        """
+        try:
+            package, keywords, _ = project_to_package(json.loads(body))
+        except (ValueError, KeyError, TypeError):
+            self.report.failed += 1
+            return
+        self._updates.append((package_id, package.description, package.documentation_url,
+                              package.github_url, keywords))
+        if cache_row is not None:
+            self._cache_rows.append(cache_row)
+        if len(self._updates) >= self.batch_size:
+            self._flush()
+    
+    def _flush(self):
+        """Write queued updates, then their cache entries, in one transaction each."""
+        if self._updates:
+            self.report.updated += self.db.enrich_packages(self._updates, self.overwrite)
+            self._updates = []
+        if self._cache_rows:
+            self.db.store_http_cache(self._cache_rows)
+            self._cache_rows = []
+    
+    async def _run(self, packages: List[Tuple[int, str]]):
+        """Queue every package and wait for the workers to drain the queue."""
+        queue = asyncio.Queue()
+        for item in packages:
+            queue.put_nowait(item)
+        for _ in range(self.concurrency):
+            queue.put_nowait(None)  # One stop marker per worker
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            await asyncio.gather(*(self._worker(queue, executor)
+                                   for _ in range(self.concurrency)))
+        self._flush()
+    
+    def run(self, packages: Optional[List[Tuple[int, str]]] = None) -> EnrichReport:
+        """
+        Enrich packages.
+        
+        Args:
+            packages: (package id, name) pairs (None for every package)
+            
+        Returns:
+            EnrichReport with request and update counts
+        """
+        if packages is None:
+            packages = [(row["id"], row["name"]) for row in self.db.iter_package_rows()]
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run(packages))
+        finally:
+            loop.close()
+        return self.report
+
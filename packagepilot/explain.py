@@ -0,0 +1,221 @@
+"""
+Query-plan checks for PackagePilot
+Runs every Database method once, captures its SQL and flags full scans where an index is expected
+"""
+import re
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from .database import Database
+from .perf import QueryInstrumentation
+
+# Tables that must be reached through an index unless a workload step allows a scan
+CHECKED_TABLES = ("packages", "package_terms", "terms")
+
+# Substring search has to test every package and every distinct keyword term
+SUBSTRING_SEARCH = frozenset({"packages", "terms"})
+# Whole-catalog reads and rewrites visit every package by design
+WHOLE_CATALOG = frozenset({"packages"})
+
+# "SCAN p" / "SCAN p USING INDEX ..." (SQLite 3.36+) or "SCAN TABLE packages AS p"
+_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?")
+_TABLE_RE = re.compile(r"\b(" + "|".join(CHECKED_TABLES) + r")\b(?:\s+(?:AS\s+)?(\w+))?")
+_NOT_ALIASES = {"where", "set", "on", "join", "left", "cross", "inner", "order", "group",
+                "limit", "select", "values", "using", "and", "or"}
+
+
+@dataclass
+class PlanCheck:
+    """
+    Query plan of one statement issued by a workload step.
+    
+    Attributes:
+        step: Workload step that issued the statement
+        method: Database method that executed it
+        sql: SQL text
+        plan: EXPLAIN QUERY PLAN detail lines
+        scans: Checked tables the plan scans in full
+        allowed: Checked tables the step is allowed to scan
+    """
+    step: str
+    method: str
+    sql: str
+    plan: List[str]
+    scans: List[str]
+    allowed: FrozenSet[str]
+    
+    @property
+    def violations(self) -> List[str]:
+        """Scanned tables the step is not allowed to scan."""
+        return [table for table in self.scans if table not in self.allowed]
+
+
+class _StatementRecorder(QueryInstrumentation):
+    """Instrumentation hook that keeps each distinct statement instead of timing it."""
+    
+    def __init__(self):
+        super().__init__(slow_log_path=None)
+        self.step = ""
+        self.statements: Dict[Tuple[str, str, str], None] = {}  # Ordered set
+    
+    def record(self, method, sql, parameters, elapsed_ms, rows, connection=None):
+        self.statements.setdefault((self.step, method, sql), None)
+
+
+def _aliases(sql: str) -> Dict[str, str]:
+    """Map the names a statement uses for the checked tables (aliases included) to the tables."""
+    names = {}
+    for table, alias in _TABLE_RE.findall(sql):
+        names[table] = table
+        if alias and alias.lower() not in _NOT_ALIASES:
+            names[alias] = table
+    return names
+
+
+def scanned_tables(sql: str, plan: List[str]) -> List[str]:
+    """
+    Find the checked tables a query plan reads in full.
+    
+    Args:
+        sql: SQL text the plan belongs to
+        plan: EXPLAIN QUERY PLAN detail lines
+        
+    Returns:
+        Table names, in plan order
+    """
+    names = _aliases(sql)
+    scans = []
+    for line in plan:
+        match = _SCAN_RE.match(line)
+        if match:
+            name = match.group(1)
+            table = name if match.group(2) or name in CHECKED_TABLES else names.get(name)
+            if table is not None and table not in scans:
+                scans.append(table)
+    return scans
+
+
+def _workload(db: Database) -> List[Tuple[str, Callable[[], object], FrozenSet[str]]]:
+    """
+    Build one call of every Database method that runs SQL.
+    
+    Returns:
+        List of (step label, call, tables the step may scan) tuples; write
+        steps come last
+    """
+    sample = db.get_all_packages(limit=1)
+    if not sample:
+        raise ValueError("The catalog is empty; seed it before checking query plans")
+    sample = sample[0]
+    word = (sample.description_norm or sample.name_norm).split()[0]
+    other = sample.name_norm.split("-")[0]
+    category = sample.category
+    
+    def consume(iterator):
+        deque(iterator, maxlen=0)
+    
+    new_package = replace(sample, id=None, name=f"{sample.name}-plan-check")
+    return [
+        # Search
+        ("search_packages", lambda: db.search_packages(word, [other]), SUBSTRING_SEARCH),
+        ("search_terms", lambda: db.search_terms([word, other]), SUBSTRING_SEARCH),
+        ("search_ranked", lambda: db.search_ranked(word, [word], [word], [(other, 0.5)], limit=5),
+         SUBSTRING_SEARCH),
+        ("count_search_terms", lambda: db.count_search_terms([word, other]), SUBSTRING_SEARCH),
+        ("get_synonyms", db.get_synonyms, frozenset()),
+        
+        # Name lookups
+        ("get_package_by_name", lambda: db.get_package_by_name(sample.name), frozenset()),
+        ("get_packages_by_names",
+         lambda: db.get_packages_by_names([sample.name, "no-such-package"]), frozenset()),
+        ("get_related", lambda: db.get_related(sample.name, 10), frozenset()),
+        
+        # Category
+        ("get_packages_by_category", lambda: db.get_packages_by_category(category, limit=20),
+         frozenset()),
+        ("get_top_packages", lambda: db.get_top_packages(category, 10), frozenset()),
+        ("iter_package_rows(category)", lambda: consume(db.iter_package_rows(category)),
+         frozenset()),
+        ("count_packages(category)", lambda: db.count_packages(category), frozenset()),
+        
+        # Listing; a page walks the name index up to offset + limit
+        ("get_all_packages(page)", lambda: db.get_all_packages(limit=20, offset=20), WHOLE_CATALOG),
+        ("get_all_packages", db.get_all_packages, WHOLE_CATALOG),
+        ("iter_package_rows", lambda: consume(db.iter_package_rows()), WHOLE_CATALOG),
+        ("iter_packages_with_keywords", lambda: consume(db.iter_packages_with_keywords()),
+         WHOLE_CATALOG),
+        ("iter_package_tokens", lambda: consume(db.iter_package_tokens()), WHOLE_CATALOG),
+        ("get_package_names", db.get_package_names, WHOLE_CATALOG),
+        
+        # Aggregates
+        ("count_packages", db.count_packages, WHOLE_CATALOG),
+        ("get_category_counts", db.get_category_counts, WHOLE_CATALOG),
+        
+        # Dependencies, related index, caches and sync state
+        ("get_dependency_edges", db.get_dependency_edges, frozenset()),
+        ("get_dependency_subgraph", lambda: db.get_dependency_subgraph(sample.name), frozenset()),
+        ("get_dependency_subgraph(reverse)",
+         lambda: db.get_dependency_subgraph(sample.name, reverse=True), frozenset()),
+        ("has_dependency_info", lambda: db.has_dependency_info(sample.name), frozenset()),
+        ("get_package_tokens", lambda: db.get_package_tokens([sample.id]), frozenset()),
+        ("get_lsh_candidates", lambda: db.get_lsh_candidates(sample.id, 500), frozenset()),
+        ("get_related_sources", lambda: db.get_related_sources([sample.id]), frozenset()),
+        ("get_http_cache", lambda: db.get_http_cache("https://example.invalid/"), frozenset()),
+        ("get_import_cache", lambda: db.get_import_cache("/plan-check"), frozenset()),
+        ("get_sync_serial", lambda: db.get_sync_serial("/plan-check"), frozenset()),
+        ("get_change_seq", db.get_change_seq, frozenset()),
+        ("get_changes", lambda: db.get_changes(0), frozenset()),
+        ("get_packages_with_keywords", lambda: db.get_packages_with_keywords([sample.id]),
+         frozenset()),
+        
+        # Writes
+        ("add_packages", lambda: db.add_packages([(new_package, ["plan check"])]), frozenset()),
+        ("add_keywords", lambda: db.add_keywords(sample.id, ["plan check"]), frozenset()),
+        ("upsert_packages", lambda: db.upsert_packages([(sample, ["plan check"], [])]),
+         frozenset()),
+        ("enrich_packages",
+         lambda: db.enrich_packages([(sample.id, sample.description, None, None, ["plan"])]),
+         frozenset()),
+        ("set_popularity", lambda: db.set_popularity({sample.name: 1.0}), frozenset()),
+        ("add_dependencies", lambda: db.add_dependencies(sample.id, ["requests>=2"]), frozenset()),
+        ("prune_change_log", lambda: db.prune_change_log(10), frozenset()),
+        ("reindex", db.reindex, frozenset(CHECKED_TABLES)),
+    ]
+
+
+def explain_queries(db_path: Optional[str] = None) -> List[PlanCheck]:
+    """
+    Run the plan-check workload against a copy of a catalog.
+    
+    The database is loaded into memory, so the write steps never touch the
+    file. Each statement is captured through the SQL instrumentation hook
+    and explained with NULL parameters (plans do not depend on values).
+    
+    Args:
+        db_path: Catalog file (None for the default database)
+        
+    Returns:
+        One PlanCheck per distinct (step, statement)
+        
+    Raises:
+        ValueError: The catalog is empty
+    """
+    recorder = _StatementRecorder()
+    with Database(db_path, in_memory=True, instrument=True, tuning_profile="default") as db:
+        steps = _workload(db)
+        db.perf = recorder
+        allowed = {}
+        for step, call, scans in steps:
+            recorder.step = step
+            allowed[step] = scans
+            call()
+        db.perf = None
+        
+        checks = []
+        for step, method, sql in recorder.statements:
+            plan = [row[3] for row in db.connection.execute(
+                "EXPLAIN QUERY PLAN " + sql, [None] * sql.count("?"))]
+            checks.append(PlanCheck(step, method, sql, plan, scanned_tables(sql, plan),
+                                    allowed[step]))
+    return checks
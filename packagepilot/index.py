@@ -0,0 +1,600 @@
+"""
+In-memory search index for PackagePilot
+Immutable catalog snapshots that a background writer rebuilds and swaps in atomically
+"""
+import copy
+import os
+import queue
+import threading
+from bisect import bisect_right
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .database import Database
+from .models import Package, SearchHit
+from .normalize import has_word, normalize_text, query_term_rows
+from .search import search_packages
+
+# Refreshes touching more than this share of the snapshot rebuild it from
+# scratch, as does an update leaving more than this share of rows deleted
+FULL_REBUILD_FRACTION = 0.25
+
+
+class _Column:
+    """One text field of every package, joined into a single string for str.find()."""
+    
+    def __init__(self, values: Iterable[str]):
+        self.starts: List[int] = []
+        parts = []
+        offset = 0
+        for value in values:
+            self.starts.append(offset)
+            parts.append(value)
+            offset += len(value) + 1
+        self.text = "\x00".join(parts)
+    
+    def patched(self, values: Dict[int, str]) -> "_Column":
+        """
+        Copy of the column with some rows replaced.
+        
+        Rows past the end are appended and must follow on from it. The
+        unchanged text between replaced rows is copied in slices, and only
+        the offsets after a replaced row are shifted.
+        """
+        old_rows = len(self.starts)
+        replaced = sorted(row for row in values if row < old_rows)
+        starts = list(self.starts)
+        parts = []
+        position = 0  # Old text copied so far
+        shift = 0  # Growth of the text so far
+        for index, row in enumerate(replaced):
+            start = self.starts[row]
+            end = start + len(self.value(row))
+            parts += [self.text[position:start], values[row]]
+            position = end
+            shift += len(values[row]) - (end - start)
+            # Rows up to and including the next replaced one move by the growth so far
+            stop = replaced[index + 1] + 1 if index + 1 < len(replaced) else old_rows
+            if shift:
+                starts[row + 1:stop] = [moved + shift for moved in self.starts[row + 1:stop]]
+        parts.append(self.text[position:])
+        
+        offset = len(self.text) + shift
+        for row in sorted(row for row in values if row >= old_rows):
+            if starts:
+                parts.append("\x00")
+                offset += 1
+            starts.append(offset)
+            parts.append(values[row])
+            offset += len(values[row])
+        
+        column = _Column(())
+        column.starts = starts
+        column.text = "".join(parts)
+        return column
+    
+    def value(self, row: int) -> str:
+        """The value of one row."""
+        end = self.starts[row + 1] - 1 if row + 1 < len(self.starts) else len(self.text)
+        return self.text[self.starts[row]:end]
+    
+    def matches(self, term: str, whole_word: bool = False) -> Set[int]:
+        """
+        Rows whose value contains term (what instr() > 0 tests in SQL).
+        
+        With whole_word, a row only counts if the term also occurs at word
+        boundaries (the rule for synonym expansions).
+        """
+        rows = set()
+        if not self.starts:
+            return rows
+        
+        # After a hit, continue at the next row so each row is found once
+        position = self.text.find(term)
+        while position != -1:
+            row = bisect_right(self.starts, position) - 1
+            if not whole_word or has_word(self.value(row), term):
+                rows.add(row)
+                if row + 1 == len(self.starts):
+                    break
+                position = self.text.find(term, self.starts[row + 1])
+            else:
+                position = self.text.find(term, position + 1)
+        return rows
+
+
+class SearchIndex:
+    """
+    Immutable in-memory snapshot of the catalog's searchable fields.
+    
+    Provides the read API that search.search_packages() uses, with the
+    same substring matching as Database.search_terms(), without touching
+    SQLite. A snapshot never changes after it is built; updates build a
+    new one (see LiveIndex) that shares its unchanged parts.
+    
+    Rows are in id order. A deleted package leaves an empty row (None in
+    `packages`) until the next full rebuild.
+    """
+    
+    def __init__(self, items: Sequence[Tuple[Package, List[str]]],
+                 synonyms: Iterable[Tuple[str, str, float]] = ()):
+        """
+        Build the snapshot.
+        
+        Args:
+            items: (Package, normalized keywords) tuples in id order, as
+                yielded by Database.iter_packages_with_keywords()
+            synonyms: (term, synonym, weight) rows for query expansion
+        """
+        self.packages = [package for package, _ in items]
+        self.keywords = [keywords for _, keywords in items]
+        self.synonyms = list(synonyms)
+        self._names = _Column(package.name_norm or "" for package in self.packages)
+        self._descriptions = _Column(package.description_norm or "" for package in self.packages)
+        self._categories = _Column(package.category_norm or "" for package in self.packages)
+        
+        # Keyword terms are matched once in a dictionary, then expanded to rows
+        postings: Dict[str, List[int]] = {}
+        for row, (_, keywords) in enumerate(items):
+            for keyword in keywords:
+                postings.setdefault(keyword, []).append(row)
+        self._terms = _Column(postings)
+        self._term_rows = {term: index for index, term in enumerate(postings)}
+        self._postings = list(postings.values())
+        self._by_name = {package.name_norm: package for package in self.packages}
+        self._rows = {package.id: row for row, package in enumerate(self.packages)}
+        self._deleted = 0
+    
+    @classmethod
+    def build(cls, db: Database) -> "SearchIndex":
+        """
+        Read a snapshot of a catalog.
+        
+        Args:
+            db: Database to read (one transaction's view if the caller holds one)
+            
+        Returns:
+            SearchIndex instance
+        """
+        return cls(list(db.iter_packages_with_keywords()), db.get_synonyms())
+    
+    def updated(self, items: Iterable[Tuple[Package, List[str]]],
+                package_ids: Iterable[int]) -> "SearchIndex":
+        """
+        Build the next snapshot with some packages replaced.
+        
+        Copy-on-write: the changed rows are patched into copies of the
+        columns, keyword postings and lookup tables, and everything else is
+        shared with this snapshot. Changed packages keep their row, new ones
+        are appended (ids only grow, so rows stay in id order) and deleted
+        ones leave an empty row. Once more than FULL_REBUILD_FRACTION of the
+        rows are empty, the snapshot is rebuilt without them.
+        
+        Args:
+            items: Current (Package, keywords) of the changed packages still in
+                the catalog, as returned by Database.get_packages_with_keywords()
+            package_ids: Ids of every changed package; ids without an item
+                were deleted
+                
+        Returns:
+            New SearchIndex; this one is left untouched
+        """
+        current = {package.id: (package, keywords) for package, keywords in items}
+        packages = list(self.packages)
+        keywords = list(self.keywords)
+        rows = dict(self._rows)
+        by_name = dict(self._by_name)
+        deleted = self._deleted
+        
+        changed: Dict[int, List[str]] = {}  # row -> its keywords in this snapshot
+        for package_id in sorted(set(package_ids)):
+            item = current.get(package_id)
+            row = rows.get(package_id)
+            if row is None:
+                if item is None:
+                    continue  # Added and deleted between two refreshes
+                row = rows[package_id] = len(packages)
+                packages.append(None)
+                keywords.append([])
+            else:
+                old = packages[row]
+                if by_name.get(old.name_norm) is old:
+                    del by_name[old.name_norm]
+            changed[row] = keywords[row]
+            
+            if item is None:
+                del rows[package_id]
+                packages[row], keywords[row] = None, []
+                deleted += 1
+            else:
+                packages[row], keywords[row] = item
+                by_name[item[0].name_norm] = item[0]
+        
+        if deleted > FULL_REBUILD_FRACTION * len(packages):
+            return SearchIndex([(package, terms) for package, terms in zip(packages, keywords)
+                                if package is not None], self.synonyms)
+        
+        index = copy.copy(self)
+        index.packages, index.keywords = packages, keywords
+        index._rows, index._by_name, index._deleted = rows, by_name, deleted
+        
+        def field(row, name):
+            package = packages[row]
+            return (getattr(package, name) or "") if package is not None else ""
+        
+        index._names = self._names.patched({row: field(row, "name_norm") for row in changed})
+        index._descriptions = self._descriptions.patched(
+            {row: field(row, "description_norm") for row in changed})
+        index._categories = self._categories.patched(
+            {row: field(row, "category_norm") for row in changed})
+        
+        # Only the posting lists that gain or lose a row are copied
+        postings = list(self._postings)
+        term_rows = self._term_rows
+        new_terms = {}
+        copied = set()
+        for row, old_keywords in changed.items():
+            old_keywords, new_keywords = set(old_keywords), set(keywords[row])
+            for term in old_keywords - new_keywords:
+                position = term_rows[term]
+                if position not in copied:
+                    postings[position] = list(postings[position])
+                    copied.add(position)
+                postings[position].remove(row)
+            for term in new_keywords - old_keywords:
+                position = term_rows.get(term)
+                if position is None:
+                    if not new_terms:
+                        term_rows = dict(term_rows)
+                    position = term_rows[term] = len(postings)
+                    new_terms[position] = term
+                    postings.append([])
+                elif position not in copied:
+                    postings[position] = list(postings[position])
+                copied.add(position)
+                postings[position].append(row)
+        index._postings, index._term_rows = postings, term_rows
+        if new_terms:
+            index._terms = self._terms.patched(new_terms)
+        return index
+    
+    def __len__(self) -> int:
+        """Number of packages in the snapshot."""
+        return len(self.packages) - self._deleted
+    
+    def _keyword_rows(self, term: str, whole_word: bool = False) -> Set[int]:
+        """Rows with a keyword containing term."""
+        rows = set()
+        for index in self._terms.matches(term, whole_word):
+            rows.update(self._postings[index])
+        return rows
+    
+    def get_synonyms(self) -> List[Tuple[str, str, float]]:
+        """Query expansion synonyms captured with the snapshot."""
+        return self.synonyms
+    
+    def search_terms(self, terms: List[str],
+                     expansions: Optional[List[str]] = None) -> List[SearchHit]:
+        """
+        Match several query terms against all packages.
+        
+        Same matching and raw order as Database.search_terms().
+        
+        Args:
+            terms: Search terms; the first term orders the raw results
+            expansions: Synonym terms, matched at word boundaries
+            
+        Returns:
+            List of SearchHit objects for packages matching at least one term
+        """
+        query_rows = query_term_rows(terms, expansions)
+        if not query_rows:
+            return []
+        
+        # row -> matched terms per field (name, description, category, keywords)
+        matched: Dict[int, Tuple[List[str], List[str], List[str], List[str]]] = {}
+        for term, literal in query_rows:
+            whole_word = not literal
+            fields = (self._names.matches(term, whole_word),
+                      self._descriptions.matches(term, whole_word),
+                      self._categories.matches(term, whole_word),
+                      self._keyword_rows(term, whole_word))
+            for field, rows in enumerate(fields):
+                for row in rows:
+                    if row not in matched:
+                        matched[row] = ([], [], [], [])
+                    matched[row][field].append(term)
+        
+        first = query_rows[0][0]
+        
+        def order(row):
+            name_terms, description_terms = matched[row][:2]
+            if first in name_terms:
+                return 1, row
+            return (2 if first in description_terms else 3), row
+        
+        return [
+            SearchHit(
+                package=self.packages[row],
+                name_terms=frozenset(matched[row][0]),
+                description_terms=frozenset(matched[row][1]),
+                category_terms=frozenset(matched[row][2]),
+                keyword_terms=frozenset(matched[row][3])
+            )
+            for row in sorted(matched, key=order)
+        ]
+    
+    def count_search_terms(self, terms: List[str],
+                           expansions: Optional[List[str]] = None) -> int:
+        """
+        Count packages matching any of the terms.
+        
+        Args:
+            terms: Search terms
+            expansions: Synonym terms, matched at word boundaries
+            
+        Returns:
+            Number of matching packages
+        """
+        rows = set()
+        for term, literal in query_term_rows(terms, expansions):
+            whole_word = not literal
+            rows |= self._names.matches(term, whole_word)
+            rows |= self._descriptions.matches(term, whole_word)
+            rows |= self._categories.matches(term, whole_word)
+            rows |= self._keyword_rows(term, whole_word)
+        return len(rows)
+    
+    def get_package_by_name(self, name: str) -> Optional[Package]:
+        """
+        Get a specific package by its name.
+        
+        Args:
+            name: Package name
+            
+        Returns:
+            Package object or None if not in the snapshot
+        """
+        return self._by_name.get(normalize_text(name))
+
+
+class LiveIndex:
+    """
+    A SearchIndex kept current by a single background writer thread.
+    
+    Writes are queued and applied by the writer on its own WAL-mode
+    connection (the "concurrent" tuning profile), so other processes keep
+    reading the file while it writes. After each batch the writer builds a
+    new SearchIndex off to the side and replaces the `index` reference in
+    one assignment. Readers take no lock: a query grabs the current
+    snapshot once and uses it throughout, so it never sees a half-built
+    index or a mix of two.
+    
+    With a poll interval, the writer also picks up changes other processes
+    make to the file (seeds, syncs, imports). PRAGMA data_version tells it
+    another connection committed; the file's inode, mtime and size catch a
+    file that was replaced or rewritten outside SQLite. Packages listed in
+    the change log since the last refresh are reloaded into a copy of the
+    snapshot; anything the log cannot describe means a full rebuild.
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, poll_interval: Optional[float] = None):
+        """
+        Start the writer and build the first snapshot.
+        
+        Args:
+            db_path: Catalog file (None for the default database)
+            poll_interval: Seconds between checks for changes made by other
+                processes (None: only refresh on ingest() and refresh())
+                
+        Raises:
+            sqlite3.Error: The catalog could not be opened or read
+        """
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.index: Optional[SearchIndex] = None
+        self.generation = 0  # Incremented on every swap
+        
+        # Writer thread state
+        self._db: Optional[Database] = None
+        self._seq = 0  # change_log position the snapshot reflects
+        self._data_version = None
+        self._file_id = None
+        
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="packagepilot-index-writer",
+                                        daemon=True)
+        self._thread.start()
+        try:
+            self.rebuild().result()
+        except BaseException:
+            self.close()
+            raise
+    
+    def ingest(self, items: Iterable[Tuple[Package, List[str], Optional[List[str]]]]) -> Future:
+        """
+        Queue packages for Database.upsert_packages() on the writer.
+        
+        Args:
+            items: (Package, keywords, requirements) tuples
+            
+        Returns:
+            Future resolved with the number of packages written once the
+            snapshot that contains them is live
+        """
+        future = Future()
+        self._queue.put(("ingest", list(items), future))
+        return future
+    
+    def refresh(self) -> Future:
+        """
+        Queue a check for changes made by other processes.
+        
+        Returns:
+            Future resolved with the live generation once any changes are live
+        """
+        future = Future()
+        self._queue.put(("refresh", False, future))
+        return future
+    
+    def rebuild(self) -> Future:
+        """
+        Queue a full snapshot rebuild.
+        
+        Returns:
+            Future resolved with the new generation once it is live
+        """
+        future = Future()
+        self._queue.put(("refresh", True, future))
+        return future
+    
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> List[Package]:
+        """
+        Run search.search_packages() against the current snapshot.
+        
+        Args:
+            query: Search query
+            limit: Maximum number of results to return (None for all)
+            offset: Number of ranked results to skip
+            
+        Returns:
+            List of Package objects, ranked by relevance
+        """
+        return search_packages(query, self.index, limit=limit, offset=offset)
+    
+    def _file_stat(self) -> Optional[Tuple[int, int, int]]:
+        """(inode, mtime_ns, size) of the catalog file, or None while it is missing."""
+        try:
+            stat = os.stat(self._db.db_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
+    def _open(self):
+        """(Re)open the writer connection and note the file's identity."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        self._db = Database(self.db_path, tuning_profile="concurrent")
+        self._file_id = self._file_stat()
+        self._data_version = self._db.data_version()
+    
+    def _external_change(self) -> Optional[bool]:
+        """
+        Check whether another process changed the catalog file.
+        
+        Returns:
+            None if nothing changed, False if the change log can describe
+            the change, True if a full rebuild is needed
+        """
+        file_id = self._file_stat()
+        if file_id is None:
+            return None  # Mid-replacement; look again on the next poll
+        if file_id[0] != self._file_id[0]:
+            self._open()  # Replaced: this connection still reads the old file
+            return True
+        
+        data_version = self._db.data_version()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._file_id = file_id
+            return False  # Committed through SQLite, so it is in the change log
+        if file_id != self._file_id:
+            self._file_id = file_id
+            return True  # Rewritten in place outside SQLite
+        return None
+    
+    def _refresh(self, full: bool) -> bool:
+        """
+        Bring the snapshot up to date with the file and swap it in.
+        
+        Args:
+            full: Rebuild from every row instead of replaying the change log
+            
+        Returns:
+            Whether a new snapshot was swapped in
+        """
+        db = self._db
+        index = None
+        if not full:
+            changed, seq = db.get_changes(self._seq)
+            if changed is not None and len(changed) <= FULL_REBUILD_FRACTION * len(self.index):
+                if changed:
+                    index = self.index.updated(db.get_packages_with_keywords(changed), changed)
+                self._seq = seq
+                if index is None:
+                    return False
+        
+        if index is None:
+            # Position first: changes landing during the read are replayed next time
+            self._seq = db.get_change_seq()
+            index = SearchIndex.build(db)
+        self.index = index  # The swap: one reference assignment
+        self.generation += 1
+        return True
+    
+    def _run(self):
+        """Writer loop: apply everything queued, refresh once, swap, repeat."""
+        stop = False
+        while not stop:
+            try:
+                jobs = [self._queue.get(timeout=self.poll_interval)]
+            except queue.Empty:
+                jobs = []
+            while True:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(job is None for job in jobs)
+            jobs = [job for job in jobs if job is not None]
+            
+            try:
+                if self._db is None:
+                    self._open()
+                external = self._external_change() if self.index is not None else True
+            except Exception as error:
+                for _, _, future in jobs:
+                    future.set_exception(error)
+                continue
+            
+            # Each batch is its own transaction; a failed one fails only its future
+            results = []
+            full = external is True
+            for kind, payload, future in jobs:
+                try:
+                    if kind == "ingest":
+                        results.append((future, self._db.upsert_packages(payload)))
+                    else:
+                        full = full or payload
+                        results.append((future, None))
+                except Exception as error:
+                    future.set_exception(error)
+            
+            if results or external is not None:
+                try:
+                    self._refresh(full)
+                    self._file_id = self._file_stat()  # Own writes changed the file too
+                except Exception as error:
+                    for future, _ in results:
+                        future.set_exception(error)
+                    continue
+            for future, count in results:
+                future.set_result(self.generation if count is None else count)
+        
+        if self._db is not None:
+            self._db.close()
+    
+    def close(self):
+        """Finish the queued writes and stop the writer."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+    
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit - stops the writer."""
+        self.close()
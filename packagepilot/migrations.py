@@ -0,0 +1,380 @@
+"""
+Schema migrations for PackagePilot
+Ordered upgrades keyed on PRAGMA user_version, applied when a database is opened
+"""
+import sqlite3
+from typing import Callable, Dict, List, Optional
+
+from .deps import canonicalize_name
+from .normalize import join_tokens, normalize_text, token_set
+
+# Called with (migration description, rows done, rows total) during backfills
+Progress = Callable[[str, int, int], None]
+
+# Rows rewritten per transaction by backfills
+BACKFILL_BATCH_SIZE = 5000
+
+# Read-path indexes that no write method relies on: index name -> table (columns).
+# The bulk_load tuning profile drops them during a load and rebuilds each once.
+DEFERRED_INDEXES = {
+    "idx_dependencies_requirement": "dependencies (requirement)",
+    "idx_package_terms_term_id": "package_terms (term_id)",
+    "idx_packages_category_norm": "packages (category_norm, name)",
+    # Serves per-category top-N lists in index order (no sort, stops after N rows)
+    "idx_packages_category_popularity": "packages (category_norm, popularity DESC, name)",
+}
+
+
+def _columns(connection: sqlite3.Connection, table: str) -> List[str]:
+    """Column names of a table."""
+    return [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+
+
+def _has_table(connection: sqlite3.Connection, table: str) -> bool:
+    """Whether a table exists."""
+    return connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                              (table,)).fetchone() is not None
+
+
+def create_index(connection: sqlite3.Connection, name: str):
+    """Create one of the DEFERRED_INDEXES if it does not exist."""
+    connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {DEFERRED_INDEXES[name]}")
+
+
+def _create_tables(connection: sqlite3.Connection, report: Callable[[int, int], None]):
+    """Create the catalog, synonym, dependency, related-package, cache and sync tables."""
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS packages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT NOT NULL,
+            category TEXT NOT NULL,
+            install_command TEXT NOT NULL,
+            code_example TEXT NOT NULL,
+            pypi_url TEXT NOT NULL,
+            github_url TEXT,
+            documentation_url TEXT
+        )
+    """)
+    
+    # Synonyms used for query expansion
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS synonyms (
+            term TEXT NOT NULL,
+            synonym TEXT NOT NULL,
+            weight REAL NOT NULL DEFAULT 0.5,
+            PRIMARY KEY (term, synonym)
+        )
+    """)
+    
+    # Dependencies (requirement names are PEP 503 canonical)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS dependencies (
+            package_id INTEGER NOT NULL,
+            requirement TEXT NOT NULL,
+            specifier TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (package_id, requirement),
+            FOREIGN KEY (package_id) REFERENCES packages (id)
+        )
+    """)
+    create_index(connection, "idx_dependencies_requirement")
+    
+    # Related-packages index: MinHash signatures, LSH band buckets and
+    # the precomputed neighbour lists (see related.py)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS minhash (
+            package_id INTEGER PRIMARY KEY,
+            checksum INTEGER NOT NULL,
+            signature BLOB NOT NULL,
+            FOREIGN KEY (package_id) REFERENCES packages (id)
+        )
+    """)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS lsh_buckets (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            package_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, package_id)
+        ) WITHOUT ROWID
+    """)
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets_package_id "
+                       "ON lsh_buckets (package_id)")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS related (
+            package_id INTEGER NOT NULL,
+            related_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (package_id, related_id)
+        ) WITHOUT ROWID
+    """)
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_related_related_id ON related (related_id)")
+    
+    # HTTP cache: metadata responses with their validators
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body BLOB NOT NULL,
+            fetched_at TEXT NOT NULL
+        )
+    """)
+    
+    # Import cache: top-level imports of scanned source files
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS import_cache (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            imports TEXT NOT NULL
+        )
+    """)
+    
+    # Sync state: last change serial processed per mirror
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            source TEXT PRIMARY KEY,
+            last_serial INTEGER NOT NULL,
+            synced_at TEXT NOT NULL
+        )
+    """)
+
+
+def _term_dictionary(connection: sqlite3.Connection, report: Callable[[int, int], None]):
+    """Create the term dictionary and move old per-row keywords into it."""
+    # Each normalized keyword is stored once and packages refer to it by id,
+    # so searches match terms then join on integers
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS terms (
+            id INTEGER PRIMARY KEY,
+            term TEXT UNIQUE NOT NULL
+        )
+    """)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS package_terms (
+            package_id INTEGER NOT NULL,
+            term_id INTEGER NOT NULL,
+            PRIMARY KEY (package_id, term_id),
+            FOREIGN KEY (package_id) REFERENCES packages (id),
+            FOREIGN KEY (term_id) REFERENCES terms (id)
+        ) WITHOUT ROWID
+    """)
+    create_index(connection, "idx_package_terms_term_id")
+    if not _has_table(connection, "keywords"):
+        return
+    
+    # Copy the old per-row keywords in id order. Everything runs in the
+    # migration's transaction; INSERT OR IGNORE keeps a re-run harmless.
+    total = connection.execute("SELECT COUNT(*) FROM keywords").fetchone()[0]
+    done = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            "SELECT id, package_id, keyword FROM keywords WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, BACKFILL_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        pairs = [(row[1], normalize_text(row[2])) for row in rows]
+        pairs = [(package_id, term) for package_id, term in pairs if term]
+        connection.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)",
+                               ((term,) for _, term in pairs))
+        connection.executemany("""
+            INSERT OR IGNORE INTO package_terms (package_id, term_id)
+            SELECT ?, id FROM terms WHERE term = ?
+        """, pairs)
+        done += len(rows)
+        last_id = rows[-1][0]
+        report(done, total)
+    connection.execute("DROP TABLE keywords")
+
+
+def _normalized_columns(connection: sqlite3.Connection, report: Callable[[int, int], None]):
+    """Add the normalized search columns, backfill them and index them."""
+    columns = _columns(connection, "packages")
+    for column in ("name_norm", "description_norm", "category_norm", "tokens"):
+        if column not in columns:
+            connection.execute(f"ALTER TABLE packages ADD COLUMN {column} TEXT")
+    
+    # Rows still without a token set are filled in id order, in batches so
+    # progress can be reported; all inside the migration's transaction
+    total = connection.execute("SELECT COUNT(*) FROM packages WHERE tokens IS NULL").fetchone()[0]
+    done = 0
+    last_id = 0
+    while done < total:
+        rows = connection.execute("""
+            SELECT id, name, description, category FROM packages
+            WHERE id > ? AND tokens IS NULL ORDER BY id LIMIT ?
+        """, (last_id, BACKFILL_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        
+        keywords: Dict[int, List[str]] = {}
+        for package_id, term in connection.execute("""
+            SELECT pt.package_id, t.term FROM package_terms pt JOIN terms t ON t.id = pt.term_id
+            WHERE pt.package_id BETWEEN ? AND ?
+        """, (rows[0][0], rows[-1][0])):
+            keywords.setdefault(package_id, []).append(term)
+        
+        connection.executemany("""
+            UPDATE packages
+            SET name_norm = ?, description_norm = ?, category_norm = ?, tokens = ?
+            WHERE id = ?
+        """, ((normalize_text(name), normalize_text(description), normalize_text(category),
+               join_tokens(token_set(name, description, category, *keywords.get(package_id, []))),
+               package_id)
+              for package_id, name, description, category in rows))
+        done += len(rows)
+        last_id = rows[-1][0]
+        report(done, total)
+    
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_packages_name_norm ON packages (name_norm)")
+    create_index(connection, "idx_packages_category_norm")
+
+
+def _popularity(connection: sqlite3.Connection, report: Callable[[int, int], None]):
+    """Add the popularity column and the per-category top-N index."""
+    if "popularity" not in _columns(connection, "packages"):
+        connection.execute("ALTER TABLE packages ADD COLUMN popularity REAL NOT NULL DEFAULT 0")
+    create_index(connection, "idx_packages_category_popularity")
+
+
+def _change_log(connection: sqlite3.Connection, report: Callable[[int, int], None]):
+    """Log the id of every package a write touches, for incremental index refreshes."""
+    # package_id NULL marks a change not tied to one package (synonyms), after
+    # which readers reload everything. Keyword writes always update their
+    # package row too (tokens), so the packages triggers cover them.
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            package_id INTEGER
+        )
+    """)
+    for event, row in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS packages_{event.lower()}_log AFTER {event} ON packages
+            BEGIN
+                INSERT INTO change_log (package_id) VALUES ({row}.id);
+            END
+        """)
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS synonyms_{event.lower()}_log AFTER {event} ON synonyms
+            BEGIN
+                INSERT INTO change_log (package_id) VALUES (NULL);
+            END
+        """)
+
+
+def _sync_projects(connection: sqlite3.Connection, report: Callable[[int, int], None]):
+    """Track each mirror project's last change serial and failed loads."""
+    # attempts counts syncs that found no JSON document for the project at
+    # this serial (0 once it is ingested); names are PEP 503 canonical
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS sync_projects (
+            source TEXT NOT NULL,
+            name TEXT NOT NULL,
+            serial INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (source, name)
+        ) WITHOUT ROWID
+    """)
+
+
+def _canonical_names(connection: sqlite3.Connection, report: Callable[[int, int], None]):
+    """Add the PEP 503 canonical name column, backfill it and index it."""
+    if "canonical_name" not in _columns(connection, "packages"):
+        connection.execute("ALTER TABLE packages ADD COLUMN canonical_name TEXT")
+    
+    total = connection.execute(
+        "SELECT COUNT(*) FROM packages WHERE canonical_name IS NULL").fetchone()[0]
+    done = 0
+    last_id = 0
+    while done < total:
+        rows = connection.execute("""
+            SELECT id, name FROM packages
+            WHERE id > ? AND canonical_name IS NULL ORDER BY id LIMIT ?
+        """, (last_id, BACKFILL_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        connection.executemany("UPDATE packages SET canonical_name = ? WHERE id = ?",
+                               ((canonicalize_name(name), package_id) for package_id, name in rows))
+        done += len(rows)
+        last_id = rows[-1][0]
+        report(done, total)
+    
+    # Not deferred: upserts look packages up by canonical name
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_packages_canonical_name "
+                       "ON packages (canonical_name)")
+
+
+# Applied in order; a database at user_version N has had the first N applied.
+# Append new migrations here and never reorder or edit released ones.
+MIGRATIONS = [
+    ("Create tables", _create_tables),
+    ("Move keywords into the term dictionary", _term_dictionary),
+    ("Backfill normalized search columns", _normalized_columns),
+    ("Add popularity column", _popularity),
+    ("Track package changes", _change_log),
+    ("Track mirror projects", _sync_projects),
+    ("Add canonical name column", _canonical_names),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(connection: sqlite3.Connection) -> int:
+    """
+    Get the schema version recorded in a database.
+    
+    Args:
+        connection: Open SQLite connection
+        
+    Returns:
+        PRAGMA user_version (0 for a new or pre-versioning database)
+    """
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(connection: sqlite3.Connection, progress: Optional[Progress] = None) -> List[str]:
+    """
+    Bring a database up to SCHEMA_VERSION.
+    
+    Each pending migration, backfill included, runs in one transaction
+    under a write lock (BEGIN IMMEDIATE) and bumps user_version in that
+    same transaction. Another process opening the database waits for the
+    lock and then sees the new version, so each migration is applied
+    exactly once; an interrupted one rolls back and runs again in full.
+    Migrations check what already exists, so databases from before
+    versioning (user_version 0) are upgraded in place. A database from a
+    newer release is left alone.
+    
+    Args:
+        connection: Open SQLite connection
+        progress: Called with (description, done, total) after each backfill
+            batch (nothing is committed until the migration completes)
+        
+    Returns:
+        Descriptions of the migrations applied
+    """
+    applied = []
+    if schema_version(connection) >= SCHEMA_VERSION:
+        return applied
+    
+    for version, (description, migration) in enumerate(MIGRATIONS, 1):
+        connection.execute("BEGIN IMMEDIATE")
+        if schema_version(connection) >= version:
+            connection.commit()  # Already applied, possibly by another process
+            continue
+        
+        def report(done: int, total: int, description: str = description):
+            if progress is not None:
+                progress(description, done, total)
+        
+        try:
+            migration(connection, report)
+            connection.execute(f"PRAGMA user_version = {version}")
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        applied.append(description)
+    return applied
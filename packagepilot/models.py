@@ -1,8 +1,8 @@
 """
 Data models for PackagePilot
 """
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import FrozenSet, Optional
 
 
 @dataclass
@@ -20,6 +20,10 @@ class Package:
         pypi_url: Link to PyPI page
         github_url: Link to GitHub repo (optional)
         documentation_url: Link to documentation (optional)
+        popularity: Popularity signal (downloads, stars or an imported score)
+        name_norm: Normalized name, filled in when loaded from the database
+        description_norm: Normalized description, as above
+        category_norm: Normalized category, as above
     """
     id: Optional[int]
     name: str
@@ -30,7 +34,35 @@ class Package:
     pypi_url: str
     github_url: Optional[str] = None
     documentation_url: Optional[str] = None
+    popularity: float = 0.0
+    name_norm: Optional[str] = field(default=None, repr=False, compare=False)
+    description_norm: Optional[str] = field(default=None, repr=False, compare=False)
+    category_norm: Optional[str] = field(default=None, repr=False, compare=False)
     
     def __str__(self) -> str:
         """Return a formatted string representation of the package."""
         return f"{self.name} - {self.description}"
+
+
+@dataclass
+class SearchHit:
+    """
+    A package returned by Database.search_terms with the terms it matched.
+    
+    Attributes:
+        package: The matching Package
+        name_terms: Query terms found in the package name
+        description_terms: Query terms found in the description
+        category_terms: Query terms found in the category
+        keyword_terms: Query terms found in the package keywords
+    """
+    package: Package
+    name_terms: FrozenSet[str]
+    description_terms: FrozenSet[str]
+    category_terms: FrozenSet[str]
+    keyword_terms: FrozenSet[str]
+    
+    @property
+    def matched_terms(self) -> FrozenSet[str]:
+        """All query terms matched in any field."""
+        return self.name_terms | self.description_terms | self.category_terms | self.keyword_terms
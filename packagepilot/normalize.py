@@ -0,0 +1,94 @@
+"""
+Text normalization for PackagePilot
+Catalog text is normalized once at write time and stored alongside the original
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional, Pattern, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for case-insensitive matching (NFKC + casefold).
+    
+    Args:
+        text: Text to normalize
+        
+    Returns:
+        Normalized text
+    """
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+@lru_cache(maxsize=1024)
+def _word_pattern(term: str) -> Pattern:
+    """Compiled pattern matching term only at word boundaries."""
+    return re.compile(r"(?<!\w)" + re.escape(term) + r"(?!\w)")
+
+
+def has_word(text: str, term: str) -> bool:
+    """
+    Check whether normalized text contains term as whole words.
+    
+    Unlike a substring test, 'orm' is not found in 'formatting' and 'ai'
+    is not found in 'pairs'. Multi-word terms such as 'machine learning'
+    must appear as the same words in sequence.
+    
+    Args:
+        text: Normalized text
+        term: Normalized term
+        
+    Returns:
+        True if term occurs in text at word boundaries
+    """
+    return bool(text) and _word_pattern(term).search(text) is not None
+
+
+def query_term_rows(terms: Iterable[str],
+                    expansions: Optional[Iterable[str]] = None) -> List[Tuple[str, int]]:
+    """
+    Normalize and de-duplicate search terms, keeping their order.
+    
+    Args:
+        terms: Terms typed by the user (matched as substrings)
+        expansions: Synonym terms (matched as whole words)
+        
+    Returns:
+        (term, literal) pairs; literal is 1 for user terms and 0 for
+        expansions, and a term given as both stays literal
+    """
+    rows = dict.fromkeys((normalize_text(term) for term in terms if term), 1)
+    for term in expansions or []:
+        if term:
+            rows.setdefault(normalize_text(term), 0)
+    return list(rows.items())
+
+
+def token_set(*texts: str) -> FrozenSet[str]:
+    """
+    Split texts into a set of normalized word tokens.
+    
+    Args:
+        texts: Texts to tokenize
+        
+    Returns:
+        Set of unique tokens
+    """
+    tokens = set()
+    for text in texts:
+        if text:
+            tokens.update(_TOKEN_RE.findall(normalize_text(text)))
+    return frozenset(tokens)
+
+
+def join_tokens(tokens: Iterable[str]) -> str:
+    """Serialize a token set for the packages.tokens column."""
+    return " ".join(sorted(tokens))
+
+
+def split_tokens(value: str) -> FrozenSet[str]:
+    """Deserialize a packages.tokens column value."""
+    return frozenset(value.split()) if value else frozenset()
@@ -0,0 +1,125 @@
+"""
+Output writers for PackagePilot
+Streams text, JSON or NDJSON to stdout through a single buffered writer
+"""
+import json
+import sys
+from typing import Any, Dict, Iterable, Union
+
+import sqlite3
+
+from .models import Package
+
+FORMATS = ("text", "json", "ndjson")
+
+# Public package fields written by the json/ndjson formats
+PACKAGE_FIELDS = (
+    "id", "name", "description", "category", "install_command",
+    "code_example", "pypi_url", "github_url", "documentation_url", "popularity",
+)
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+
+def package_record(package: Union[Package, sqlite3.Row]) -> Dict[str, Any]:
+    """
+    Convert a Package or a packages-table row to a JSON-ready dict.
+    
+    Args:
+        package: Package object or sqlite3.Row from the packages table
+        
+    Returns:
+        Dict with the public package fields
+    """
+    if isinstance(package, sqlite3.Row):
+        return {field: package[field] for field in PACKAGE_FIELDS}
+    return {field: getattr(package, field) for field in PACKAGE_FIELDS}
+
+
+class OutputWriter:
+    """
+    Buffered writer for command output.
+    
+    Text is collected into chunks and written to the stream once the buffer
+    fills, so streaming thousands of packages costs a handful of writes.
+    
+    Example:
+        with OutputWriter("ndjson") as out:
+            out.records(package_record(row) for row in db.iter_package_rows())
+    """
+    
+    def __init__(self, fmt: str = "text", stream=None, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        """
+        Create a writer.
+        
+        Args:
+            fmt: Output format ('text', 'json' or 'ndjson')
+            stream: Text stream to write to (default: sys.stdout)
+            buffer_size: Characters buffered before writing to the stream
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format '{fmt}' (choose from {', '.join(FORMATS)})")
+        self.format = fmt
+        self.stream = stream if stream is not None else sys.stdout
+        self.buffer_size = buffer_size
+        self._chunks = []
+        self._size = 0
+    
+    def write(self, text: str):
+        """Buffer raw text."""
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+    
+    def line(self, text: str = ""):
+        """Buffer one line of text."""
+        self.write(text + "\n")
+    
+    def records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Stream records as a JSON array or as NDJSON lines.
+        
+        Args:
+            records: Iterable of JSON-ready dicts (consumed lazily)
+            
+        Returns:
+            Number of records written
+        """
+        dumps = json.dumps
+        count = 0
+        if self.format == "ndjson":
+            for record in records:
+                self.write(dumps(record) + "\n")
+                count += 1
+            return count
+        
+        self.write("[")
+        for record in records:
+            self.write(("\n  " if count == 0 else ",\n  ") + dumps(record))
+            count += 1
+        self.write("\n]\n" if count else "]\n")
+        return count
+    
+    def value(self, value: Any):
+        """Write a single JSON document (one line for ndjson)."""
+        if self.format == "ndjson":
+            self.write(json.dumps(value) + "\n")
+        else:
+            self.write(json.dumps(value, indent=2) + "\n")
+    
+    def flush(self):
+        """Write buffered text to the stream."""
+        if self._chunks:
+            self.stream.write("".join(self._chunks))
+            self._chunks = []
+            self._size = 0
+        self.stream.flush()
+    
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit - flushes buffered output."""
+        self.flush()
@@ -0,0 +1,254 @@
+"""
+SQL instrumentation for PackagePilot
+Per-method query counters, latency histograms and a slow-query log
+"""
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BOUNDS_MS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000]
+
+DEFAULT_SLOW_QUERY_MS = 100.0
+
+PERF_STATS_FILE = "perf_stats.json"
+SLOW_LOG_FILE = "slow_queries.log"
+
+
+def default_perf_dir() -> Path:
+    """
+    Directory for the statistics file and slow-query log.
+    
+    Returns:
+        PACKAGEPILOT_PERF_DIR if set, else the per-user state directory
+        (%LOCALAPPDATA%\\packagepilot on Windows, $XDG_STATE_HOME/packagepilot
+        or ~/.local/state/packagepilot elsewhere)
+    """
+    configured = os.environ.get("PACKAGEPILOT_PERF_DIR")
+    if configured:
+        return Path(configured).expanduser()
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return Path(os.environ["LOCALAPPDATA"]) / "packagepilot"
+    state_home = os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state"
+    return Path(state_home) / "packagepilot"
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on path's sidecar .lock file (a no-op without fcntl)."""
+    with open(str(path) + ".lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+class MethodStats:
+    """Counters for the statements issued by one Database method."""
+    
+    def __init__(self):
+        """Create empty counters."""
+        self.calls = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    
+    def record(self, elapsed_ms: float, rows: int, slow: bool):
+        """Record one statement."""
+        self.calls += 1
+        self.rows += rows
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.slow += slow
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[index] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+    
+    def to_dict(self) -> Dict:
+        """Serialize the counters."""
+        return {
+            "calls": self.calls,
+            "rows": self.rows,
+            "total_ms": self.total_ms,
+            "max_ms": self.max_ms,
+            "slow": self.slow,
+            "histogram": list(self.histogram),
+        }
+    
+    def merge(self, data: Dict):
+        """Add counters previously produced by to_dict()."""
+        self.calls += data["calls"]
+        self.rows += data["rows"]
+        self.total_ms += data["total_ms"]
+        self.max_ms = max(self.max_ms, data["max_ms"])
+        self.slow += data["slow"]
+        self.histogram = [a + b for a, b in zip(self.histogram, data["histogram"])]
+
+
+class QueryInstrumentation:
+    """
+    Collects statistics for every statement a Database executes.
+    
+    Statements slower than slow_query_ms are appended to the slow-query
+    log together with their EXPLAIN QUERY PLAN.
+    """
+    
+    def __init__(self, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS,
+                 slow_log_path: Optional[Path] = None):
+        """
+        Create an empty collector.
+        
+        Args:
+            slow_query_ms: Threshold above which statements are logged
+            slow_log_path: File the slow-query log is appended to (None disables it)
+        """
+        self.slow_query_ms = slow_query_ms
+        self.slow_log_path = Path(slow_log_path) if slow_log_path else None
+        self.methods: Dict[str, MethodStats] = {}
+    
+    def record(self, method: str, sql: str, parameters, elapsed_ms: float, rows: int,
+               connection=None):
+        """
+        Record one executed statement.
+        
+        Args:
+            method: Database method that issued the statement
+            sql: SQL text
+            parameters: Statement parameters
+            elapsed_ms: Execution plus fetch time in milliseconds
+            rows: Rows returned (or affected)
+            connection: Connection used to run EXPLAIN QUERY PLAN for slow statements
+        """
+        slow = elapsed_ms > self.slow_query_ms
+        stats = self.methods.get(method)
+        if stats is None:
+            stats = self.methods[method] = MethodStats()
+        stats.record(elapsed_ms, rows, slow)
+        
+        if slow and self.slow_log_path is not None:
+            self._log_slow_query(method, sql, parameters, elapsed_ms, rows, connection)
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Get the collected statistics.
+        
+        Returns:
+            Mapping of method name -> counters
+        """
+        return {method: stats.to_dict() for method, stats in self.methods.items()}
+    
+    def reset(self):
+        """Clear the collected statistics."""
+        self.methods.clear()
+    
+    def save(self, path: Path):
+        """
+        Merge the collected statistics into a JSON file.
+        
+        Counters accumulate across processes, which is how
+        'packagepilot stats --perf' sees every CLI invocation. The merge
+        runs under a file lock and the file is replaced atomically, so
+        concurrent processes neither lose counts nor leave a torn file.
+        
+        Args:
+            path: Statistics file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _locked(path):
+            merged = {}
+            for method, data in load_perf_stats(path).items():
+                merged[method] = MethodStats()
+                merged[method].merge(data)
+            for method, stats in self.methods.items():
+                merged.setdefault(method, MethodStats()).merge(stats.to_dict())
+            
+            fd, temp_path = tempfile.mkstemp(dir=str(path.parent), prefix=path.name,
+                                             suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as temp:
+                    json.dump({method: stats.to_dict() for method, stats in merged.items()},
+                              temp, indent=2)
+                os.replace(temp_path, str(path))
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+    
+    def _log_slow_query(self, method, sql, parameters, elapsed_ms, rows, connection):
+        """Append a slow statement and its query plan to the slow-query log."""
+        lines = [
+            f"# {time.strftime('%Y-%m-%dT%H:%M:%S')} {method} {elapsed_ms:.3f} ms rows={rows}",
+            "SQL: " + re.sub(r"\s+", " ", sql).strip(),
+            f"PARAMS: {list(parameters)!r}",
+        ]
+        if connection is not None:
+            lines.append("PLAN:")
+            try:
+                plan = connection.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+                lines.extend(f"  {row[3]}" for row in plan)
+            except Exception as error:
+                lines.append(f"  (unavailable: {error})")
+        
+        self.slow_log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.slow_log_path, "a", encoding="utf-8") as log:
+            log.write("\n".join(lines) + "\n\n")
+
+
+def load_perf_stats(path: Path) -> Dict[str, Dict]:
+    """
+    Load statistics saved by QueryInstrumentation.save().
+    
+    Args:
+        path: Statistics file
+        
+    Returns:
+        Mapping of method name -> counters (empty if the file doesn't exist)
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def format_perf_stats(stats: Dict[str, Dict]) -> List[str]:
+    """
+    Format statistics as a table for the CLI.
+    
+    Args:
+        stats: Mapping of method name -> counters
+        
+    Returns:
+        List of output lines
+    """
+    lines = [f"  {'Method':26} {'Calls':>7} {'Rows':>9} {'Avg ms':>9} {'Max ms':>9} {'Slow':>5}"]
+    for method, data in sorted(stats.items(), key=lambda item: item[1]["total_ms"], reverse=True):
+        average = data["total_ms"] / data["calls"] if data["calls"] else 0.0
+        lines.append(f"  {method:26} {data['calls']:7} {data['rows']:9} "
+                     f"{average:9.3f} {data['max_ms']:9.3f} {data['slow']:5}")
+    
+    labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+    lines.append("")
+    lines.append("  Latency histogram (all methods):")
+    totals = [sum(column) for column in zip(*(data["histogram"] for data in stats.values()))]
+    for label, count in zip(labels, totals):
+        if count:
+            lines.append(f"  {label:>10} {'#' * min(count, 50)} {count}")
+    return lines
@@ -0,0 +1,148 @@
+"""
+Related packages for PackagePilot
+MinHash signatures with LSH banding over package token sets, precomputed offline
+"""
+import random
+import zlib
+from array import array
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from .normalize import split_tokens
+
+# 30 bands of 2 rows: pairs with Jaccard similarity above ~0.2 are likely to share a bucket
+NUM_BANDS = 30
+ROWS_PER_BAND = 2
+NUM_PERMUTATIONS = NUM_BANDS * ROWS_PER_BAND
+
+# Buckets with more members than this (e.g. every package whose minimum
+# tokens are "data" and "python") are skipped when gathering candidates
+MAX_BUCKET_SIZE = 500
+
+DEFAULT_TOP_K = 10
+MIN_SIMILARITY = 0.2
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+                 for _ in range(NUM_PERMUTATIONS)]
+
+
+def minhash_signature(tokens: Iterable[str]) -> List[int]:
+    """
+    Compute the MinHash signature of a token set.
+    
+    Each of NUM_PERMUTATIONS universal hash functions (a * x + b mod p)
+    is applied to the CRC32 of every token and the minimum is kept.
+    
+    Args:
+        tokens: Token set
+        
+    Returns:
+        List of NUM_PERMUTATIONS ints (empty for an empty token set)
+    """
+    hashes = [zlib.crc32(token.encode("utf-8")) for token in tokens]
+    if not hashes:
+        return []
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_buckets(signature: List[int]) -> List[int]:
+    """
+    Hash each band of a signature to a bucket id.
+    
+    Args:
+        signature: MinHash signature
+        
+    Returns:
+        One bucket id per band (empty for an empty signature)
+    """
+    if not signature:
+        return []
+    return [zlib.crc32(array("Q", signature[start:start + ROWS_PER_BAND]).tobytes())
+            for start in range(0, NUM_PERMUTATIONS, ROWS_PER_BAND)]
+
+
+def jaccard(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    """Jaccard similarity of two token sets."""
+    if not first or not second:
+        return 0.0
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+
+def token_checksum(tokens: Optional[str]) -> int:
+    """Checksum of a packages.tokens value, used to detect changed packages."""
+    return zlib.crc32((tokens or "").encode("utf-8"))
+
+
+def _neighbours(db, package_id: int, tokens: FrozenSet[str], top_k: int,
+                min_similarity: float) -> List[Tuple[int, float]]:
+    """Score a package's LSH candidates by exact Jaccard similarity and keep the best."""
+    scored = []
+    for candidate_id, candidate_tokens in db.get_lsh_candidates(package_id, MAX_BUCKET_SIZE):
+        score = jaccard(tokens, split_tokens(candidate_tokens))
+        if score >= min_similarity:
+            scored.append((candidate_id, score))
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:top_k]
+
+
+def refresh_related(db, full: bool = False, top_k: int = DEFAULT_TOP_K,
+                    min_similarity: float = MIN_SIMILARITY,
+                    progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Bring the precomputed related-package lists up to date.
+    
+    Only packages whose token set changed since the last run get new
+    signatures. Their lists are recomputed, as are the lists of packages
+    that share a bucket with them or already list them as related.
+    
+    Args:
+        db: Database to refresh
+        full: Drop all signatures and rebuild everything
+        top_k: Neighbours kept per package
+        min_similarity: Minimum Jaccard similarity of a related package
+        progress: Called with (done, total) while lists are recomputed
+        
+    Returns:
+        Number of packages whose related list was recomputed
+    """
+    if full:
+        db.clear_related_index()
+    
+    checksums = db.get_minhash_checksums()
+    changed: Dict[int, FrozenSet[str]] = {}
+    signatures = []
+    for package_id, tokens in db.iter_package_tokens():
+        checksum = token_checksum(tokens)
+        if checksums.pop(package_id, None) != checksum:
+            changed[package_id] = split_tokens(tokens)
+            signature = minhash_signature(changed[package_id])
+            signatures.append((package_id, checksum, signature, band_buckets(signature)))
+    
+    # Whatever is left in checksums belongs to packages that no longer exist
+    removed = set(checksums)
+    affected: Set[int] = db.get_related_sources(set(changed) | removed) - removed
+    db.delete_minhash(removed)
+    db.store_minhash(signatures)
+    
+    lists: Dict[int, List[Tuple[int, float]]] = {}
+    for package_id, tokens in changed.items():
+        lists[package_id] = _neighbours(db, package_id, tokens, top_k, min_similarity)
+        affected.update(candidate for candidate, _ in lists[package_id])
+    
+    others = sorted(affected - set(changed))
+    for package_id, tokens in db.get_package_tokens(others).items():
+        lists[package_id] = _neighbours(db, package_id, split_tokens(tokens), top_k,
+                                        min_similarity)
+    
+    total = len(lists)
+    batch = []
+    for done, item in enumerate(lists.items(), 1):
+        batch.append(item)
+        if len(batch) >= 1000 or done == total:
+            db.store_related(batch)
+            batch = []
+            if progress is not None:
+                progress(done, total)
+    return total
@@ -0,0 +1,323 @@
+"""
+Project scanners for PackagePilot
+Read a project's requirements or imports and look them all up in one query
+"""
+import ast
+import os
+import re
+import sys
+import sysconfig
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .deps import canonicalize_name, parse_requirement
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:  # pragma: no cover - depends on the Python version
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# (name, specifier, source) - source is the file or table the requirement came from
+Requirement = Tuple[str, str, str]
+
+_EGG_RE = re.compile(r"#egg=([A-Za-z0-9._-]+)")
+
+
+def _requirements_txt(path: Path, seen: Set[Path]) -> List[Requirement]:
+    """Parse a requirements file, following -r includes."""
+    path = path.resolve()
+    if path in seen:
+        return []
+    seen.add(path)
+    
+    text = path.read_text(encoding="utf-8").replace("\\\n", "")
+    requirements = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith(("-r", "--requirement")):
+            target = re.sub(r"^(-r|--requirement)[ =]?", "", line).strip()
+            requirements += _requirements_txt(path.parent / target, seen)
+            continue
+        if line.startswith(("-e ", "--editable ")):
+            match = _EGG_RE.search(line)
+            if match:
+                requirements.append((canonicalize_name(match.group(1)), "", path.name))
+            continue
+        
+        # Drop per-requirement options such as --hash=...
+        line = re.split(r"\s+--?\w", line, maxsplit=1)[0]
+        parsed = parse_requirement(line)
+        if parsed is not None:
+            name, specifier = parsed
+            if specifier.startswith("@"):
+                specifier = ""  # Direct URL reference
+            requirements.append((name, specifier, path.name))
+    return requirements
+
+
+def _poetry_requirements(table: Dict, source: str) -> List[Requirement]:
+    """Convert a Poetry dependencies table (name -> constraint) to requirements."""
+    requirements = []
+    for name, constraint in table.items():
+        if name.lower() == "python":
+            continue
+        if isinstance(constraint, dict):
+            constraint = constraint.get("version", "")
+        elif not isinstance(constraint, str):
+            constraint = ""
+        parsed = parse_requirement(name)
+        if parsed is not None:
+            requirements.append((parsed[0], "" if constraint == "*" else constraint, source))
+    return requirements
+
+
+def _pyproject_toml(path: Path) -> List[Requirement]:
+    """Parse PEP 621, PEP 735 and Poetry dependency tables of a pyproject.toml."""
+    if tomllib is None:
+        raise RuntimeError("Reading pyproject.toml needs Python 3.11+ or 'pip install tomli'")
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+    
+    entries = []
+    project = data.get("project", {})
+    entries += [(line, "project.dependencies") for line in project.get("dependencies", [])]
+    for extra, lines in project.get("optional-dependencies", {}).items():
+        entries += [(line, f"project.optional-dependencies.{extra}") for line in lines]
+    for group, lines in data.get("dependency-groups", {}).items():
+        entries += [(line, f"dependency-groups.{group}") for line in lines
+                    if isinstance(line, str)]  # Skip {include-group = ...}
+    
+    requirements = []
+    for line, source in entries:
+        parsed = parse_requirement(line)
+        if parsed is not None:
+            requirements.append((parsed[0], parsed[1], source))
+    
+    poetry = data.get("tool", {}).get("poetry", {})
+    requirements += _poetry_requirements(poetry.get("dependencies", {}),
+                                         "tool.poetry.dependencies")
+    requirements += _poetry_requirements(poetry.get("dev-dependencies", {}),
+                                         "tool.poetry.dev-dependencies")
+    for group, table in poetry.get("group", {}).items():
+        requirements += _poetry_requirements(table.get("dependencies", {}),
+                                             f"tool.poetry.group.{group}")
+    return requirements
+
+
+def read_requirements(path: str) -> List[Requirement]:
+    """
+    Read the requirements of a project file.
+    
+    Args:
+        path: requirements*.txt or pyproject.toml
+        
+    Returns:
+        List of (canonical name, specifier, source) tuples, first occurrence
+        of each name only
+        
+    Raises:
+        RuntimeError: pyproject.toml given but no TOML parser is available
+    """
+    path = Path(path)
+    if path.suffix == ".toml":
+        requirements = _pyproject_toml(path)
+    else:
+        requirements = _requirements_txt(path, set())
+    
+    unique = {}
+    for requirement in requirements:
+        unique.setdefault(requirement[0], requirement)
+    return list(unique.values())
+
+
+# Import names that differ from the distribution providing them
+IMPORT_ALIASES = {
+    "bs4": "beautifulsoup4",
+    "PIL": "pillow",
+    "sklearn": "scikit-learn",
+    "yaml": "pyyaml",
+    "dotenv": "python-dotenv",
+    "cv2": "opencv-python",
+    "dateutil": "python-dateutil",
+    "attr": "attrs",
+    "jwt": "pyjwt",
+    "OpenSSL": "pyopenssl",
+    "Crypto": "pycryptodome",
+    "docx": "python-docx",
+    "magic": "python-magic",
+    "serial": "pyserial",
+    "usb": "pyusb",
+    "git": "gitpython",
+    "fitz": "pymupdf",
+    "skimage": "scikit-image",
+    "win32api": "pywin32",
+}
+
+# Directories never worth scanning
+SKIP_DIRS = {
+    ".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv", "env", "node_modules",
+    "__pycache__", "build", "dist", "site-packages", ".mypy_cache", ".pytest_cache",
+}
+
+# Changed files below this count are parsed inline instead of on the process pool
+PARALLEL_PARSE_THRESHOLD = 64
+
+
+@dataclass
+class ImportScan:
+    """
+    Result of scanning a source tree for imports.
+    
+    Attributes:
+        files: Python files found
+        parsed: Files parsed in this run (new or changed since the cache)
+        imports: Top-level third-party import name -> number of files importing it
+    """
+    files: int
+    parsed: int
+    imports: Dict[str, int] = field(default_factory=dict)
+
+
+def stdlib_modules() -> FrozenSet[str]:
+    """Names of standard library top-level modules."""
+    names = getattr(sys, "stdlib_module_names", None)  # Python 3.10+
+    if names is not None:
+        return frozenset(names) | frozenset(sys.builtin_module_names)
+    
+    stdlib = Path(sysconfig.get_paths()["stdlib"])
+    found = {path.stem if path.suffix == ".py" else path.name
+             for path in stdlib.iterdir() if path.suffix == ".py" or path.is_dir()}
+    dynload = stdlib / "lib-dynload"
+    if dynload.is_dir():
+        found.update(path.name.split(".")[0] for path in dynload.iterdir())
+    return frozenset(found) | frozenset(sys.builtin_module_names)
+
+
+def distribution_name(module: str) -> str:
+    """
+    Guess the distribution that provides a top-level import name.
+    
+    Args:
+        module: Top-level import name, e.g. 'sklearn'
+        
+    Returns:
+        Canonical distribution name, e.g. 'scikit-learn'
+    """
+    return canonicalize_name(IMPORT_ALIASES.get(module, module))
+
+
+def parse_imports(path: str) -> Tuple[str, List[str]]:
+    """
+    Parse a Python file and list the top-level modules it imports.
+    
+    Relative imports are ignored; files that cannot be read or parsed
+    yield no imports.
+    
+    Args:
+        path: Python source file
+        
+    Returns:
+        (path, sorted top-level module names) tuple
+    """
+    try:
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return path, []
+    
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.add(node.module.split(".")[0])
+    return path, sorted(modules)
+
+
+def _walk_python_files(root: Path) -> Tuple[Dict[str, Tuple[int, int]], Set[str]]:
+    """
+    Find Python files under root.
+    
+    The project's own modules are the modules and packages directly under
+    root or root/src (and root itself when it is a package). Deeper files
+    such as tests/requests.py do not hide a third-party import of the
+    same name.
+    
+    Returns:
+        (path -> (mtime_ns, size), names of the project's own top-level modules)
+    """
+    files = {}
+    local = set()
+    top_levels = {str(root), os.path.join(str(root), "src")}
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames
+                       if name not in SKIP_DIRS and not name.startswith(".")]
+        top_level = directory in top_levels
+        if "__init__.py" in filenames and (directory == str(root)
+                                           or os.path.dirname(directory) in top_levels):
+            local.add(os.path.basename(directory))
+        for filename in filenames:
+            if filename.endswith(".py"):
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+                if top_level:
+                    local.add(filename[:-3])
+    return files, local
+
+
+def scan_imports(db, root: str, workers: Optional[int] = None) -> ImportScan:
+    """
+    Find the third-party modules a source tree imports.
+    
+    Per-file results are cached in the database by path, mtime and size,
+    so a re-scan only parses new or changed files. Changed files are
+    parsed on a process pool.
+    
+    Args:
+        db: Database holding the import cache
+        root: Source tree to scan
+        workers: Parser processes (default: one per core)
+        
+    Returns:
+        ImportScan with file counts and import usage
+    """
+    root = Path(root).resolve()
+    files, local = _walk_python_files(root)
+    cached = db.get_import_cache(str(root))
+    
+    results = {}
+    stale = []
+    for path, (mtime_ns, size) in files.items():
+        entry = cached.pop(path, None)
+        if entry is not None and entry[0] == mtime_ns and entry[1] == size:
+            results[path] = entry[2]
+        else:
+            stale.append(path)
+    
+    if len(stale) >= PARALLEL_PARSE_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(parse_imports, stale, chunksize=32))
+    else:
+        parsed = [parse_imports(path) for path in stale]
+    
+    results.update(parsed)
+    db.store_import_cache((path, files[path][0], files[path][1], modules)
+                          for path, modules in parsed)
+    db.delete_import_cache(cached)  # Entries left over are for deleted files
+    
+    skip = stdlib_modules() | local
+    usage = {}
+    for modules in results.values():
+        for module in modules:
+            if module not in skip:
+                usage[module] = usage.get(module, 0) + 1
+    return ImportScan(files=len(files), parsed=len(stale), imports=usage)
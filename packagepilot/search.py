@@ -3,53 +3,444 @@ IMPROVED Search functionality for PackagePilot
 Multi-word query support + better ranking
 Windows-compatible version (no emojis)
 """
-from typing import List
-from .models import Package
-from .database import Database
+import atexit
+import heapq
+import multiprocessing
+import os
+import re
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple, Union
+from .models import Package, SearchHit
+from .database import Database, popularity_boost
+from .normalize import has_word, normalize_text
+from .timing import TIMER
 
 
-def search_packages(query: str, db: Database) -> List[Package]:
+# Common synonyms and related terms, used to seed the synonyms table
+DEFAULT_SYNONYMS = {
+    'http': ['web', 'api', 'requests'],
+    'web': ['http', 'html', 'scraping'],
+    'scrape': ['beautifulsoup', 'selenium', 'scrapy'],
+    'scraping': ['beautifulsoup', 'selenium', 'scrapy'],
+    'api': ['rest', 'http', 'web', 'fastapi'],
+    'database': ['sql', 'orm', 'mongo'],
+    'db': ['database', 'sql', 'orm'],
+    'test': ['testing', 'pytest', 'unittest'],
+    'chart': ['plot', 'visualization', 'graph'],
+    'plot': ['chart', 'visualization', 'matplotlib'],
+    'viz': ['visualization', 'plot', 'chart'],
+    'ml': ['machine learning', 'ai', 'scikit'],
+    'ai': ['machine learning', 'ml', 'neural'],
+    'excel': ['spreadsheet', 'openpyxl', 'xlsx'],
+    'image': ['photo', 'picture', 'pillow'],
+    'pdf': ['document', 'pypdf'],
+    'cli': ['command', 'terminal', 'console'],
+    'async': ['asyncio', 'concurrent', 'httpx'],
+}
+
+# Weight applied to a synonym relative to a term typed by the user
+DEFAULT_SYNONYM_WEIGHT = 0.5
+
+
+def default_synonym_rows(weight: float = DEFAULT_SYNONYM_WEIGHT) -> Iterator[Tuple[str, str, float]]:
+    """
+    Yield the built-in synonyms as rows for Database.add_synonyms().
+    
+    Args:
+        weight: Weight assigned to every synonym
+        
+    Returns:
+        Iterator of (term, synonym, weight) tuples
+    """
+    for term, synonyms in DEFAULT_SYNONYMS.items():
+        for synonym in synonyms:
+            yield term, synonym, weight
+
+
+class SynonymMatcher:
+    """
+    Expands a query into weighted synonyms with a single compiled regex.
+    
+    All known terms are compiled into one alternation (longest first), so
+    expanding a query is one regex scan regardless of the table size.
+    """
+    
+    def __init__(self, synonyms: Dict[str, List[Tuple[str, float]]]):
+        """
+        Compile the matcher.
+        
+        Args:
+            synonyms: Mapping of term -> list of (synonym, weight)
+        """
+        self.synonyms = synonyms
+        self._pattern = None
+        if synonyms:
+            terms = sorted(synonyms, key=len, reverse=True)
+            alternation = "|".join(re.escape(term) for term in terms)
+            self._pattern = re.compile(rf"\b(?:{alternation})\b")
+    
+    @classmethod
+    def from_rows(cls, rows) -> "SynonymMatcher":
+        """Build a matcher from (term, synonym, weight) rows."""
+        synonyms = {}
+        for term, synonym, weight in rows:
+            synonyms.setdefault(term, []).append((synonym, weight))
+        return cls(synonyms)
+    
+    def expand(self, query: str) -> List[Tuple[str, float]]:
+        """
+        Find weighted expansion terms for a query.
+        
+        Args:
+            query: Original search query
+            
+        Returns:
+            List of (synonym, weight) tuples, excluding terms already in the query
+        """
+        if self._pattern is None:
+            return []
+        
+        query_lower = normalize_text(query)
+        query_words = set(query_lower.split())
+        expansions = {}
+        for term in self._pattern.findall(query_lower):
+            for synonym, weight in self.synonyms[term]:
+                if synonym == query_lower or synonym in query_words:
+                    continue
+                expansions[synonym] = max(weight, expansions.get(synonym, 0.0))
+        return list(expansions.items())
+
+
+_DEFAULT_MATCHER = SynonymMatcher.from_rows(default_synonym_rows())
+_matcher_cache = weakref.WeakKeyDictionary()
+
+
+def get_synonym_matcher(db: Optional[Database] = None) -> SynonymMatcher:
+    """
+    Get the compiled synonym matcher for a database.
+    
+    The synonyms table is loaded once per Database instance. Databases
+    seeded before the table existed fall back to the built-in synonyms.
+    
+    Args:
+        db: Database instance (None for the built-in synonyms)
+        
+    Returns:
+        SynonymMatcher instance
+    """
+    if db is None:
+        return _DEFAULT_MATCHER
+    
+    matcher = _matcher_cache.get(db)
+    if matcher is None:
+        rows = db.get_synonyms()
+        matcher = SynonymMatcher.from_rows(rows) if rows else _DEFAULT_MATCHER
+        _matcher_cache[db] = matcher
+    return matcher
+
+
+def _query_terms(query: str, db: Database):
+    """Split a query into (query_lower, words, synonym expansions)."""
+    query_lower = normalize_text(query)
+    words = [word for word in query_lower.split() if len(word) > 2]  # Skip very short words
+    return query_lower, words, get_synonym_matcher(db).expand(query)
+
+
+def search_packages(query: str, db: Database, limit: Optional[int] = None,
+                    offset: int = 0, rank_in_sql: bool = False) -> List[Package]:
     """
     Search for packages with improved multi-word support.
     
+    Same as search_with_total() without the total.
+    
     Example: "web scraping" will find beautifulsoup4, scrapy, selenium
     
+    Synonyms from the database are matched in the same query, so "db"
+    finds database packages directly.
+    
     Args:
         query: Search query (can be multiple words)
         db: Database instance
+        limit: Maximum number of results to return (None for all)
+        offset: Number of ranked results to skip
+        rank_in_sql: Score and limit inside SQLite (Database.search_ranked)
+            instead of fetching every candidate and ranking in Python
         
     Returns:
         List of Package objects, ranked by relevance
     """
-    # Get initial results from database
-    results = db.search_packages(query)
+    return search_with_total(query, db, limit, offset, rank_in_sql)[0]
+
+
+def search_with_total(query: str, db: Database, limit: Optional[int] = None,
+                      offset: int = 0, rank_in_sql: bool = False) -> Tuple[List[Package], int]:
+    """
+    Search for packages and count all matches.
     
-    # If no results with full query, try individual words
-    if not results and ' ' in query:
-        words = query.split()
-        all_results = []
-        
-        for word in words:
-            if len(word) > 2:  # Skip very short words
-                word_results = db.search_packages(word)
-                all_results.extend(word_results)
+    The full query, synonyms and individual words are matched in one
+    statement; the total is the number of candidates it returned, so
+    paging needs no extra count query.
+    
+    Args:
+        query: Search query (can be multiple words)
+        db: Database instance
+        limit: Maximum number of results to return (None for all)
+        offset: Number of ranked results to skip
+        rank_in_sql: Score and limit inside SQLite (Database.search_ranked);
+            the total then comes from count_search_results()
         
-        # Remove duplicates while preserving order
-        seen = set()
-        results = []
-        for pkg in all_results:
-            if pkg.id not in seen:
-                seen.add(pkg.id)
-                results.append(pkg)
-    
-    # Rank results by relevance
+    Returns:
+        (requested page of Package objects ranked by relevance, total matches)
+    """
+    query_lower, words, expansions = _query_terms(query, db)
+    
+    if rank_in_sql:
+        results = _search_ranked_in_sql(query_lower, words, expansions, db, limit, offset)
+        total = count_search_results(query, db) if results or offset else 0
+        return results, total
+    
+    # Full query and synonyms select the packages; the individual words are
+    # matched in the same statement so ranking can score them per field.
+    # Synonyms only match whole words ('orm' must not find 'formatting').
+    expansion_terms = [term for term, _ in expansions]
+    hits = db.search_terms([query_lower] + words, expansion_terms)
+    primary = {query_lower, *expansion_terms}
+    results = [hit for hit in hits if hit.matched_terms & primary]
+    
+    # If no results with full query, use the individual word matches
+    if not results and ' ' in query:
+        results = hits
+    
+    # Rank results by relevance, only selecting the requested page
     if results:
-        results = rank_results(results, query)
+        top = None if limit is None else offset + limit
+        return rank_results(results, query, expansions, limit=top)[offset:], len(results)
+    
+    return [], 0
+
+
+def _search_ranked_in_sql(query_lower: str, words: List[str],
+                          expansions: List[Tuple[str, float]], db: Database,
+                          limit: Optional[int], offset: int) -> List[Package]:
+    """SQL-ranked variant of search_packages(), returning only the requested page."""
+    results = db.search_ranked(query_lower, [query_lower], words, expansions,
+                               limit=limit, offset=offset)
+    
+    # Fall back to individual words only if the full query matched nothing at all
+    if not results and ' ' in query_lower:
+        if offset and db.count_search_terms([query_lower], [term for term, _ in expansions]):
+            return []
+        results = db.search_ranked(query_lower, words, words, expansions,
+                                   limit=limit, offset=offset)
     
     return results
 
 
-def rank_results(packages: List[Package], query: str) -> List[Package]:
+def count_search_results(query: str, db: Database) -> int:
+    """
+    Count the results search_packages() would return, without ranking them.
+    
+    Args:
+        query: Search query (can be multiple words)
+        db: Database instance
+        
+    Returns:
+        Total number of matching packages
+    """
+    query_lower, words, expansions = _query_terms(query, db)
+    total = db.count_search_terms([query_lower], [term for term, _ in expansions])
+    
+    if not total and ' ' in query:
+        total = db.count_search_terms(words)
+    
+    return total
+
+
+_rank_pool = None
+
+
+def _score_fields(name_lower: str, desc_lower: str, category_lower: str, popularity: float,
+                  query_lower: str, query_words: List[str],
+                  expansions: Optional[List[Tuple[str, float]]]) -> float:
+    """Calculate relevance score from a package's normalized fields."""
+    score = 0
+    
+    # Exact name match - highest priority
+    if name_lower == query_lower:
+        score += 100
+    
+    # Name contains full query
+    elif query_lower in name_lower:
+        score += 50
+    
+    # Description starts with query
+    if desc_lower.startswith(query_lower):
+        score += 40
+    
+    # Description contains full query
+    elif query_lower in desc_lower:
+        score += 30
+    
+    # Category match
+    if query_lower in category_lower:
+        score += 20
+    
+    # Individual word matches
+    for word in query_words:
+        if len(word) > 2:
+            if word in desc_lower:
+                score += 10
+            if word in name_lower:
+                score += 15
+    
+    # Weighted synonym matches (whole words only)
+    for term, weight in expansions or []:
+        if has_word(name_lower, term):
+            score += 15 * weight
+        if has_word(desc_lower, term):
+            score += 10 * weight
+        if has_word(category_lower, term):
+            score += 20 * weight
+    
+    # Popularity blend (log scale, so relevance still dominates)
+    score += popularity_boost(popularity)
+    
+    return score
+
+
+def _score_terms(name_terms: FrozenSet[str], description_terms: FrozenSet[str],
+                 category_terms: FrozenSet[str], name_norm: str, description_prefix: str,
+                 popularity: float, query_lower: str, query_words: List[str],
+                 expansions: Optional[List[Tuple[str, float]]]) -> float:
+    """Calculate relevance score from the per-field term matches of a SearchHit."""
+    score = 0
+    
+    # Exact name match / name contains full query
+    if query_lower in name_terms:
+        score += 100 if name_norm == query_lower else 50
+    
+    # Description starts with / contains full query
+    if query_lower in description_terms:
+        score += 40 if description_prefix == query_lower else 30
+    
+    # Category match
+    if query_lower in category_terms:
+        score += 20
+    
+    # Individual word matches
+    for word in query_words:
+        if len(word) > 2:
+            if word in description_terms:
+                score += 10
+            if word in name_terms:
+                score += 15
+    
+    # Weighted synonym matches
+    for term, weight in expansions or []:
+        if term in name_terms:
+            score += 15 * weight
+        if term in description_terms:
+            score += 10 * weight
+        if term in category_terms:
+            score += 20 * weight
+    
+    # Popularity blend (log scale, so relevance still dominates)
+    score += popularity_boost(popularity)
+    
+    return score
+
+
+def _package_fields(package: Package) -> Tuple[str, str, str, float]:
+    """Normalized (name, description, category) and popularity of a package."""
+    # Packages loaded from the database carry precomputed normalized fields
+    name_lower = package.name_norm
+    if name_lower is None:
+        name_lower = normalize_text(package.name)
+    desc_lower = package.description_norm
+    if desc_lower is None:
+        desc_lower = normalize_text(package.description)
+    category_lower = package.category_norm
+    if category_lower is None:
+        category_lower = normalize_text(package.category)
+    return name_lower, desc_lower, category_lower, package.popularity
+
+
+def _hit_fields(hit: SearchHit, query_lower: str) -> tuple:
+    """Compact tuple of what _score_terms() needs from a SearchHit."""
+    return (hit.name_terms, hit.description_terms, hit.category_terms,
+            hit.package.name_norm, hit.package.description_norm[:len(query_lower)],
+            hit.package.popularity)
+
+
+def _rank_chunk(task) -> List[Tuple[float, int]]:
+    """
+    Process-pool worker: score one chunk of candidates and keep its local top-k.
+    
+    Returns:
+        (score, -index) pairs, best first; ties keep the original order
+    """
+    hits, start, rows, query_lower, query_words, expansions, limit = task
+    score = _score_terms if hits else _score_fields
+    scored = [(score(*row, query_lower, query_words, expansions), -(start + offset))
+              for offset, row in enumerate(rows)]
+    if limit is not None and limit < len(scored):
+        return heapq.nlargest(limit, scored)
+    return sorted(scored, reverse=True)
+
+
+def _get_rank_pool() -> ProcessPoolExecutor:
+    """
+    Get the shared ranking process pool (one worker per core), starting it on first use.
+    
+    Workers are spawned rather than forked, since the caller may already
+    run threads (LiveIndex writer, enrich event loop); like any spawned
+    pool, the calling script needs an `if __name__ == "__main__"` guard.
+    The pool is shut down at interpreter exit.
+    """
+    global _rank_pool
+    if _rank_pool is None:
+        _rank_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                         mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(shutdown_rank_pool)
+    return _rank_pool
+
+
+def shutdown_rank_pool():
+    """Stop the ranking process pool, if it was started."""
+    global _rank_pool
+    if _rank_pool is not None:
+        _rank_pool.shutdown()
+        _rank_pool = None
+
+
+def _rank_parallel(packages, hits: bool, query_lower: str, query_words: List[str],
+                   expansions, limit: Optional[int]) -> List[int]:
+    """Rank candidates across the process pool; returns indexes into packages, best first."""
+    pool = _get_rank_pool()
+    chunk_size = max(1, -(-len(packages) // ((os.cpu_count() or 1) * 4)))
+    
+    futures = []
+    for start in range(0, len(packages), chunk_size):
+        chunk = packages[start:start + chunk_size]
+        if hits:
+            rows = [_hit_fields(hit, query_lower) for hit in chunk]
+        else:
+            rows = [_package_fields(package) for package in chunk]
+        futures.append(pool.submit(_rank_chunk, (hits, start, rows, query_lower,
+                                                 query_words, expansions, limit)))
+    
+    chunks = [future.result() for future in futures]
+    if limit is not None:
+        best = heapq.nlargest(limit, (item for chunk in chunks for item in chunk))
+    else:
+        best = heapq.merge(*chunks, reverse=True)
+    return [-negative_index for _, negative_index in best]
+
+
+def rank_results(packages: Sequence[Union[Package, SearchHit]], query: str,
+                 expansions: Optional[List[Tuple[str, float]]] = None,
+                 limit: Optional[int] = None, parallel: bool = False) -> List[Package]:
     """
     Rank search results by relevance.
     
@@ -60,103 +451,72 @@ def rank_results(packages: List[Package], query: str) -> List[Package]:
     - Description contains query: 30 points
     - Category match: 20 points
     - Each word match: 10 points
+    - Synonym matches: word/category points scaled by synonym weight
+    - Popularity: POPULARITY_WEIGHT points per decade (log10(1 + popularity))
+    
+    SearchHit items are scored from the terms Database.search_terms()
+    already matched per field, without repeating the substring tests.
+    
+    With parallel=True candidates are ranked on a process pool: they are
+    sent to the workers as compact tuples, each worker keeps a local top-k
+    and the results are merged here. Building and pickling those tuples
+    costs more than scoring them serially on the catalogs measured so far
+    (see the rank_results benchmarks), so it is off by default.
     
     Args:
-        packages: List of Package objects
+        packages: List of Package or SearchHit objects
         query: Original search query
+        expansions: Optional (synonym, weight) pairs from SynonymMatcher
+        limit: Only select the top N packages (partial selection, no full sort)
+        parallel: Use the process pool
         
     Returns:
         Sorted list by relevance (highest first)
     """
-    query_lower = query.lower()
+    query_lower = normalize_text(query)
     query_words = query_lower.split()
+    hits = bool(packages) and isinstance(packages[0], SearchHit)
     
-    def calculate_score(package: Package) -> int:
+    def calculate_score(package: Package) -> float:
         """Calculate relevance score for a package."""
-        score = 0
-        
-        name_lower = package.name.lower()
-        desc_lower = package.description.lower()
-        category_lower = package.category.lower()
-        
-        # Exact name match - highest priority
-        if name_lower == query_lower:
-            score += 100
-        
-        # Name contains full query
-        elif query_lower in name_lower:
-            score += 50
-        
-        # Description starts with query
-        if desc_lower.startswith(query_lower):
-            score += 40
-        
-        # Description contains full query
-        elif query_lower in desc_lower:
-            score += 30
-        
-        # Category match
-        if query_lower in category_lower:
-            score += 20
-        
-        # Individual word matches
-        for word in query_words:
-            if len(word) > 2:
-                if word in desc_lower:
-                    score += 10
-                if word in name_lower:
-                    score += 15
-        
-        return score
+        return _score_fields(*_package_fields(package), query_lower, query_words, expansions)
+    
+    def calculate_hit_score(hit: SearchHit) -> float:
+        """Calculate relevance score from the per-field term matches."""
+        return _score_terms(*_hit_fields(hit, query_lower), query_lower, query_words, expansions)
     
-    # Sort by score (highest first)
-    ranked = sorted(packages, key=calculate_score, reverse=True)
-    return ranked
+    def select(key):
+        """Sort by score (highest first), or pick the top `limit` items."""
+        if limit is not None and limit < len(packages):
+            return heapq.nlargest(limit, packages, key=key)
+        return sorted(packages, key=key, reverse=True)
+    
+    with TIMER.phase("rank_results"):
+        if parallel and packages:
+            packages = list(packages)
+            ranked = [packages[index] for index in
+                      _rank_parallel(packages, hits, query_lower, query_words, expansions, limit)]
+        else:
+            ranked = select(calculate_hit_score if hits else calculate_score)
+        
+        if hits:
+            return [hit.package for hit in ranked]
+        return ranked
 
 
-def get_search_suggestions(query: str) -> List[str]:
+def get_search_suggestions(query: str, db: Optional[Database] = None) -> List[str]:
     """
     Suggest alternative search terms if no results found.
     
     Args:
         query: Original search query
+        db: Database to load synonyms from (None for the built-in synonyms)
         
     Returns:
         List of suggested search terms
     """
-    suggestions = []
-    
-    # Common synonyms and related terms
-    term_mapping = {
-        'http': ['web', 'api', 'requests'],
-        'web': ['http', 'html', 'scraping'],
-        'scrape': ['beautifulsoup', 'selenium', 'scrapy'],
-        'scraping': ['beautifulsoup', 'selenium', 'scrapy'],
-        'api': ['rest', 'http', 'web', 'fastapi'],
-        'database': ['sql', 'orm', 'mongo'],
-        'db': ['database', 'sql', 'orm'],
-        'test': ['testing', 'pytest', 'unittest'],
-        'chart': ['plot', 'visualization', 'graph'],
-        'plot': ['chart', 'visualization', 'matplotlib'],
-        'viz': ['visualization', 'plot', 'chart'],
-        'ml': ['machine learning', 'ai', 'scikit'],
-        'ai': ['machine learning', 'ml', 'neural'],
-        'excel': ['spreadsheet', 'openpyxl', 'xlsx'],
-        'image': ['photo', 'picture', 'pillow'],
-        'pdf': ['document', 'pypdf'],
-        'cli': ['command', 'terminal', 'console'],
-        'async': ['asyncio', 'concurrent', 'httpx'],
-    }
-    
-    # Check if query matches any known terms
-    query_lower = query.lower()
-    for key, values in term_mapping.items():
-        if key in query_lower:
-            suggestions.extend(values)
-    
-    # Remove duplicates and the original query
-    suggestions = list(set(suggestions))
-    if query_lower in suggestions:
-        suggestions.remove(query_lower)
-    
-    return suggestions[:3]  # Return top 3
+    expansions = get_synonym_matcher(db).expand(query)
+    
+    # Highest-weighted synonyms first
+    expansions.sort(key=lambda item: item[1], reverse=True)
+    return [term for term, _ in expansions[:3]]  # Return top 3
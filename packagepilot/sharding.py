@@ -0,0 +1,263 @@
+"""
+Sharded catalog for PackagePilot
+Each category (or hash bucket of categories) lives in its own SQLite file
+"""
+import heapq
+import json
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import sqlite3
+
+from .database import Database
+from .models import Package, SearchHit
+from .normalize import normalize_text
+from .search import rank_results
+
+LAYOUT_FILE = "shards.json"
+
+
+class _Shard:
+    """One shard file with a connection that threads take turns using."""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = Database(str(path), check_same_thread=False)
+    
+    def call(self, method: str, *args, **kwargs):
+        """Call a Database method while holding this shard's lock."""
+        with self.lock:
+            return getattr(self.db, method)(*args, **kwargs)
+
+
+class ShardedDatabase:
+    """
+    Catalog split into one SQLite file per category or per hash bucket.
+    
+    Provides the read API that search.search_packages() and the CLI use.
+    Searches fan out to every shard on a thread pool (sqlite3 releases
+    the GIL while a query runs) and the results are merged; category
+    lookups touch exactly one shard.
+    
+    Package ids are only unique within a shard.
+    """
+    
+    def __init__(self, shard_dir: str, max_workers: Optional[int] = None):
+        """
+        Open an existing sharded catalog.
+        
+        Args:
+            shard_dir: Directory created by ShardedDatabase.build()
+            max_workers: Fan-out threads (default: one per shard, at most 32)
+        """
+        self.shard_dir = Path(shard_dir)
+        layout = json.loads((self.shard_dir / LAYOUT_FILE).read_text())
+        self.buckets = layout["buckets"]
+        self.categories = layout["categories"]
+        self.shards = {key: _Shard(self.shard_dir / filename)
+                       for key, filename in sorted(layout["shards"].items())}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(1, min(32, len(self.shards))),
+            thread_name_prefix="packagepilot-shard"
+        )
+    
+    @staticmethod
+    def shard_key(category: str, buckets: Optional[int] = None) -> str:
+        """
+        Get the shard a category belongs to.
+        
+        Args:
+            category: Category name
+            buckets: Number of hash buckets (None for one shard per category)
+            
+        Returns:
+            Shard key, also used as its file name
+        """
+        category = normalize_text(category)
+        if buckets:
+            return f"bucket-{zlib.crc32(category.encode('utf-8')) % buckets:03d}"
+        slug = re.sub(r"[^a-z0-9_-]+", "_", category) or "_"
+        return f"cat-{slug}-{zlib.crc32(category.encode('utf-8')):08x}"
+    
+    @classmethod
+    def build(cls, source: Database, shard_dir: str, buckets: Optional[int] = None,
+              batch_size: int = 10_000) -> "ShardedDatabase":
+        """
+        Partition a catalog into shard files.
+        
+        Args:
+            source: Database to copy packages, keywords and synonyms from
+            shard_dir: Empty (or new) directory for the shard files
+            buckets: Hash categories into this many shards (None for one per category)
+            batch_size: Packages written per shard transaction
+            
+        Returns:
+            The opened ShardedDatabase
+        """
+        shard_dir = Path(shard_dir)
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        if (shard_dir / LAYOUT_FILE).exists() or any(shard_dir.glob("*.db")):
+            raise FileExistsError(f"Shard directory '{shard_dir}' is not empty")
+        
+        synonyms = source.get_synonyms()
+        shards: Dict[str, Database] = {}
+        pending: Dict[str, List[Tuple[Package, List[str]]]] = {}
+        categories: Dict[str, str] = {}
+        
+        def flush(key):
+            shards[key].add_packages(pending.pop(key))
+        
+        try:
+            for package, keywords in source.iter_packages_with_keywords():
+                key = cls.shard_key(package.category, buckets)
+                categories[normalize_text(package.category)] = key
+                if key not in shards:
+                    shards[key] = Database(str(shard_dir / f"{key}.db"),
+                                           tuning_profile="bulk_load")
+                    shards[key].add_synonyms(synonyms)
+                pending.setdefault(key, []).append((package, keywords))
+                if len(pending[key]) >= batch_size:
+                    flush(key)
+            for key in list(pending):
+                flush(key)
+        finally:
+            for db in shards.values():
+                db.close()
+        
+        layout = {
+            "buckets": buckets,
+            "categories": categories,
+            "shards": {key: f"{key}.db" for key in shards},
+        }
+        (shard_dir / LAYOUT_FILE).write_text(json.dumps(layout, indent=2))
+        return cls(str(shard_dir))
+    
+    def _fan_out(self, method: str, *args, **kwargs) -> List:
+        """Call a Database method on every shard in parallel."""
+        futures = [self._executor.submit(shard.call, method, *args, **kwargs)
+                   for shard in self.shards.values()]
+        return [future.result() for future in futures]
+    
+    def _category_shard(self, category: str) -> Optional[_Shard]:
+        """Get the single shard holding a category, if it exists."""
+        key = self.categories.get(normalize_text(category))
+        return self.shards.get(key) if key else None
+    
+    def get_synonyms(self) -> List[Tuple[str, str, float]]:
+        """Get query expansion synonyms (identical in every shard)."""
+        shard = next(iter(self.shards.values()), None)
+        return shard.call("get_synonyms") if shard else []
+    
+    def search_terms(self, terms: List[str],
+                     expansions: Optional[List[str]] = None) -> List[SearchHit]:
+        """Database.search_terms() across all shards."""
+        return [hit for hits in self._fan_out("search_terms", terms, expansions)
+                for hit in hits]
+    
+    def count_search_terms(self, terms: List[str],
+                           expansions: Optional[List[str]] = None) -> int:
+        """Database.count_search_terms() across all shards."""
+        return sum(self._fan_out("count_search_terms", terms, expansions))
+    
+    def search_ranked(self, query: str, match_terms: List[str], words: List[str],
+                      expansions: Optional[List[Tuple[str, float]]] = None,
+                      limit: Optional[int] = None, offset: int = 0) -> List[Package]:
+        """
+        Database.search_ranked() across all shards.
+        
+        Each shard returns its own top (offset + limit) rows ranked in SQL;
+        those candidates are merged with the same scoring in Python.
+        """
+        top = None if limit is None else offset + limit
+        candidates = [package for packages in self._fan_out(
+            "search_ranked", query, match_terms, words, expansions, limit=top
+        ) for package in packages]
+        return rank_results(candidates, query, expansions, limit=top)[offset:]
+    
+    def get_package_by_name(self, name: str) -> Optional[Package]:
+        """Database.get_package_by_name() across all shards."""
+        return next((package for package in self._fan_out("get_package_by_name", name)
+                     if package is not None), None)
+    
+    def get_packages_by_names(self, names: List[str]) -> Dict[str, Package]:
+        """Database.get_packages_by_names() across all shards."""
+        packages = {}
+        for found in self._fan_out("get_packages_by_names", names):
+            packages.update(found)
+        return packages
+    
+    def get_all_packages(self, limit: Optional[int] = None, offset: int = 0) -> List[Package]:
+        """Database.get_all_packages() merged across shards in name order."""
+        top = None if limit is None else offset + limit
+        merged = heapq.merge(*self._fan_out("get_all_packages", limit=top),
+                             key=lambda package: package.name)
+        return list(merged)[offset:top]
+    
+    def get_packages_by_category(self, category: str, limit: Optional[int] = None,
+                                 offset: int = 0) -> List[Package]:
+        """Database.get_packages_by_category(), reading a single shard."""
+        shard = self._category_shard(category)
+        return shard.call("get_packages_by_category", category, limit, offset) if shard else []
+    
+    def get_top_packages(self, category: str, limit: int) -> List[Package]:
+        """Database.get_top_packages(), reading a single shard."""
+        shard = self._category_shard(category)
+        return shard.call("get_top_packages", category, limit) if shard else []
+    
+    def iter_package_rows(self, category: Optional[str] = None,
+                          batch_size: int = 1000) -> Iterator[sqlite3.Row]:
+        """
+        Database.iter_package_rows() over the shards.
+        
+        A category streams from its single shard; the full catalog is merged
+        from every shard in (category, name) order.
+        """
+        if category is not None:
+            shard = self._category_shard(category)
+            if shard:
+                with shard.lock:
+                    yield from shard.db.iter_package_rows(category, batch_size)
+            return
+        
+        # Each shard gets its own connection so the merge can interleave them
+        shard_dbs = [Database(str(shard.path)) for shard in self.shards.values()]
+        try:
+            yield from heapq.merge(*(db.iter_package_rows(batch_size=batch_size) for db in shard_dbs),
+                                   key=lambda row: (row["category"], row["name"]))
+        finally:
+            for db in shard_dbs:
+                db.close()
+    
+    def count_packages(self, category: Optional[str] = None) -> int:
+        """Database.count_packages(), reading one shard for a category."""
+        if category is not None:
+            shard = self._category_shard(category)
+            return shard.call("count_packages", category) if shard else 0
+        return sum(self._fan_out("count_packages"))
+    
+    def get_category_counts(self) -> Dict[str, int]:
+        """Database.get_category_counts() summed across shards."""
+        counts: Dict[str, int] = {}
+        for shard_counts in self._fan_out("get_category_counts"):
+            for category, count in shard_counts.items():
+                counts[category] = counts.get(category, 0) + count
+        return dict(sorted(counts.items()))
+    
+    def close(self):
+        """Shut down the thread pool and close every shard."""
+        self._executor.shutdown(wait=True)
+        for shard in self.shards.values():
+            shard.db.close()
+    
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit - closes every shard."""
+        self.close()
@@ -0,0 +1,280 @@
+"""
+Mirror sync for PackagePilot
+Delta ingest from a local PyPI-style mirror using change serials
+"""
+import json
+import re
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .database import Database
+from .deps import canonicalize_name
+from .models import Package
+
+# First matching classifier prefix decides the category
+CLASSIFIER_CATEGORIES = [
+    ("Topic :: Software Development :: Testing", "testing"),
+    ("Topic :: Database", "database"),
+    ("Topic :: Internet :: WWW/HTTP", "web"),
+    ("Topic :: Internet", "web"),
+    ("Topic :: Scientific/Engineering", "data"),
+    ("Environment :: Console", "cli"),
+    ("Topic :: Terminals", "cli"),
+    ("Topic :: Multimedia :: Graphics", "file"),
+    ("Topic :: Office/Business", "file"),
+    ("Topic :: System :: Filesystems", "file"),
+    ("Topic :: Text Processing :: Markup", "file"),
+]
+DEFAULT_CATEGORY = "utilities"
+
+
+# Syncs that look for a listed project without a JSON document before giving
+# up on it until the mirror changes it again
+MAX_SYNC_ATTEMPTS = 3
+
+
+@dataclass
+class SyncReport:
+    """
+    Outcome of a mirror sync.
+    
+    Attributes:
+        previous_serial: Serial recorded by the previous sync (0 for the first)
+        last_serial: Serial recorded by this sync (the mirror's last serial)
+        changed: Projects changed since previous_serial
+        upserted: Projects written to the database
+        missing: Changed or retried projects without a JSON file in the mirror
+        retried: Projects missing in an earlier sync that were looked up again
+        deleted: Packages removed because the mirror no longer lists them
+    """
+    previous_serial: int
+    last_serial: int
+    changed: int
+    upserted: int
+    missing: int
+    retried: int = 0
+    deleted: int = 0
+
+
+def classify(classifiers: List[str]) -> Optional[str]:
+    """
+    Map trove classifiers to a PackagePilot category.
+    
+    Args:
+        classifiers: Trove classifiers from the project metadata
+        
+    Returns:
+        Category name, or None if no classifier is recognized
+    """
+    for prefix, category in CLASSIFIER_CATEGORIES:
+        if any(classifier.startswith(prefix) for classifier in classifiers):
+            return category
+    return None
+
+
+def _split_keywords(keywords) -> List[str]:
+    """Split a metadata keywords field (comma or space separated, or a list)."""
+    if not keywords:
+        return []
+    if isinstance(keywords, list):
+        return [keyword.strip() for keyword in keywords if keyword.strip()]
+    separator = "," if "," in keywords else None
+    return [keyword.strip() for keyword in keywords.split(separator) if keyword.strip()]
+
+
+def project_to_package(data: Dict) -> Tuple[Package, List[str], List[str]]:
+    """
+    Convert PyPI JSON API metadata to upsert_packages() input.
+    
+    Fields the metadata does not provide are left empty, so an update keeps
+    the stored (curated) values; new_package_defaults() fills them in for
+    packages not yet in the catalog.
+    
+    Args:
+        data: Parsed per-project JSON ({"info": {...}, ...})
+        
+    Returns:
+        (Package, keywords, requirements) tuple; requirements only needed
+        for optional extras are left out, and are None when the metadata
+        does not list any (stored dependencies are kept)
+    """
+    info = data["info"]
+    name = info["name"]
+    urls = info.get("project_urls") or {}
+    
+    documentation_url = info.get("docs_url") or next(
+        (url for label, url in urls.items() if label.lower() in ("documentation", "docs")), None)
+    github_url = next(
+        (url for url in list(urls.values()) + [info.get("home_page") or ""]
+         if "github.com" in url), None)
+    
+    requirements = None
+    if info.get("requires_dist") is not None:
+        requirements = [requirement for requirement in info["requires_dist"]
+                        if not re.search(r";.*\bextra\b", requirement)]
+    
+    package = Package(
+        id=None,
+        name=name,
+        description=info.get("summary") or "",
+        category=classify(info.get("classifiers") or []) or "",
+        install_command="",
+        code_example="",  # Mirrors carry no examples; keeps curated ones on update
+        pypi_url=info.get("package_url") or "",
+        github_url=github_url,
+        documentation_url=documentation_url
+    )
+    return package, _split_keywords(info.get("keywords")), requirements
+
+
+def new_package_defaults(db: Database, items: List[Tuple[Package, List[str], Optional[List[str]]]]
+                         ) -> List[Tuple[Package, List[str], Optional[List[str]]]]:
+    """
+    Fill the category, install command and PyPI URL of packages the catalog lacks.
+    
+    Packages already in the catalog (matched by PEP 503 name) are returned
+    unchanged, so their stored values are kept.
+    
+    Args:
+        db: Catalog the items will be upserted into
+        items: project_to_package() results
+        
+    Returns:
+        Items ready for upsert_packages()
+    """
+    known = db.get_packages_by_names([package.name for package, _, _ in items])
+    filled = []
+    for package, keywords, requirements in items:
+        if canonicalize_name(package.name) not in known:
+            package = replace(package, category=package.category or DEFAULT_CATEGORY,
+                              install_command=package.install_command
+                              or f"pip install {package.name}",
+                              pypi_url=package.pypi_url
+                              or f"https://pypi.org/project/{package.name}/")
+        filled.append((package, keywords, requirements))
+    return filled
+
+
+class Mirror:
+    """
+    Local PyPI-style mirror on disk.
+    
+    Layout:
+        simple/index.json      PEP 691 project list with "_last-serial" values
+        pypi/<name>/json       PyPI JSON API document for each project
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open a mirror.
+        
+        Args:
+            path: Mirror root directory
+        """
+        self.path = Path(path).resolve()
+        with open(self.path / "simple" / "index.json", encoding="utf-8") as f:
+            index = json.load(f)
+        self.projects = index.get("projects", [])
+        self.last_serial = index.get("meta", {}).get(
+            "_last-serial", max((project.get("_last-serial", 0) for project in self.projects),
+                                default=0))
+    
+    def changed_since(self, serial: int) -> List[Tuple[str, int]]:
+        """(name, last change serial) of projects changed after `serial`."""
+        return [(project["name"], project.get("_last-serial", 0)) for project in self.projects
+                if project.get("_last-serial", 0) > serial]
+    
+    def load_project(self, name: str) -> Optional[Dict]:
+        """Load a project's JSON document, or None if the mirror lacks it."""
+        for directory in (name, canonicalize_name(name)):
+            path = self.path / "pypi" / directory / "json"
+            if path.exists():
+                with open(path, encoding="utf-8") as f:
+                    return json.load(f)
+        return None
+
+
+def sync_mirror(db: Database, mirror_path: str, full: bool = False, batch_size: int = 500,
+                progress: Optional[Callable[[int, int], None]] = None) -> SyncReport:
+    """
+    Ingest projects changed in a mirror since the last sync.
+    
+    Projects are upserted in batches, one transaction per batch. The new
+    serial is only recorded once every changed project is written, so an
+    interrupted sync simply repeats the same projects next time. The
+    sync_projects table keeps each project's serial: a changed project
+    without a JSON document is looked up again by the next syncs, up to
+    MAX_SYNC_ATTEMPTS times per serial, without holding back the recorded
+    serial. Projects synced before that the mirror no longer lists are
+    deleted from the catalog.
+    
+    Args:
+        db: Database to update
+        mirror_path: Mirror root directory
+        full: Ignore the recorded serial and re-ingest every project
+        batch_size: Projects per transaction
+        progress: Called with (done, total) after each batch
+        
+    Returns:
+        SyncReport with serials and counts
+    """
+    mirror = Mirror(mirror_path)
+    source = str(mirror.path)
+    previous_serial = 0 if full else db.get_sync_serial(source)
+    known = db.get_sync_projects(source)
+    listed = {canonicalize_name(project["name"]): (project["name"], project.get("_last-serial", 0))
+              for project in mirror.projects}
+    
+    changed = mirror.changed_since(previous_serial)
+    changed_names = {canonicalize_name(name) for name, _ in changed}
+    retries = [(name, serial) for key, (name, serial) in listed.items()
+               if key not in changed_names and 0 < known.get(key, (0, 0))[1] < MAX_SYNC_ATTEMPTS]
+    projects = changed + retries
+    
+    found = []  # (canonical name, serial, 0) of the current batch
+    missing = []  # (canonical name, serial, attempts) of projects without a JSON document
+    
+    def items() -> Iterator[Tuple[Package, List[str], Optional[List[str]]]]:
+        for name, serial in projects:
+            key = canonicalize_name(name)
+            data = mirror.load_project(name)
+            if data is None:
+                known_serial, attempts = known.get(key, (serial, 0))
+                missing.append((key, serial, attempts + 1 if known_serial == serial else 1))
+            else:
+                found.append((key, serial, 0))
+                yield project_to_package(data)
+    
+    def write(batch):
+        count = db.upsert_packages(new_package_defaults(db, batch))
+        db.record_sync_projects(source, found)
+        found.clear()
+        return count
+    
+    upserted = 0
+    batch = []
+    for item in items():
+        batch.append(item)
+        if len(batch) >= batch_size:
+            upserted += write(batch)
+            batch = []
+            if progress is not None:
+                progress(upserted, len(projects))
+    if batch:
+        upserted += write(batch)
+        if progress is not None:
+            progress(upserted, len(projects))
+    db.record_sync_projects(source, missing)
+    
+    deleted = 0
+    removed = [key for key in known if key not in listed]
+    if removed:
+        packages = db.get_packages_by_names(removed)
+        deleted = db.delete_packages(package.id for package in packages.values())
+        db.forget_sync_projects(source, removed)
+    
+    serial = max(mirror.last_serial, previous_serial)
+    db.set_sync_serial(source, serial)
+    return SyncReport(previous_serial, serial, len(changed), upserted, len(missing),
+                      len(retries), deleted)
@@ -0,0 +1,127 @@
+"""
+Per-phase timing for PackagePilot
+Used by the CLI --timings flag; costs a single attribute check when disabled
+"""
+import time
+from typing import Dict, List
+
+# Display order and labels for the phases reported by --timings
+PHASES = [
+    ("import", "Import"),
+    ("db_open", "Database open"),
+    ("migrate", "Schema migrations"),
+    ("sql", "SQL execution"),
+    ("row_to_package", "_row_to_package"),
+    ("rank_results", "rank_results"),
+    ("output", "Output formatting"),
+]
+
+
+class _NullPhase:
+    """Context manager used when timing is disabled."""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    """Context manager that charges elapsed time to one phase."""
+    
+    def __init__(self, timer: "PhaseTimer", name: str):
+        self.timer = timer
+        self.name = name
+    
+    def __enter__(self):
+        self.timer._enter(self.name)
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.timer._exit()
+        return False
+
+
+class PhaseTimer:
+    """
+    Accumulates exclusive wall-clock time per named phase.
+    
+    Phases nest: time spent in an inner phase (e.g. SQL inside Database
+    open) is charged to the inner phase only, so the totals add up.
+    """
+    
+    def __init__(self):
+        """Create a disabled timer."""
+        self.enabled = False
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._stack: List[list] = []
+    
+    def phase(self, name: str):
+        """
+        Time a block of code as the given phase.
+        
+        Args:
+            name: Phase name (see PHASES)
+            
+        Returns:
+            Context manager (a shared no-op when timing is disabled)
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+    
+    def add(self, name: str, seconds: float):
+        """Charge time measured elsewhere to a phase."""
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+    
+    def reset(self):
+        """Clear all recorded timings."""
+        self.totals.clear()
+        self.counts.clear()
+        self._stack.clear()
+    
+    def report(self) -> List[str]:
+        """
+        Format the recorded timings as a per-phase breakdown.
+        
+        Returns:
+            List of report lines
+        """
+        total = sum(self.totals.values())
+        labels = dict(PHASES)
+        names = [name for name, _ in PHASES if name in self.totals]
+        names += sorted(name for name in self.totals if name not in labels)
+        
+        lines = []
+        for name in names:
+            seconds = self.totals[name]
+            share = seconds / total * 100 if total else 0.0
+            lines.append(f"  {labels.get(name, name):20} {seconds * 1000:10.3f} ms "
+                         f"({share:5.1f}%)  x{self.counts[name]}")
+        lines.append(f"  {'Total':20} {total * 1000:10.3f} ms")
+        return lines
+    
+    def _enter(self, name: str):
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.totals[parent[0]] = self.totals.get(parent[0], 0.0) + now - parent[1]
+        self._stack.append([name, now])
+        self.counts[name] = self.counts.get(name, 0) + 1
+    
+    def _exit(self):
+        now = time.perf_counter()
+        name, start = self._stack.pop()
+        self.totals[name] = self.totals.get(name, 0.0) + now - start
+        if self._stack:
+            self._stack[-1][1] = now
+
+
+# Process-wide timer shared by the database, search and CLI layers
+TIMER = PhaseTimer()
@@ -5,6 +5,8 @@ Run this to expand your database from 14 to 35+ packages
 """
 from packagepilot.database import Database
 from packagepilot.models import Package
+from packagepilot.related import refresh_related
+from packagepilot.search import default_synonym_rows
 
 
 def seed_database():
@@ -30,7 +32,11 @@ print(response.json())""",
                 github_url="https://github.com/psf/requests",
                 documentation_url="https://requests.readthedocs.io/"
             ),
-            "keywords": ["http", "api", "web", "rest", "get", "post", "requests"]
+            "keywords": ["http", "api", "web", "rest", "get", "post", "requests"],
+            "dependencies": [
+                "charset-normalizer>=2,<4", "idna>=2.5,<4", "urllib3>=1.21.1,<3",
+                "certifi>=2017.4.17"
+            ]
         },
         {
             "package": Package(
@@ -48,7 +54,8 @@ async with httpx.AsyncClient() as client:
                 github_url="https://github.com/encode/httpx",
                 documentation_url="https://www.python-httpx.org/"
             ),
-            "keywords": ["http", "async", "api", "web", "http2", "modern"]
+            "keywords": ["http", "async", "api", "web", "http2", "modern"],
+            "dependencies": ["anyio", "certifi", "httpcore==1.*", "idna"]
         },
         {
             "package": Package(
@@ -67,7 +74,8 @@ print(soup.title.string)""",
                 github_url="https://www.crummy.com/software/BeautifulSoup/",
                 documentation_url="https://www.crummy.com/software/BeautifulSoup/bs4/doc/"
             ),
-            "keywords": ["html", "xml", "parsing", "scraping", "web scraping", "beautifulsoup"]
+            "keywords": ["html", "xml", "parsing", "scraping", "web scraping", "beautifulsoup"],
+            "dependencies": ["soupsieve>1.2"]
         },
         {
             "package": Package(
@@ -90,7 +98,11 @@ if __name__ == '__main__':
                 github_url="https://github.com/pallets/flask",
                 documentation_url="https://flask.palletsprojects.com/"
             ),
-            "keywords": ["web", "framework", "api", "server", "web app", "rest api"]
+            "keywords": ["web", "framework", "api", "server", "web app", "rest api"],
+            "dependencies": [
+                "Werkzeug>=3.0.0", "Jinja2>=3.1.2", "itsdangerous>=2.1.2", "click>=8.1.3",
+                "blinker>=1.6.2"
+            ]
         },
         {
             "package": Package(
@@ -110,7 +122,8 @@ def read_root():
                 github_url="https://github.com/tiangolo/fastapi",
                 documentation_url="https://fastapi.tiangolo.com/"
             ),
-            "keywords": ["web", "framework", "api", "fast", "modern", "rest", "async"]
+            "keywords": ["web", "framework", "api", "fast", "modern", "rest", "async"],
+            "dependencies": ["starlette>=0.37.2", "pydantic>=1.7.4", "typing-extensions>=4.8.0"]
         },
         {
             "package": Package(
@@ -130,7 +143,8 @@ def index(request):
                 github_url="https://github.com/django/django",
                 documentation_url="https://docs.djangoproject.com/"
             ),
-            "keywords": ["web", "framework", "mvc", "orm", "full stack"]
+            "keywords": ["web", "framework", "mvc", "orm", "full stack"],
+            "dependencies": ["asgiref>=3.7.0", "sqlparse>=0.3.1"]
         },
         {
             "package": Package(
@@ -149,7 +163,11 @@ driver.quit()""",
                 github_url="https://github.com/SeleniumHQ/selenium",
                 documentation_url="https://www.selenium.dev/documentation/"
             ),
-            "keywords": ["automation", "browser", "testing", "scraping", "web automation"]
+            "keywords": ["automation", "browser", "testing", "scraping", "web automation"],
+            "dependencies": [
+                "urllib3[socks]>=1.26,<3", "trio~=0.17", "trio-websocket~=0.9",
+                "certifi>=2021.10.8", "typing-extensions>=4.9", "websocket-client>=1.8"
+            ]
         },
         {
             "package": Package(
@@ -171,7 +189,11 @@ class QuotesSpider(scrapy.Spider):
                 github_url="https://github.com/scrapy/scrapy",
                 documentation_url="https://docs.scrapy.org/"
             ),
-            "keywords": ["scraping", "crawler", "spider", "web scraping", "data extraction"]
+            "keywords": ["scraping", "crawler", "spider", "web scraping", "data extraction"],
+            "dependencies": [
+                "Twisted>=18.9.0", "cryptography>=36.0.0", "lxml>=4.4.1", "parsel>=1.5.0",
+                "w3lib>=1.17.0", "itemadapter>=0.1.0", "packaging"
+            ]
         },
         
         # ==================== DATA SCIENCE ====================
@@ -193,7 +215,10 @@ print(df)""",
                 github_url="https://github.com/pandas-dev/pandas",
                 documentation_url="https://pandas.pydata.org/"
             ),
-            "keywords": ["data", "dataframe", "analysis", "csv", "excel"]
+            "keywords": ["data", "dataframe", "analysis", "csv", "excel"],
+            "dependencies": [
+                "numpy>=1.22.4", "python-dateutil>=2.8.2", "pytz>=2020.1", "tzdata>=2022.7"
+            ]
         },
         {
             "package": Package(
@@ -228,7 +253,12 @@ plt.show()""",
                 github_url="https://github.com/matplotlib/matplotlib",
                 documentation_url="https://matplotlib.org/"
             ),
-            "keywords": ["visualization", "plotting", "charts", "graphs"]
+            "keywords": ["visualization", "plotting", "charts", "graphs"],
+            "dependencies": [
+                "contourpy>=1.0.1", "cycler>=0.10", "fonttools>=4.22.0",
+                "kiwisolver>=1.3.1", "numpy>=1.23", "packaging>=20.0", "pillow>=8",
+                "pyparsing>=2.3.1", "python-dateutil>=2.7"
+            ]
         },
         {
             "package": Package(
@@ -247,7 +277,8 @@ plt.show()""",
                 github_url="https://github.com/mwaskom/seaborn",
                 documentation_url="https://seaborn.pydata.org/"
             ),
-            "keywords": ["visualization", "statistical", "charts", "graphs"]
+            "keywords": ["visualization", "statistical", "charts", "graphs"],
+            "dependencies": ["numpy>=1.20,!=1.24.0", "pandas>=1.2", "matplotlib>=3.4,!=3.6.1"]
         },
         {
             "package": Package( 
@@ -265,7 +296,10 @@ print(model.predict([[4]]))""",
                 github_url="https://github.com/scikit-learn/scikit-learn",
                 documentation_url="https://scikit-learn.org/"
             ),
-            "keywords": ["machine learning", "ml", "ai", "classification", "regression"]
+            "keywords": ["machine learning", "ml", "ai", "classification", "regression"],
+            "dependencies": [
+                "numpy>=1.19.5", "scipy>=1.6.0", "joblib>=1.2.0", "threadpoolctl>=3.1.0"
+            ]
         },
         {
             "package": Package(
@@ -283,7 +317,8 @@ fig.show()""",
                 github_url="https://github.com/plotly/plotly.py",
                 documentation_url="https://plotly.com/python/"
             ),
-            "keywords": ["visualization", "interactive", "charts", "dashboard"]
+            "keywords": ["visualization", "interactive", "charts", "dashboard"],
+            "dependencies": ["tenacity>=6.2.0", "packaging"]
         },
         
         # ==================== CLI TOOLS ====================
@@ -308,7 +343,11 @@ if __name__ == "__main__":
                 github_url="https://github.com/tiangolo/typer",
                 documentation_url="https://typer.tiangolo.com/"
             ),
-            "keywords": ["cli", "command line", "terminal", "console"]
+            "keywords": ["cli", "command line", "terminal", "console"],
+            "dependencies": [
+                "click>=8.0.0", "typing-extensions>=3.7.4.3", "shellingham>=1.3.0",
+                "rich>=10.11.0"
+            ]
         },
         {
             "package": Package(
@@ -325,7 +364,8 @@ console.print("Hello", style="bold magenta")""",
                 github_url="https://github.com/Textualize/rich",
                 documentation_url="https://rich.readthedocs.io/"
             ),
-            "keywords": ["cli", "terminal", "colors", "formatting", "console"]
+            "keywords": ["cli", "terminal", "colors", "formatting", "console"],
+            "dependencies": ["markdown-it-py>=2.2.0", "pygments>=2.13.0,<3.0.0"]
         },
         {
             "package": Package(
@@ -384,7 +424,8 @@ for i in tqdm(range(100)):
                 github_url="https://github.com/pytest-dev/pytest",
                 documentation_url="https://docs.pytest.org/"
             ),
-            "keywords": ["testing", "tests", "unit tests"]
+            "keywords": ["testing", "tests", "unit tests"],
+            "dependencies": ["iniconfig", "packaging", "pluggy>=1.5,<2"]
         },
         {
             "package": Package(
@@ -580,7 +621,11 @@ user = User(name='Alice', age=25)""",
                 github_url="https://github.com/pydantic/pydantic",
                 documentation_url="https://docs.pydantic.dev/"
             ),
-            "keywords": ["validation", "data", "models", "type hints"]
+            "keywords": ["validation", "data", "models", "type hints"],
+            "dependencies": [
+                "annotated-types>=0.4.0", "pydantic-core==2.18.2",
+                "typing-extensions>=4.6.1"
+            ]
         },
         
         # ==================== DATABASE ====================
@@ -604,7 +649,11 @@ class User(Base):
                 github_url="https://github.com/sqlalchemy/sqlalchemy",
                 documentation_url="https://docs.sqlalchemy.org/"
             ),
-            "keywords": ["database", "sql", "orm", "sqlite", "postgres"]
+            "keywords": ["database", "sql", "orm", "sqlite", "postgres"],
+            "dependencies": [
+                "typing-extensions>=4.6.0",
+                "greenlet!=0.4.17; platform_machine == 'x86_64'"
+            ]
         },
         {
             "package": Package(
@@ -656,12 +705,31 @@ print(r.get('key'))""",
         try:
             package_id = db.add_package(item["package"])
             db.add_keywords(package_id, item["keywords"])
+            db.add_dependencies(package_id, item.get("dependencies", []))
             print(f"[OK] Added: {item['package'].name}")
             added += 1
         except Exception as e:
             print(f"[SKIP] {item['package'].name} (already exists)")
             skipped += 1
     
+    # Popularity signal: rough monthly PyPI downloads, in thousands
+    db.set_popularity({
+        "requests": 300000, "httpx": 60000, "beautifulsoup4": 40000, "flask": 60000,
+        "fastapi": 50000, "django": 10000, "selenium": 8000, "scrapy": 1500,
+        "pandas": 200000, "numpy": 300000, "matplotlib": 50000, "seaborn": 15000,
+        "scikit-learn": 60000, "plotly": 20000, "typer": 40000, "rich": 100000,
+        "click": 250000, "tqdm": 150000, "pytest": 150000, "coverage": 80000,
+        "openpyxl": 80000, "pillow": 120000, "PyPDF2": 5000, "python-dotenv": 90000,
+        "schedule": 2000, "loguru": 15000, "pydantic": 250000, "sqlalchemy": 100000,
+        "pymongo": 20000, "redis": 40000,
+    })
+    
+    # Synonyms used for query expansion ("db" -> database, sql, orm)
+    db.add_synonyms(default_synonym_rows())
+    
+    # Precompute related packages for new or changed packages
+    refresh_related(db)
+    
     print("")
     print("="*60)
     print("Database seeded successfully!")
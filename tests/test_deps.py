@@ -0,0 +1,73 @@
+"""
+Dependency graph tests
+The subgraph a single query loads must answer like the whole graph
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from packagepilot.database import Database
+from packagepilot.deps import DependencyGraph
+from packagepilot.models import Package
+
+# package -> requirements; includes a cycle (b <-> c) and names outside the catalog
+REQUIREMENTS = {
+    "App_Core": ["Lib.B>=2", "lib-d"],
+    "lib-b": ["lib_c"],
+    "lib-c": ["lib-b", "external-x==1.0"],
+    "lib-d": ["lib-c; python_version < '3.8'"],
+    "unrelated": ["external-y"],
+    "leaf": [],
+}
+
+
+class DependencySubgraphTest(unittest.TestCase):
+    """DependencyGraph.reachable_from() against DependencyGraph.from_database()."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.db = Database(str(Path(cls.directory.name) / "packages.db"))
+        cls.db.upsert_packages(
+            (Package(id=None, name=name, description="", category="misc",
+                     install_command=f"pip install {name}", code_example="",
+                     pypi_url=""), [], requirements)
+            for name, requirements in REQUIREMENTS.items()
+        )
+        cls.graph = DependencyGraph.from_database(cls.db)
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+        cls.directory.cleanup()
+    
+    def test_matches_whole_graph(self):
+        for name in list(REQUIREMENTS) + ["external-x", "no-such-package"]:
+            for reverse in (False, True):
+                subgraph = DependencyGraph.reachable_from(self.db, name, reverse)
+                expected = self.graph.dependencies(name, reverse=reverse)
+                self.assertEqual(subgraph.dependencies(name, reverse=reverse), expected)
+                self.assertEqual({other for other, _, _ in expected if other in subgraph.catalog},
+                                 {other for other, _, _ in expected if other in self.graph.catalog})
+    
+    def test_only_reachable_edges_are_loaded(self):
+        edges = self.db.get_dependency_subgraph("app-core")
+        self.assertEqual({package for package, _, _ in edges},
+                         {"app-core", "lib-b", "lib-c", "lib-d"})
+        self.assertEqual({package for package, _, _ in
+                          self.db.get_dependency_subgraph("EXTERNAL_X", reverse=True)},
+                         {"lib-c", "lib-b", "lib-d", "app-core"})
+    
+    def test_depth_and_specifiers(self):
+        subgraph = DependencyGraph.reachable_from(self.db, "app-core")
+        self.assertEqual(subgraph.dependencies("App.Core", max_depth=1),
+                         [("lib-b", 1, ">=2"), ("lib-d", 1, "")])
+    
+    def test_dependency_info(self):
+        self.assertTrue(self.db.has_dependency_info("external-y"))
+        self.assertTrue(self.db.has_dependency_info("Unrelated"))
+        self.assertFalse(self.db.has_dependency_info("leaf"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Enrichment tests
+Runs against the local metadata server with a fixture mirror
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.metadata_server import MetadataServer, synthetic_metadata
+from packagepilot.database import Database
+from packagepilot.enrich import Enricher
+from packagepilot.models import Package
+
+NAMES = ["good", "broken", "ghost"]
+
+
+def write_project(root: Path, name: str, body: bytes):
+    """Write <root>/pypi/<name>/json."""
+    path = root / "pypi" / name / "json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(body)
+
+
+class EnrichTest(unittest.TestCase):
+    """Validators, missing projects and unusable bodies."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name) / "mirror"
+        write_project(self.root, "good", synthetic_metadata("good"))
+        write_project(self.root, "broken", b'{"info": {"name": "broken", "summ')
+        
+        self.db = Database(str(Path(self.directory.name) / "packages.db"))
+        self.db.add_packages(
+            (Package(id=None, name=name, description="", category="misc",
+                     install_command=f"pip install {name}", code_example="",
+                     pypi_url=f"https://pypi.org/project/{name}/"), [])
+            for name in NAMES
+        )
+        # One server for the whole test, so cached URLs stay valid between runs
+        self.server = MetadataServer(root=str(self.root), synthesize=False).__enter__()
+    
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.db.close()
+        self.directory.cleanup()
+    
+    def enrich(self):
+        """One enrichment run against the mirror."""
+        return Enricher(self.db, self.server.endpoint, concurrency=2, batch_size=1).run()
+    
+    def cached(self, name: str):
+        return self.db.get_http_cache(self.server.endpoint.format(name=name))
+    
+    def test_unchanged_metadata_is_not_modified(self):
+        first = self.enrich()
+        self.assertEqual((first.fetched, first.missing, first.failed, first.updated), (2, 1, 1, 1))
+        self.assertEqual(self.db.get_package_by_name("good").description,
+                         "Synthetic metadata for good")
+        self.assertIsNotNone(self.cached("good"))
+        
+        second = self.enrich()
+        self.assertEqual(second.not_modified, 1)
+        self.assertEqual(second.updated, 0)
+    
+    def test_missing_project_is_not_cached(self):
+        self.assertEqual(self.enrich().missing, 1)
+        self.assertIsNone(self.cached("ghost"))
+        self.assertEqual(self.db.get_package_by_name("ghost").description, "")
+    
+    def test_unusable_body_is_fetched_again(self):
+        self.enrich()
+        self.assertIsNone(self.cached("broken"))
+        
+        # Still broken: fetched (not validated with a 304) and failed again
+        second = self.enrich()
+        self.assertEqual((second.fetched, second.not_modified, second.failed), (1, 1, 1))
+        
+        write_project(self.root, "broken", synthetic_metadata("broken"))
+        third = self.enrich()
+        self.assertEqual((third.fetched, third.failed, third.updated), (1, 0, 1))
+        self.assertEqual(self.db.get_package_by_name("broken").description,
+                         "Synthetic metadata for broken")
+        self.assertIsNotNone(self.cached("broken"))
+
+
+if __name__ == "__main__":
+    unittest.main()
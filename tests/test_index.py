@@ -0,0 +1,152 @@
+"""
+In-memory search index tests
+Patched snapshots must answer exactly like a snapshot built from scratch
+"""
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from packagepilot.database import Database
+from packagepilot.index import FULL_REBUILD_FRACTION, LiveIndex, SearchIndex
+from packagepilot.models import Package
+
+from tests.test_search import CATALOG, build_catalog
+
+QUERIES = [["db"], ["terminal", "cli"], ["library"], ["logging"], ["new"], ["zzqq"]]
+
+
+def hits(index: SearchIndex, terms):
+    """Comparable search_terms() results."""
+    return [(hit.package.name, hit.name_terms, hit.description_terms, hit.category_terms,
+             hit.keyword_terms) for hit in index.search_terms(terms, ["sql"])]
+
+
+class UpdatedSnapshotTest(unittest.TestCase):
+    """SearchIndex.updated() against SearchIndex.build()."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = build_catalog(str(Path(self.directory.name) / "catalog.db"))
+        self.index = SearchIndex.build(self.db)
+        self.before = {tuple(terms): hits(self.index, terms) for terms in QUERIES}
+    
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+    
+    def apply(self, package_ids):
+        """Patch the snapshot with the given changes and compare it with a fresh build."""
+        updated = self.index.updated(self.db.get_packages_with_keywords(package_ids), package_ids)
+        fresh = SearchIndex.build(self.db)
+        self.assertEqual(len(updated), len(fresh))
+        for terms in QUERIES:
+            self.assertEqual(hits(updated, terms), hits(fresh, terms))
+            self.assertEqual(updated.count_search_terms(terms), fresh.count_search_terms(terms))
+        
+        # The previous snapshot is never modified
+        for terms in QUERIES:
+            self.assertEqual(hits(self.index, terms), self.before[tuple(terms)])
+        return updated
+    
+    def package_id(self, name: str) -> int:
+        return self.db.get_package_by_name(name).id
+    
+    def test_insert_update_delete(self):
+        loguru, rich = self.package_id("loguru"), self.package_id("rich")
+        self.db.enrich_packages([(loguru, "New structured logging for db apps", None, None,
+                                  ["structured", "sql"])], overwrite=True)
+        self.db.delete_packages([rich])
+        self.db.add_packages([(Package(id=None, name="new-cli", description="A new terminal tool",
+                                       category="cli", install_command="", code_example="",
+                                       pypi_url=""), ["terminal", "brand-new"])])
+        new_cli = self.package_id("new-cli")
+        
+        updated = self.apply([loguru, rich, new_cli])
+        self.assertIsNone(updated.get_package_by_name("rich"))
+        self.assertEqual(updated.get_package_by_name("new-cli").id, new_cli)
+        self.assertEqual(updated.get_package_by_name("loguru").description,
+                         "New structured logging for db apps")
+    
+    def test_many_deletions_rebuild(self):
+        names = ["rich", "loguru", "pymongo"]
+        self.assertGreater(len(names), FULL_REBUILD_FRACTION * len(self.index))
+        ids = [self.package_id(name) for name in names]
+        self.db.delete_packages(ids)
+        updated = self.apply(ids)
+        self.assertEqual(len(updated.packages), len(updated))  # No empty rows left
+
+
+
+def package(name: str, description: str, category: str = "cli") -> Package:
+    return Package(id=None, name=name, description=description, category=category,
+                   install_command=f"pip install {name}", code_example="",
+                   pypi_url=f"https://pypi.org/project/{name}/")
+
+
+class LiveIndexTest(unittest.TestCase):
+    """LiveIndex keeps its snapshot in step with its own and other writers."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.directory.name) / "catalog.db")
+        build_catalog(self.path).close()
+        self.live = LiveIndex(self.path)
+    
+    def tearDown(self):
+        self.live.close()
+        self.directory.cleanup()
+    
+    def names(self, query: str):
+        return [package.name for package in self.live.search(query)]
+    
+    def test_ingest_insert_and_update(self):
+        generation, snapshot = self.live.generation, self.live.index
+        self.assertEqual(self.live.ingest([(package("typer", "Build terminal apps"),
+                                            ["cli"], None)]).result(), 1)
+        self.assertIn("typer", self.names("terminal"))
+        self.assertGreater(self.live.generation, generation)
+        self.assertIsNone(snapshot.get_package_by_name("typer"))  # Old snapshot untouched
+        
+        self.live.ingest([(package("typer", "Build command line apps"), [], None)]).result()
+        self.assertEqual(self.live.index.get_package_by_name("typer").description,
+                         "Build command line apps")
+        self.assertNotIn("typer", self.names("terminal"))
+    
+    def test_refresh_picks_up_other_writers(self):
+        with Database(self.path) as other:
+            loguru = other.get_package_by_name("loguru").id
+            other.enrich_packages([(loguru, "Structured logging for terminal apps", None, None,
+                                    [])], overwrite=True)
+        # One changed row is patched in from the change log, not rebuilt
+        with mock.patch.object(SearchIndex, "build", side_effect=AssertionError) as build:
+            self.live.refresh().result()
+        build.assert_not_called()
+        self.assertIn("loguru", self.names("terminal"))
+        
+        with Database(self.path) as other:
+            other.delete_packages([other.get_package_by_name("rich").id])
+            other.add_packages([(package("click", "Composable command line interfaces"),
+                                 ["cli"])])
+        self.live.refresh().result()
+        self.assertIsNone(self.live.index.get_package_by_name("rich"))
+        self.assertNotIn("rich", self.names("terminal"))
+        self.assertEqual(self.names("composable"), ["click"])
+        self.assertEqual(len(self.live.index), len(CATALOG))
+    
+    def test_poll_interval_picks_up_changes(self):
+        self.live.close()
+        self.live = LiveIndex(self.path, poll_interval=0.02)
+        generation = self.live.generation
+        with Database(self.path) as other:
+            other.delete_packages([other.get_package_by_name("pymongo").id])
+        
+        deadline = time.monotonic() + 5
+        while self.live.generation == generation and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(self.live.index.get_package_by_name("pymongo"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Schema migration tests
+A database in the original (pre-versioning) layout is upgraded in place
+"""
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from packagepilot import migrations
+from packagepilot.database import Database
+from packagepilot.migrations import MIGRATIONS, SCHEMA_VERSION, schema_version
+
+# Original layout: packages plus one keywords row per (package, keyword)
+BASELINE_SCHEMA = """
+    CREATE TABLE packages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        description TEXT NOT NULL,
+        category TEXT NOT NULL,
+        install_command TEXT NOT NULL,
+        code_example TEXT NOT NULL,
+        pypi_url TEXT NOT NULL,
+        github_url TEXT,
+        documentation_url TEXT
+    );
+    CREATE TABLE keywords (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        package_id INTEGER NOT NULL,
+        keyword TEXT NOT NULL,
+        FOREIGN KEY (package_id) REFERENCES packages (id)
+    );
+"""
+
+BASELINE_PACKAGES = [
+    ("requests", "Simple HTTP library for making web requests", "web", ["http", "api", "web"]),
+    ("httpx", "Modern async HTTP client with HTTP/2 support", "web", ["http", "async"]),
+    ("pytest", "Testing framework", "testing", ["test", "testing", "unit"]),
+    ("Pillow", "Python Imaging Library fork", "images", ["image", "photo"]),
+]
+
+
+def write_baseline(path: Path):
+    """Create a database the way the first release did."""
+    connection = sqlite3.connect(str(path))
+    connection.executescript(BASELINE_SCHEMA)
+    for name, description, category, keywords in BASELINE_PACKAGES:
+        package_id = connection.execute("""
+            INSERT INTO packages (name, description, category, install_command,
+                                  code_example, pypi_url)
+            VALUES (?, ?, ?, ?, '', ?)
+        """, (name, description, category, f"pip install {name}",
+              f"https://pypi.org/project/{name}/")).lastrowid
+        connection.executemany("INSERT INTO keywords (package_id, keyword) VALUES (?, ?)",
+                               ((package_id, keyword) for keyword in keywords))
+    connection.commit()
+    connection.close()
+
+
+def keywords(db: Database, name: str):
+    """Sorted keywords of a package."""
+    [(_, terms)] = db.get_packages_with_keywords([db.get_package_by_name(name).id])
+    return sorted(terms)
+
+
+def table_names(path: Path):
+    """Tables in a database file."""
+    connection = sqlite3.connect(str(path))
+    try:
+        return {row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        connection.close()
+
+
+class BaselineMigrationTest(unittest.TestCase):
+    """Upgrading a baseline-layout database."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "packages.db"
+        write_baseline(self.path)
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def test_upgrade_in_place(self):
+        with Database(str(self.path)) as db:
+            self.assertEqual(db.migrations_applied, [description for description, _ in MIGRATIONS])
+            self.assertEqual(schema_version(db.connection), SCHEMA_VERSION)
+            self.assertEqual(db.count_packages(), len(BASELINE_PACKAGES))
+            self.assertEqual(keywords(db, "pillow"), ["image", "photo"])
+            self.assertEqual(db.get_packages_by_names(["PILLOW"])["pillow"].name, "Pillow")
+            self.assertEqual({hit.package.name for hit in db.search_terms(["async"])}, {"httpx"})
+        self.assertNotIn("keywords", table_names(self.path))
+        
+        # A second open has nothing left to do
+        with Database(str(self.path)) as db:
+            self.assertEqual(db.migrations_applied, [])
+    
+    def test_interrupted_migration_rolls_back(self):
+        def fail(description, done, total):
+            raise KeyboardInterrupt
+        
+        with self.assertRaises(KeyboardInterrupt):
+            Database(str(self.path), migration_progress=fail)
+        
+        # Only "Create tables" completed; the keyword move left nothing behind
+        connection = sqlite3.connect(str(self.path))
+        self.assertEqual(schema_version(connection), 1)
+        connection.close()
+        tables = table_names(self.path)
+        self.assertIn("keywords", tables)
+        self.assertNotIn("terms", tables)
+        
+        with Database(str(self.path)) as db:
+            self.assertEqual(schema_version(db.connection), SCHEMA_VERSION)
+            self.assertEqual(keywords(db, "requests"), ["api", "http", "web"])
+    
+    def test_write_lock_held_across_batches(self):
+        seen = []
+        
+        def check_other_process(description, done, total):
+            # What another process opening the file sees mid-backfill
+            other = sqlite3.connect(str(self.path), timeout=0)
+            try:
+                seen.append((description, schema_version(other)))
+                with self.assertRaises(sqlite3.OperationalError):
+                    other.execute("BEGIN IMMEDIATE")
+            finally:
+                other.close()
+        
+        with mock.patch.object(migrations, "BACKFILL_BATCH_SIZE", 2):
+            Database(str(self.path), migration_progress=check_other_process).close()
+        
+        self.assertGreater(len(seen), 2)
+        for description, version in seen:
+            expected = [name for name, _ in MIGRATIONS].index(description)
+            self.assertEqual(version, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Output format tests
+The json and ndjson formats carry the same records; text stays human-readable
+"""
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from packagepilot.cli import main
+from packagepilot.output import PACKAGE_FIELDS, OutputWriter, package_record
+from packagepilot.sharding import ShardedDatabase
+
+from tests.test_search import CATALOG, build_catalog
+
+
+class RecordingStream(io.StringIO):
+    """StringIO that counts write() calls."""
+    
+    writes = 0
+    
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def write_records(fmt: str, records, **kwargs) -> RecordingStream:
+    """Stream records through an OutputWriter into a RecordingStream."""
+    stream = RecordingStream()
+    with OutputWriter(fmt, stream=stream, **kwargs) as out:
+        out.records(records)
+    return stream
+
+
+class OutputWriterTest(unittest.TestCase):
+    """OutputWriter formats and buffering."""
+    
+    RECORDS = [{"name": f"pkg-{i}", "score": i / 4} for i in range(50)]
+    
+    def test_json_array(self):
+        self.assertEqual(json.loads(write_records("json", self.RECORDS).getvalue()), self.RECORDS)
+        self.assertEqual(json.loads(write_records("json", []).getvalue()), [])
+    
+    def test_ndjson_lines(self):
+        lines = write_records("ndjson", iter(self.RECORDS)).getvalue().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.RECORDS)
+        self.assertEqual(write_records("ndjson", []).getvalue(), "")
+    
+    def test_value(self):
+        for fmt, expected in (("json", '{\n  "a": [\n    1\n  ]\n}\n'), ("ndjson", '{"a": [1]}\n')):
+            stream = io.StringIO()
+            with OutputWriter(fmt, stream=stream) as out:
+                out.value({"a": [1]})
+            self.assertEqual(stream.getvalue(), expected)
+    
+    def test_buffered_writes(self):
+        # The default buffer holds everything until the final flush
+        self.assertEqual(write_records("ndjson", self.RECORDS).writes, 1)
+        small = write_records("ndjson", self.RECORDS, buffer_size=100)
+        self.assertGreater(small.writes, 1)
+        self.assertLess(small.writes, len(self.RECORDS))
+        self.assertEqual(small.getvalue(), write_records("ndjson", self.RECORDS).getvalue())
+    
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            OutputWriter("xml")
+
+
+class CommandFormatTest(unittest.TestCase):
+    """--format on the read commands, against a sharded copy of a small catalog."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        root = Path(cls.directory.name)
+        db = build_catalog(str(root / "catalog.db"))
+        cls.shards = str(root / "shards")
+        ShardedDatabase.build(db, cls.shards).close()
+        cls.rich = package_record(db.get_package_by_name("rich"))
+        db.close()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+    
+    def run_command(self, *args) -> str:
+        """stdout of one CLI invocation."""
+        output = io.StringIO()
+        argv = ["packagepilot", "--shards", self.shards] + list(args)
+        with mock.patch.object(sys, "argv", argv), contextlib.redirect_stdout(output):
+            main()
+        return output.getvalue()
+    
+    def records(self, *args):
+        """The command's json records, checked against its ndjson output."""
+        records = json.loads(self.run_command(*args, "--format", "json"))
+        lines = self.run_command(*args, "--format", "ndjson").splitlines()
+        self.assertEqual([json.loads(line) for line in lines], records)
+        return records
+    
+    def test_list(self):
+        records = self.records("list")
+        self.assertEqual(sorted(record["name"] for record in records),
+                         sorted(name for name, _, _, _ in CATALOG))
+        self.assertTrue(all(tuple(record) == PACKAGE_FIELDS for record in records))
+    
+    def test_search_and_category(self):
+        self.assertEqual([record["name"] for record in self.records("search", "mongodb")],
+                         ["pymongo"])
+        self.assertEqual({record["name"] for record in self.records("category", "database")},
+                         {"sqlalchemy", "pymongo"})
+    
+    def test_categories(self):
+        self.assertIn({"category": "utilities", "count": 2}, self.records("categories"))
+    
+    def test_info(self):
+        self.assertEqual(json.loads(self.run_command("info", "rich", "--format", "json")),
+                         self.rich)
+        # Row-based records (list) match Package-based ones (info)
+        self.assertIn(self.rich, self.records("list"))
+        with contextlib.redirect_stderr(io.StringIO()) as errors:
+            missing = self.run_command("info", "no-such-package", "--format", "ndjson")
+        self.assertEqual(missing, "null\n")
+        self.assertIn("not found", errors.getvalue())
+    
+    def test_text_is_default(self):
+        output = self.run_command("info", "rich")
+        self.assertIn("PACKAGE: rich", output)
+        self.assertIn("Install: pip install rich", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+SQL instrumentation tests
+Per-method counters, rows read through every fetch path, and merging on save
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from packagepilot.database import Database
+from packagepilot.models import Package
+from packagepilot.perf import HISTOGRAM_BOUNDS_MS, QueryInstrumentation, load_perf_stats
+
+
+def package(index: int) -> Package:
+    name = f"package-{index}"
+    return Package(id=None, name=name, description=f"Package number {index}", category="misc",
+                   install_command=f"pip install {name}", code_example="",
+                   pypi_url=f"https://pypi.org/project/{name}/")
+
+
+class InstrumentedCursorTest(unittest.TestCase):
+    """Rows and statements are recorded however the rows are read."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.perf_dir = Path(self.directory.name) / "perf"
+        self.db = Database(str(Path(self.directory.name) / "packages.db"), instrument=True,
+                           perf_dir=str(self.perf_dir))
+        self.db.add_packages((package(index), []) for index in range(10))
+    
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+    
+    def stats(self, method: str):
+        return self.db.get_perf_stats()[method]
+    
+    def test_iterating_the_cursor_counts_rows(self):
+        self.db.record_sync_projects("mirror", [(f"package-{index}", index, 0)
+                                                for index in range(5)])
+        self.assertEqual(len(self.db.get_sync_projects("mirror")), 5)
+        self.assertEqual((self.stats("get_sync_projects")["calls"],
+                          self.stats("get_sync_projects")["rows"]), (1, 5))
+    
+    def test_exhausted_stream(self):
+        self.assertEqual(len(list(self.db.iter_package_rows(batch_size=4))), 10)
+        self.assertEqual((self.stats("iter_package_rows")["calls"],
+                          self.stats("iter_package_rows")["rows"]), (1, 10))
+    
+    def test_partly_consumed_stream(self):
+        rows = self.db.iter_package_rows(batch_size=4)
+        for _ in range(5):
+            next(rows)
+        rows.close()
+        # Two batches of four were read before the caller stopped
+        self.assertEqual((self.stats("iter_package_rows")["calls"],
+                          self.stats("iter_package_rows")["rows"]), (1, 8))
+
+
+class PerfStatsMergeTest(unittest.TestCase):
+    """Saved statistics accumulate across collectors and processes."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "perf_stats.json"
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def test_save_merges_counters(self):
+        first = QueryInstrumentation()
+        first.record("search_terms", "SELECT 1", (), 0.2, 3)
+        first.save(self.path)
+        
+        second = QueryInstrumentation(slow_query_ms=10)
+        second.record("search_terms", "SELECT 1", (), 20.0, 1)
+        second.record("count_packages", "SELECT 1", (), 2000.0, 1)
+        second.save(self.path)
+        
+        stats = load_perf_stats(self.path)
+        search = stats["search_terms"]
+        self.assertEqual((search["calls"], search["rows"], search["slow"]), (2, 4, 1))
+        self.assertAlmostEqual(search["total_ms"], 20.2)
+        self.assertEqual(search["max_ms"], 20.0)
+        self.assertEqual(search["histogram"][HISTOGRAM_BOUNDS_MS.index(0.5)], 1)
+        self.assertEqual(search["histogram"][HISTOGRAM_BOUNDS_MS.index(50)], 1)
+        self.assertEqual(stats["count_packages"]["histogram"][-1], 1)
+    
+    def test_database_close_merges_into_the_file(self):
+        perf_dir = Path(self.directory.name)
+        for _ in range(2):
+            with Database(str(perf_dir / "packages.db"), instrument=True,
+                          perf_dir=str(perf_dir)) as db:
+                db.count_packages()
+        self.assertEqual(load_perf_stats(self.path)["count_packages"]["calls"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
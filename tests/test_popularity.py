@@ -0,0 +1,89 @@
+"""
+Popularity tests
+Popularity breaks ranking ties and orders the per-category top lists
+"""
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from packagepilot.cli import main
+from packagepilot.database import Database
+from packagepilot.models import Package
+from packagepilot.search import search_packages
+from packagepilot.sharding import ShardedDatabase
+
+# Identical text, so only popularity tells them apart
+CATALOG = [
+    ("http-alpha", "web"), ("http-beta", "web"), ("http-gamma", "web"), ("http-delta", "web"),
+    ("http-tests", "testing"),
+]
+
+
+class PopularityTest(unittest.TestCase):
+    """Search ranking, get_top_packages() and `category --top`."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.db = Database(str(self.root / "catalog.db"))
+        self.db.add_packages(
+            (Package(id=None, name=name, description="HTTP client library", category=category,
+                     install_command=f"pip install {name}", code_example="",
+                     pypi_url=""), ["http"])
+            for name, category in CATALOG
+        )
+    
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+    
+    def search(self, query):
+        """Names in rank order; both ranking paths must agree."""
+        names = [package.name for package in search_packages(query, self.db)]
+        self.assertEqual(names, [package.name for package in
+                                 search_packages(query, self.db, rank_in_sql=True)])
+        return names
+    
+    def test_set_popularity_matches_names(self):
+        self.assertEqual(self.db.set_popularity({"HTTP-Beta": 500, "no-such-package": 1}), 1)
+        self.assertEqual(self.db.get_package_by_name("http-beta").popularity, 500)
+    
+    def test_popularity_breaks_ranking_ties(self):
+        self.assertEqual(self.search("client")[:2], ["http-alpha", "http-beta"])
+        self.db.set_popularity({"http-gamma": 10, "http-beta": 1_000_000})
+        self.assertEqual(self.search("client")[:3], ["http-beta", "http-gamma", "http-alpha"])
+    
+    def test_top_packages(self):
+        self.db.set_popularity({"http-alpha": 5, "http-beta": 50, "http-gamma": 50,
+                                "http-tests": 1000})
+        self.assertEqual([package.name for package in self.db.get_top_packages("Web", 3)],
+                         ["http-beta", "http-gamma", "http-alpha"])
+        
+        # Read straight off the index: no sort step, however large the category
+        plan = [row[3] for row in self.db.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM packages WHERE category_norm = ? "
+            "ORDER BY popularity DESC, name LIMIT ?", ("web", 3))]
+        self.assertTrue(any("idx_packages_category_popularity" in line for line in plan), plan)
+        self.assertFalse(any("TEMP B-TREE" in line for line in plan), plan)
+    
+    def test_category_top_command(self):
+        self.db.set_popularity({"http-delta": 7, "http-alpha": 3})
+        shards = str(self.root / "shards")
+        ShardedDatabase.build(self.db, shards).close()
+        
+        output = io.StringIO()
+        argv = ["packagepilot", "--shards", shards, "category", "web", "--top", "2",
+                "--format", "json"]
+        with mock.patch.object(sys, "argv", argv), contextlib.redirect_stdout(output):
+            main()
+        self.assertEqual([record["name"] for record in json.loads(output.getvalue())],
+                         ["http-delta", "http-alpha"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Query-plan regression tests
+Every statement the Database methods issue must reach packages and keyword
+terms through an index unless its workload step scans the catalog by design
+"""
+import tempfile
+import unittest
+
+from benchmarks.catalog import catalog_path
+from packagepilot.database import Database
+from packagepilot.explain import explain_queries, scanned_tables
+
+# Large enough that a full scan is a real cost, small enough to build in seconds
+CATALOG_SIZE = 20_000
+
+
+def _plan(db: Database, sql: str):
+    """EXPLAIN QUERY PLAN detail lines of a statement."""
+    return [row[3] for row in db.connection.execute(
+        "EXPLAIN QUERY PLAN " + sql, [None] * sql.count("?"))]
+
+
+class QueryPlanTest(unittest.TestCase):
+    """Plans of the whole Database workload against a generated catalog."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        path = catalog_path(cls.directory.name, CATALOG_SIZE)
+        cls.checks = explain_queries(str(path))
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+    
+    def test_no_unexpected_scans(self):
+        failures = [f"{check.step}: scans {', '.join(check.violations)}\n"
+                    f"  {' '.join(check.sql.split())}\n  " + "\n  ".join(check.plan)
+                    for check in self.checks if check.violations]
+        self.assertEqual(failures, [], "\n" + "\n".join(failures))
+    
+    def test_workload_covers_lookups(self):
+        steps = {check.step for check in self.checks}
+        for step in ("search_terms", "search_ranked", "get_package_by_name",
+                     "get_packages_by_category", "get_top_packages", "get_all_packages",
+                     "count_packages", "get_category_counts", "upsert_packages"):
+            self.assertIn(step, steps)
+    
+    def test_keyword_terms_reached_by_index(self):
+        for check in self.checks:
+            if check.step in ("search_terms", "search_ranked", "count_search_terms"):
+                self.assertNotIn("package_terms", check.scans, check.plan)
+
+
+class ScanDetectionTest(unittest.TestCase):
+    """The checker itself flags the regressions it exists for."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.db = Database(str(catalog_path(cls.directory.name, 100)))
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+        cls.directory.cleanup()
+    
+    def test_indexed_lookup(self):
+        sql = "SELECT * FROM packages WHERE name_norm = ?"
+        self.assertEqual(scanned_tables(sql, _plan(self.db, sql)), [])
+    
+    def test_function_on_indexed_column_is_a_scan(self):
+        sql = "SELECT * FROM packages WHERE LOWER(name_norm) = ?"
+        self.assertEqual(scanned_tables(sql, _plan(self.db, sql)), ["packages"])
+    
+    def test_alias_resolved(self):
+        sql = "SELECT p.name FROM packages AS p WHERE lower(p.category_norm) = ?"
+        self.assertEqual(scanned_tables(sql, _plan(self.db, sql)), ["packages"])
+        sql = "SELECT pt.package_id FROM package_terms pt WHERE pt.term_id + 0 = ?"
+        self.assertEqual(scanned_tables(sql, _plan(self.db, sql)), ["package_terms"])
+    
+    def test_legacy_plan_format(self):
+        plan = ["SCAN TABLE packages AS p", "SEARCH TABLE package_terms AS pt USING INDEX x"]
+        self.assertEqual(scanned_tables("SELECT 1", plan), ["packages"])
+
+
+if __name__ == "__main__":
+    unittest.main()
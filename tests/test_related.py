@@ -0,0 +1,102 @@
+"""
+Related packages tests
+Incremental refreshes must keep unaffected lists and agree with a full rebuild
+"""
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from packagepilot.database import Database
+from packagepilot.models import Package
+from packagepilot.related import refresh_related
+
+# Four families of five packages; members share most of their description words
+FAMILIES = {
+    "http": ["http", "client", "request", "session", "cookie", "proxy", "header"],
+    "image": ["image", "photo", "resize", "thumbnail", "pixel", "filter", "exif"],
+    "orm": ["orm", "model", "query", "table", "migration", "schema", "column"],
+    "test": ["test", "fixture", "mock", "assert", "coverage", "runner", "plugin"],
+}
+
+
+def description(family: str, member: int) -> str:
+    """Family words minus one, so members are similar but not identical."""
+    words = FAMILIES[family]
+    return " ".join(words[:member] + words[member + 1:])
+
+
+class RelatedRefreshTest(unittest.TestCase):
+    """refresh_related() after updates and deletions."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.db = Database(str(self.root / "catalog.db"))
+        self.db.add_packages(
+            (Package(id=None, name=f"{family}-{member}", description=description(family, member),
+                     category=family, install_command="", code_example="", pypi_url=""), [])
+            for family in FAMILIES for member in range(5)
+        )
+        refresh_related(self.db, full=True)
+    
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+    
+    def related(self, name: str):
+        """(name, score) pairs listed for a package."""
+        return [(package.name, score) for package, score in self.db.get_related(name)]
+    
+    def all_lists(self):
+        """Every package's related list, keyed by name."""
+        return {f"{family}-{member}": self.related(f"{family}-{member}")
+                for family in FAMILIES for member in range(5)}
+    
+    def assertMatchesFullRebuild(self):
+        """The incremental lists equal a full rebuild of a copy of the catalog."""
+        path = self.root / "rebuilt.db"
+        shutil.copy(str(self.root / "catalog.db"), str(path))
+        with Database(str(path)) as rebuilt:
+            refresh_related(rebuilt, full=True)
+            for name, related in self.all_lists().items():
+                self.assertEqual([(package.name, score) for package, score
+                                  in rebuilt.get_related(name)], related, name)
+    
+    def test_families_are_related(self):
+        self.assertEqual({name for name, _ in self.related("http-0")},
+                         {"http-1", "http-2", "http-3", "http-4"})
+    
+    def test_refresh_without_changes_is_a_no_op(self):
+        before = self.all_lists()
+        self.assertEqual(refresh_related(self.db), 0)
+        self.assertEqual(self.all_lists(), before)
+    
+    def test_update_moves_package_to_new_family(self):
+        before = self.all_lists()
+        moved = self.db.get_package_by_name("http-3").id
+        self.db.enrich_packages([(moved, description("image", 5), None, None, [])],
+                                overwrite=True)
+        self.assertGreater(refresh_related(self.db), 0)
+        
+        self.assertTrue({name for name, _ in self.related("http-3")}
+                        >= {"image-0", "image-1", "image-2"})
+        for member in (0, 1, 2, 4):
+            self.assertNotIn("http-3", [name for name, _ in self.related(f"http-{member}")])
+        # Families the update did not touch keep their lists exactly
+        for name, related in before.items():
+            if name.startswith(("orm-", "test-")):
+                self.assertEqual(self.related(name), related)
+        self.assertMatchesFullRebuild()
+    
+    def test_deleted_package_leaves_every_list(self):
+        self.db.delete_packages([self.db.get_package_by_name("orm-1").id])
+        refresh_related(self.db)
+        for name, related in self.all_lists().items():
+            self.assertNotIn("orm-1", [other for other, _ in related], name)
+        self.assertEqual(len(self.related("orm-0")), 3)
+        self.assertMatchesFullRebuild()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+Project scanner tests
+Requirements and imports are matched to the catalog by PEP 503 canonical name
+"""
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from packagepilot import scan
+from packagepilot.database import Database
+from packagepilot.models import Package
+from packagepilot.scan import distribution_name, read_requirements, scan_imports, tomllib
+
+# Catalog spellings mix separators and case
+CATALOG = ["Foo_bar.baz", "typing_extensions", "requests", "zope.interface", "Flask"]
+
+
+def package(name: str, description: str = "") -> Package:
+    return Package(id=None, name=name, description=description or f"The {name} package",
+                   category="misc", install_command=f"pip install {name}", code_example="",
+                   pypi_url=f"https://pypi.org/project/{name}/")
+
+
+class ScanTest(unittest.TestCase):
+    """requirements.txt and pyproject.toml scans against a small catalog."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.db = Database(str(self.root / "packages.db"))
+        self.db.add_packages((package(name), []) for name in CATALOG)
+    
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+    
+    def write(self, name: str, text: str) -> str:
+        path = self.root / name
+        path.write_text(textwrap.dedent(text))
+        return str(path)
+    
+    def lookup(self, path: str):
+        """(requirement names, found catalog names) as the scan command computes them."""
+        names = [name for name, _, _ in read_requirements(path)]
+        found = self.db.get_packages_by_names(names)
+        return names, {name: found[name].name for name in found}
+    
+    def test_requirements_txt(self):
+        self.write("base.txt", """
+            requests[socks]==2.31.0 --hash=sha256:0123
+            Zope_Interface
+        """)
+        path = self.write("requirements.txt", """
+            # Mixed separators on both sides
+            foo-bar-baz>=1.0
+            Typing.Extensions; python_version < "3.11"
+            -r base.txt
+            not-in-catalog
+            requests
+        """)
+        names, found = self.lookup(path)
+        self.assertEqual(names, ["foo-bar-baz", "typing-extensions", "requests",
+                                 "zope-interface", "not-in-catalog"])
+        self.assertEqual(found, {"foo-bar-baz": "Foo_bar.baz",
+                                 "typing-extensions": "typing_extensions",
+                                 "requests": "requests",
+                                 "zope-interface": "zope.interface"})
+    
+    @unittest.skipIf(tomllib is None, "needs Python 3.11+ or tomli")
+    def test_pyproject_toml(self):
+        path = self.write("pyproject.toml", """
+            [project]
+            dependencies = ["FOO.BAR_BAZ>=2", "flask"]
+            
+            [project.optional-dependencies]
+            types = ["typing-extensions"]
+            
+            [dependency-groups]
+            dev = ["zope-interface", {include-group = "types"}]
+            
+            [tool.poetry.dependencies]
+            python = "^3.9"
+            Requests = "*"
+        """)
+        requirements = read_requirements(path)
+        self.assertEqual([(name, source) for name, _, source in requirements], [
+            ("foo-bar-baz", "project.dependencies"),
+            ("flask", "project.dependencies"),
+            ("typing-extensions", "project.optional-dependencies.types"),
+            ("zope-interface", "dependency-groups.dev"),
+            ("requests", "tool.poetry.dependencies"),
+        ])
+        _, found = self.lookup(path)
+        self.assertEqual(set(found.values()), set(CATALOG))
+    
+    def test_upsert_matches_canonical_name(self):
+        self.db.upsert_packages([(package("foo-bar.BAZ", "Updated"), [], None)])
+        self.assertEqual(self.db.count_packages(), len(CATALOG))
+        updated = self.db.get_packages_by_names(["foo_bar_baz"])["foo-bar-baz"]
+        self.assertEqual((updated.name, updated.description), ("foo-bar.BAZ", "Updated"))
+
+
+
+# Source tree: a local package, a top-level module and a nested tests/requests.py
+SOURCE_TREE = {
+    "app/__init__.py": "from app import utils\n",
+    "app/views.py": "import os\nimport requests\nfrom flask import Flask\nfrom . import utils\n",
+    "utils.py": "import json\nimport yaml\n",
+    "tests/requests.py": "import requests\nfrom sklearn.linear_model import Ridge\nimport utils\n",
+    "tests/broken.py": "import numpy\ndef (:\n",
+    ".venv/lib/site.py": "import should_not_be_seen\n",
+}
+
+
+class ImportScanTest(unittest.TestCase):
+    """scan_imports() results and its per-file cache."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name) / "project"
+        for name, text in SOURCE_TREE.items():
+            self.write(name, text)
+        self.db = Database(str(Path(self.directory.name) / "packages.db"))
+    
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+    
+    def write(self, name: str, text: str):
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    
+    def test_third_party_imports(self):
+        result = scan_imports(self.db, str(self.root))
+        self.assertEqual((result.files, result.parsed), (5, 5))
+        # Standard library, local modules and relative imports are left out;
+        # tests/requests.py does not hide the real requests
+        self.assertEqual(result.imports, {"requests": 2, "flask": 1, "yaml": 1, "sklearn": 1})
+    
+    def test_unchanged_rescan_hits_cache(self):
+        first = scan_imports(self.db, str(self.root))
+        with mock.patch.object(scan, "parse_imports") as parse:
+            second = scan_imports(self.db, str(self.root))
+        parse.assert_not_called()
+        self.assertEqual((second.files, second.parsed), (5, 0))
+        self.assertEqual(second.imports, first.imports)
+    
+    def test_rescan_parses_only_changes(self):
+        scan_imports(self.db, str(self.root))
+        self.write("utils.py", "import json\nimport yaml\nimport click\n")
+        self.write("app/cli.py", "import typer\n")
+        os.remove(str(self.root / "tests" / "requests.py"))
+        
+        result = scan_imports(self.db, str(self.root))
+        self.assertEqual((result.files, result.parsed), (5, 2))
+        self.assertEqual(result.imports, {"requests": 1, "flask": 1, "yaml": 1,
+                                          "click": 1, "typer": 1})
+        # The deleted file's entry is gone from the cache
+        self.assertEqual(len(self.db.get_import_cache(str(self.root.resolve()))), 5)
+    
+    def test_parallel_parse_matches_inline(self):
+        inline = scan_imports(self.db, str(self.root))
+        other = Database(str(Path(self.directory.name) / "other.db"))
+        try:
+            with mock.patch.object(scan, "PARALLEL_PARSE_THRESHOLD", 1):
+                parallel = scan_imports(other, str(self.root), workers=2)
+        finally:
+            other.close()
+        self.assertEqual(parallel, inline)
+    
+    def test_distribution_name(self):
+        self.assertEqual(distribution_name("sklearn"), "scikit-learn")
+        self.assertEqual(distribution_name("PIL"), "pillow")
+        self.assertEqual(distribution_name("yaml"), "pyyaml")
+        self.assertEqual(distribution_name("Flask_Login"), "flask-login")
+        self.assertEqual(distribution_name("requests"), "requests")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Search tests
+Synonym expansions match whole words; the query itself matches substrings
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from packagepilot.database import Database
+from packagepilot.index import SearchIndex
+from packagepilot.models import Package
+from packagepilot.search import default_synonym_rows, search_packages, search_with_total
+
+CATALOG = [
+    ("rich", "Library for rich text and beautiful formatting in terminal", "cli",
+     ["cli", "terminal", "console", "colors", "formatting"]),
+    ("python-dotenv", "Read key-value pairs from .env file", "utilities",
+     ["environment", "env", "config", "secrets"]),
+    ("loguru", "Library which aims to make logging in Python enjoyable", "utilities",
+     ["logging", "log", "debug", "errors"]),
+    ("sqlalchemy", "SQL toolkit and Object-Relational Mapping (ORM) library", "database",
+     ["orm", "database", "sql", "sqlite", "postgres"]),
+    ("pymongo", "Python driver for MongoDB", "database",
+     ["document", "database", "mongodb", "nosql"]),
+    ("scikit-learn", "Machine learning library with classification, regression, clustering",
+     "data", ["machine learning", "ml", "ai", "classification", "regression"]),
+]
+
+
+def build_catalog(path: str) -> Database:
+    """Small catalog with the built-in synonyms."""
+    db = Database(path)
+    db.add_packages(
+        (Package(id=None, name=name, description=description, category=category,
+                 install_command=f"pip install {name}", code_example="",
+                 pypi_url=f"https://pypi.org/project/{name}/"), keywords)
+        for name, description, category, keywords in CATALOG
+    )
+    db.add_synonyms(default_synonym_rows())
+    return db
+
+
+class SynonymMatchingTest(unittest.TestCase):
+    """Short synonyms must not match inside unrelated words."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.db = build_catalog(str(Path(cls.directory.name) / "catalog.db"))
+        cls.index = SearchIndex.build(cls.db)
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+        cls.directory.cleanup()
+    
+    def search(self, query):
+        """Names found by every search path; the paths must agree."""
+        names = [package.name for package in search_packages(query, self.db)]
+        self.assertEqual(names, [package.name for package in
+                                 search_packages(query, self.db, rank_in_sql=True)])
+        self.assertEqual(names, [package.name for package in search_packages(query, self.index)])
+        return names
+    
+    def test_db_does_not_match_formatting(self):
+        # db -> orm must not find "formatting"
+        names = self.search("db")
+        self.assertNotIn("rich", names)
+        self.assertIn("sqlalchemy", names)
+        self.assertIn("pymongo", names)
+    
+    def test_ml_does_not_match_pairs_or_aims(self):
+        # ml -> ai must not find "pairs" or "aims"
+        names = self.search("ml")
+        self.assertNotIn("python-dotenv", names)
+        self.assertNotIn("loguru", names)
+        self.assertIn("scikit-learn", names)
+    
+    def test_query_still_matches_substrings(self):
+        self.assertIn("rich", self.search("format"))
+    
+    def test_total_counts_every_match(self):
+        results, total = search_with_total("db", self.db, limit=1)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(total, len(self.search("db")))
+
+
+if __name__ == "__main__":
+    unittest.main()
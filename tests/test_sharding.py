@@ -0,0 +1,87 @@
+"""
+Sharded catalog tests
+A sharded catalog must answer exactly like the single database it was built from
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.catalog import CATEGORIES, generate_catalog
+from packagepilot.database import Database
+from packagepilot.search import default_synonym_rows, search_packages, search_with_total
+from packagepilot.sharding import ShardedDatabase
+
+QUERIES = ["data", "web scraping", "db", "http client", "test", "zzqq"]
+
+
+class ShardParityTest(unittest.TestCase):
+    """Per-category and hash-bucket layouts against the source catalog."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        root = Path(cls.directory.name)
+        cls.db = Database(str(root / "catalog.db"))
+        cls.db.add_packages(generate_catalog(1000, seed=5))
+        cls.db.add_synonyms(default_synonym_rows())
+        cls.layouts = {
+            "category": ShardedDatabase.build(cls.db, str(root / "by-category")),
+            "buckets": ShardedDatabase.build(cls.db, str(root / "by-bucket"), buckets=3),
+        }
+    
+    @classmethod
+    def tearDownClass(cls):
+        for sharded in cls.layouts.values():
+            sharded.close()
+        cls.db.close()
+        cls.directory.cleanup()
+    
+    def assertParity(self, call):
+        """call(catalog) gives the same answer for the database and every layout."""
+        expected = call(self.db)
+        for layout, sharded in self.layouts.items():
+            with self.subTest(layout=layout):
+                self.assertEqual(call(sharded), expected)
+    
+    def test_layouts(self):
+        self.assertEqual(len(self.layouts["category"].shards), len(CATEGORIES))
+        self.assertEqual(len(self.layouts["buckets"].shards), 3)
+    
+    def test_search(self):
+        for query in QUERIES:
+            for rank_in_sql in (False, True):
+                with self.subTest(query=query, rank_in_sql=rank_in_sql):
+                    self.assertParity(lambda catalog: [
+                        package.name for package in
+                        search_packages(query, catalog, limit=20, offset=5,
+                                        rank_in_sql=rank_in_sql)])
+            self.assertParity(lambda catalog: search_with_total(query, catalog, limit=5)[1])
+    
+    def test_name_lookups(self):
+        names = [package.name for package, _ in generate_catalog(5, seed=5)]
+        self.assertParity(lambda catalog: catalog.get_package_by_name(names[0]).name)
+        self.assertParity(lambda catalog: sorted(
+            (key, package.name) for key, package in
+            catalog.get_packages_by_names(names + ["no-such-package"]).items()))
+    
+    def test_categories(self):
+        for category, _ in CATEGORIES:
+            with self.subTest(category=category):
+                self.assertParity(lambda catalog: [
+                    package.name for package in
+                    catalog.get_packages_by_category(category, limit=10, offset=3)])
+                self.assertParity(lambda catalog: [
+                    package.name for package in catalog.get_top_packages(category, 5)])
+                self.assertParity(lambda catalog: catalog.count_packages(category))
+        self.assertParity(lambda catalog: catalog.get_category_counts())
+        self.assertParity(lambda catalog: catalog.count_packages())
+    
+    def test_listings(self):
+        self.assertParity(lambda catalog: [
+            package.name for package in catalog.get_all_packages(limit=25, offset=40)])
+        self.assertParity(lambda catalog: [
+            (row["category"], row["name"]) for row in catalog.iter_package_rows(batch_size=64)])
+
+
+if __name__ == "__main__":
+    unittest.main()
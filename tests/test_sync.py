@@ -0,0 +1,111 @@
+"""
+Mirror sync tests
+Runs over a fixture mirror written to a temporary directory
+"""
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.metadata_server import synthetic_metadata
+from packagepilot.database import Database
+from packagepilot.sync import MAX_SYNC_ATTEMPTS, sync_mirror
+
+
+class SyncTest(unittest.TestCase):
+    """Serials, projects missing from the mirror and deletions."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.mirror = Path(self.directory.name) / "mirror"
+        self.serials = {}
+        self.db = Database(str(Path(self.directory.name) / "packages.db"))
+    
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+    
+    def publish(self, name: str, serial: int, document: bool = True):
+        """List a project at a serial, with or without its JSON document."""
+        self.serials[name] = serial
+        if document:
+            path = self.mirror / "pypi" / name / "json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(synthetic_metadata(name))
+        self.write_index()
+    
+    def unlist(self, name: str):
+        """Remove a project from the mirror index."""
+        del self.serials[name]
+        self.write_index()
+    
+    def write_index(self):
+        path = self.mirror / "simple" / "index.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "meta": {"api-version": "1.0", "_last-serial": max(self.serials.values())},
+            "projects": [{"name": name, "_last-serial": serial}
+                         for name, serial in self.serials.items()],
+        }))
+    
+    def sync(self):
+        return sync_mirror(self.db, str(self.mirror))
+    
+    def test_changed_projects_only(self):
+        self.publish("alpha", 1)
+        self.publish("Beta_Lib", 2)
+        report = self.sync()
+        self.assertEqual((report.last_serial, report.changed, report.upserted), (2, 2, 2))
+        self.assertEqual(self.db.get_packages_by_names(["beta-lib"])["beta-lib"].description,
+                         "Synthetic metadata for Beta Lib")
+        
+        self.assertEqual(self.sync().changed, 0)
+        
+        self.publish("alpha", 3)
+        report = self.sync()
+        self.assertEqual((report.previous_serial, report.changed, report.upserted), (2, 1, 1))
+    
+    def test_missing_project_does_not_hold_back_serial(self):
+        self.publish("alpha", 1)
+        self.publish("gamma", 2, document=False)
+        self.publish("delta", 3)
+        report = self.sync()
+        self.assertEqual((report.last_serial, report.upserted, report.missing), (3, 2, 1))
+        
+        # Later changes are still picked up while gamma is retried
+        self.publish("delta", 4)
+        report = self.sync()
+        self.assertEqual((report.last_serial, report.changed, report.retried), (4, 1, 1))
+        self.assertEqual((report.upserted, report.missing), (1, 1))
+        
+        self.publish("gamma", 2)
+        report = self.sync()
+        self.assertEqual((report.retried, report.upserted, report.missing), (1, 1, 0))
+        self.assertIsNotNone(self.db.get_package_by_name("gamma"))
+        self.assertEqual(self.sync().retried, 0)
+    
+    def test_retries_are_bounded(self):
+        self.publish("gamma", 1, document=False)
+        reports = [self.sync() for _ in range(MAX_SYNC_ATTEMPTS + 1)]
+        self.assertEqual([report.missing for report in reports],
+                         [1] * MAX_SYNC_ATTEMPTS + [0])
+        
+        # A new change to the project starts over
+        self.publish("gamma", 2, document=False)
+        self.assertEqual(self.sync().missing, 1)
+    
+    def test_unlisted_project_is_deleted(self):
+        self.publish("alpha", 1)
+        self.publish("beta", 2)
+        self.sync()
+        
+        self.unlist("beta")
+        report = self.sync()
+        self.assertEqual(report.deleted, 1)
+        self.assertIsNone(self.db.get_package_by_name("beta"))
+        self.assertIsNotNone(self.db.get_package_by_name("alpha"))
+        self.assertEqual(self.sync().deleted, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
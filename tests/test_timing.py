@@ -0,0 +1,48 @@
+"""
+Phase timing tests
+Every way of reading rows is charged to the 'sql' phase
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from packagepilot.database import Database
+from packagepilot.models import Package
+from packagepilot.timing import TIMER
+
+
+class SqlPhaseTest(unittest.TestCase):
+    """--timings attributes fetches to SQL execution, not to the caller."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = Database(str(Path(self.directory.name) / "packages.db"), instrument=False)
+        self.db.add_packages(
+            (Package(id=None, name=f"package-{index}", description="", category="misc",
+                     install_command="", code_example="", pypi_url=""), [])
+            for index in range(10)
+        )
+        TIMER.reset()
+        TIMER.enabled = True
+    
+    def tearDown(self):
+        TIMER.enabled = False
+        TIMER.reset()
+        self.db.close()
+        self.directory.cleanup()
+    
+    def test_fetchmany(self):
+        self.assertEqual(len(list(self.db.iter_package_rows(batch_size=4))), 10)
+        # One execute plus fetchmany batches of 4, 4, 2 and the empty one
+        self.assertEqual(TIMER.counts["sql"], 5)
+    
+    def test_iteration(self):
+        self.db.record_sync_projects("mirror", [("package-1", 1, 0), ("package-2", 2, 0)])
+        TIMER.reset()
+        self.assertEqual(len(self.db.get_sync_projects("mirror")), 2)
+        # One execute plus a step per row and the final one
+        self.assertEqual(TIMER.counts["sql"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
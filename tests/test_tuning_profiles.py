@@ -0,0 +1,78 @@
+"""
+Tuning profile tests
+PRAGMAs per profile, read-only opens and the deferred indexes of bulk loads
+"""
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.catalog import build_catalog
+from packagepilot.database import Database
+from packagepilot.migrations import DEFERRED_INDEXES
+
+
+def file_state(path: Path):
+    """Contents and modification time of a database file."""
+    return path.read_bytes(), path.stat().st_mtime_ns
+
+
+class TuningProfileTest(unittest.TestCase):
+    """Each profile's promises against a small generated catalog."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "catalog.db"
+        with Database(str(self.path)) as db:
+            build_catalog(db, 200)
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            Database(str(self.path), tuning_profile="fastest")
+    
+    def test_read_heavy_rejects_writes(self):
+        with Database(str(self.path), tuning_profile="read_heavy") as db:
+            self.assertEqual(db.connection.execute("PRAGMA query_only").fetchone()[0], 1)
+            self.assertGreater(db.count_packages(), 0)
+            with self.assertRaises(sqlite3.OperationalError):
+                db.connection.execute("DELETE FROM packages")
+    
+    def test_concurrent_leaves_wal(self):
+        Database(str(self.path), tuning_profile="concurrent").close()
+        connection = sqlite3.connect(str(self.path))
+        self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        connection.close()
+    
+    def test_bulk_load_rebuilds_indexes_on_close(self):
+        db = Database(str(self.path), tuning_profile="bulk_load")
+        self.assertEqual(sorted(db.missing_deferred_indexes()), sorted(DEFERRED_INDEXES))
+        db.close()
+        with Database(str(self.path), tuning_profile="read_heavy") as db:
+            self.assertEqual(db.missing_deferred_indexes(), [])
+            journal_mode = db.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode, "delete")
+    
+    def test_interrupted_bulk_load_repaired_on_next_open(self):
+        db = Database(str(self.path), tuning_profile="bulk_load")
+        db.connection.close()  # Killed before close()
+        
+        # A read_heavy open must not write, so it searches without them
+        with Database(str(self.path), tuning_profile="read_heavy") as db:
+            self.assertEqual(len(db.missing_deferred_indexes()), len(DEFERRED_INDEXES))
+            self.assertTrue(db.search_terms(["data"]))
+        
+        with Database(str(self.path)) as db:
+            self.assertEqual(db.missing_deferred_indexes(), [])
+    
+    def test_opens_do_not_write(self):
+        before = file_state(self.path)
+        for profile in ("default", "read_heavy"):
+            Database(str(self.path), tuning_profile=profile).close()
+        self.assertEqual(file_state(self.path), before)
+
+
+if __name__ == "__main__":
+    unittest.main()